@@ -10,7 +10,7 @@ envsubst < ${RAW_LOCAL_SETTINGS} > ${LOCAL_SETTINGS}
 
 holdup -t 120 tcp://${DB_HOST}:${DB_PORT};
 if [[ "$RUN_MODE" == "server" ]]; then
-  python manage.py makemigrations && python manage.py migrate;
+  python manage.py migrate;
   python manage.py create_user \
     --username ${ADMIN_USERNAME:-admin} \
     --password ${ADMIN_PASSWORD:-pass} \
@@ -22,6 +22,9 @@ if [[ "$RUN_MODE" == "server" ]]; then
   else # For production, use uwsgi in front
     uwsgi --ini /etc/uwsgi/apps-enabled/server.ini;
   fi
+elif [[ "$RUN_MODE" == "beat" ]]; then
+  # periodic tasks of api_engine.celery, run exactly one beat per deployment
+  celery -A api_engine beat -l info -s /tmp/celerybeat-schedule
 else
   celery -A api_engine worker -l info
 fi
@@ -214,6 +214,34 @@ class AgentOperation(ExtraEnum):
     NewNetwork = "new:network"
 
 
+@unique
+class JobStatus(ExtraEnum):
+    Pending = "pending"
+    Running = "running"
+    Success = "success"
+    Failed = "failed"
+
+
+@unique
+class ChainCodeOperation(ExtraEnum):
+    Package = "package"
+    Install = "install"
+    Approve = "approve"
+    Commit = "commit"
+
+
+@unique
+class ConfigTxOrgType(ExtraEnum):
+    Orderer = "orderer"
+    Peer = "peer"
+
+
+@unique
+class ConfigTxProfileType(ExtraEnum):
+    Genesis = "genesis"
+    Channel = "channel"
+
+
 class EnumWithDisplayMeta(EnumMeta):
     def __new__(mcs, name, bases, attrs):
         display_strings = attrs.get("DisplayStrings")
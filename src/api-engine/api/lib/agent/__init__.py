@@ -1,4 +1,4 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-from api.lib.agent.handler import AgentHandler
\ No newline at end of file
+from api.lib.agent.handler import AgentHandler
@@ -6,6 +6,7 @@ from requests import put, get, post
 import json
 
 from api.lib.agent.base import AgentBase
+from api.models import Artifact
 
 LOG = logging.getLogger(__name__)
 
@@ -34,13 +35,13 @@ class DockerAgent(AgentBase):
         """
         try:
             port_map = {str(port.internal): str(port.external) for port in info.get("ports")}
-            
+            config_file = Artifact.load_base64(info.get("config_file"))
             data = {
-                'msp': info.get("msp")[2:-1],
-                'tls': info.get("tls")[2:-1],
-                'bootstrap_block': info.get("bootstrap_block")[2:-1],
-                'peer_config_file': info.get("config_file")[2:-1],
-                'orderer_config_file': info.get("config_file")[2:-1],
+                'msp': Artifact.load_base64(info.get("msp")),
+                'tls': Artifact.load_base64(info.get("tls")),
+                'bootstrap_block': Artifact.load_base64(info.get("bootstrap_block")),
+                'peer_config_file': config_file,
+                'orderer_config_file': config_file,
                 'img': 'yeasy/hyperledger-fabric:2.2.0',
                 'cmd': 'bash /tmp/init.sh "peer node start"' if info.get("type") == "peer" else 'bash /tmp/init.sh "orderer"',
                 'name': info.get("name"),
@@ -0,0 +1,254 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import os
+
+from api.lib.configtxlator import protolator
+from api.lib.peer import protos
+from api.lib.peer.gateway import gateway_pool
+
+LOG = logging.getLogger(__name__)
+
+APPLICATION = "Application"
+ANCHOR_PEERS = "AnchorPeers"
+
+
+class ChannelConfig:
+    """
+    Channel config held in memory from fetch to submit.
+
+    The config block is fetched from the orderer and decoded once, any number
+    of mutations are applied to the decoded config, and the difference to the
+    fetched config is submitted as a single config update transaction.
+
+    param:
+        channel_id: channel to update
+        orderer_url: orderer endpoint, host:port
+        env: peer cli environment of the submitting identity, as init_env_vars
+    """
+
+    def __init__(self, channel_id, orderer_url, env, pool=gateway_pool):
+        self.channel_id = channel_id
+        self.orderer_url = orderer_url
+        self.env = env
+        self.pool = pool
+        self.original = None
+        self.config = None
+        self._update = None
+        self._signatures = []
+
+    def fetch(self):
+        """
+        Fetch the latest config block of the channel from the orderer
+
+        :return: self
+        :rtype: ChannelConfig
+        """
+        block = self.pool.orderer(self.env, self.orderer_url).config_block(self.channel_id)
+        return self.load(block.SerializeToString())
+
+    def load(self, block):
+        """
+        Start from a config block fetched by other means
+
+        :param block: marshaled config block
+        :return: self
+        :rtype: ChannelConfig
+        """
+        self.original = protolator.config_from_block(block)
+        self.config = protolator.decode("common.Config", self.original.SerializeToString())
+        self._update = None
+        self._signatures = []
+        return self
+
+    def _application(self):
+        if self.config is None:
+            raise ValueError("config of channel {} is not loaded".format(self.channel_id))
+        try:
+            return self.config["channel_group"]["groups"][APPLICATION]
+        except KeyError:
+            raise ValueError("channel {} has no application group".format(self.channel_id))
+
+    def organizations(self):
+        """
+        Application organizations of the channel
+
+        :return: group name to msp id
+        :rtype: dict
+        """
+        orgs = {}
+        for name, group in self._application().get("groups", {}).items():
+            msp = group.get("values", {}).get("MSP", {}).get("value", {})
+            orgs[name] = msp.get("config", {}).get("name", "")
+        return orgs
+
+    def organization(self, org):
+        """
+        Config group of an application organization
+
+        :param org: group name or msp id of organization
+        :return: organization group, mutations are kept
+        :rtype: dict
+        """
+        groups = self._application().get("groups", {})
+        if org in groups:
+            return groups[org]
+        for name, mspid in self.organizations().items():
+            if mspid == org:
+                return groups[name]
+        raise ValueError("organization {} is not a member of channel {}".format(org, self.channel_id))
+
+    def mutate(self, fn):
+        """
+        Apply a mutation to the decoded config
+
+        :param fn: function called with the config dict
+        :return: self
+        :rtype: ChannelConfig
+        """
+        if self.config is None:
+            raise ValueError("config of channel {} is not loaded".format(self.channel_id))
+        fn(self.config)
+        return self
+
+    def set_anchor_peers(self, org, peers):
+        """
+        Replace the anchor peers of an organization, no peers removes them
+
+        :param org: group name or msp id of organization
+        :param peers: (host, port) of anchor peers
+        :return: self
+        :rtype: ChannelConfig
+        """
+        values = self.organization(org).setdefault("values", {})
+        anchor_peers = [{"host": host, "port": int(port)} for host, port in peers]
+        if not anchor_peers:
+            values.pop(ANCHOR_PEERS, None)
+        elif ANCHOR_PEERS in values:
+            values[ANCHOR_PEERS]["value"] = {"anchor_peers": anchor_peers}
+        else:
+            values[ANCHOR_PEERS] = {
+                "mod_policy": "Admins",
+                "value": {"anchor_peers": anchor_peers},
+                "version": "0",
+            }
+        return self
+
+    def set_all_anchor_peers(self, anchor_peers):
+        """
+        Replace the anchor peers of several organizations at once
+
+        :param anchor_peers: group name or msp id to (host, port) of anchor peers
+        :return: self
+        :rtype: ChannelConfig
+        """
+        for org, peers in anchor_peers.items():
+            self.set_anchor_peers(org, peers)
+        return self
+
+    def add_organization(self, name, group):
+        """
+        Add an organization to the application group
+
+        :param name: group name of organization
+        :param group: organization group as printed by configtxgen -printOrg
+        :return: self
+        :rtype: ChannelConfig
+        """
+        groups = self._application().setdefault("groups", {})
+        if name in groups:
+            raise ValueError("organization {} is already a member of channel {}".format(name, self.channel_id))
+        groups[name] = group
+        return self
+
+    def remove_organization(self, org):
+        """
+        Remove an organization from the application group
+
+        :param org: group name or msp id of organization
+        :return: self
+        :rtype: ChannelConfig
+        """
+        groups = self._application()["groups"]
+        group = self.organization(org)
+        for name in [name for name, g in groups.items() if g is group]:
+            del groups[name]
+        return self
+
+    def compute(self):
+        """
+        Config update from the fetched config to the mutated config
+
+        Signatures are kept as long as the update is unchanged.
+
+        :return: marshaled config update
+        :rtype: bytes
+        """
+        if self.original is None:
+            raise ValueError("config of channel {} is not loaded".format(self.channel_id))
+        updated = protolator.to_message("common.Config", self.config)
+        update = protolator.compute_update(
+            self.original, updated, self.channel_id
+        ).SerializeToString(deterministic=True)
+        if update != self._update:
+            self._update = update
+            self._signatures = []
+        return self._update
+
+    def sign(self, *envs):
+        """
+        Sign the config update, e.g. by admins of every organization it touches
+
+        :param envs: peer cli environments of signing identities
+        :return: self
+        :rtype: ChannelConfig
+        """
+        update = self.compute()
+        for env in envs:
+            signer = self.pool.signer(env)
+            if any(creator == signer.creator for creator, _ in self._signatures):
+                continue
+            signature_header = protos.SignatureHeader(
+                creator=signer.creator, nonce=os.urandom(24)
+            ).SerializeToString()
+            self._signatures.append((signer.creator, protos.ConfigSignature(
+                signature_header=signature_header,
+                signature=signer.sign(signature_header + update),
+            )))
+        return self
+
+    def envelope(self):
+        """
+        Config update transaction signed by the submitting identity
+
+        The submitting identity also signs the update, as peer channel update does.
+
+        :return: marshaled envelope, as written by peer channel signconfigtx
+        :rtype: bytes
+        """
+        self.sign(self.env)
+        data = protos.ConfigUpdateEnvelope(
+            config_update=self._update,
+            signatures=[signature for _, signature in self._signatures],
+        ).SerializeToString()
+        orderer = self.pool.orderer(self.env, self.orderer_url)
+        return orderer.envelope(protos.CONFIG_UPDATE, self.channel_id, data).SerializeToString()
+
+    def submit(self):
+        """
+        Submit every mutation as one config update transaction
+
+        :return: self, fetch again before further updates
+        :rtype: ChannelConfig
+        """
+        envelope = protos.Envelope.FromString(self.envelope())
+        self.pool.orderer(self.env, self.orderer_url).broadcast(envelope)
+        LOG.info("Submitted config update of channel %s signed by %s identities",
+                 self.channel_id, len(self._signatures))
+        # versions of the new config are assigned by the orderer
+        self.original = None
+        self.config = None
+        self._update = None
+        self._signatures = []
+        return self
@@ -1,14 +1,111 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-import yaml
 import os
+import threading
 from copy import deepcopy
+
+from django.db import IntegrityError, transaction
+
 from api.config import CELLO_HOME
+from api.common.enums import ConfigTxOrgType, ConfigTxProfileType
+from api.models import (
+    NetworkConfig,
+    NetworkConfigConsenter,
+    NetworkConfigOrganization,
+    NetworkConfigProfile,
+)
+from api.utils.template import load_template, load_yaml, dump_yaml
+
+GENESIS_PROFILE = "TwoOrgsOrdererGenesis"
+CONSORTIUM = "SampleConsortium"
+# channel profiles are emitted to <network>/profiles/<profile>/configtx.yaml
+PROFILES_DIR = "profiles"
+SECTIONS = ("Capabilities", "Application", "Orderer", "Channel")
+
 
 def load_configtx(filepath):
-     with open(filepath, 'r', encoding='utf-8') as f:
-           return yaml.load(f,Loader=yaml.FullLoader)
+    return load_template(filepath)
+
+
+def config_path(network, profile, filepath=CELLO_HOME):
+    """directory holding the configtx.yaml which defines a profile
+            param:
+                network: network's name
+                profile: profile
+                filepath: cello's working directory
+            return: directory for configtxgen -configPath
+    """
+    path = os.path.join(filepath, network, PROFILES_DIR, profile)
+    if os.path.exists(os.path.join(path, "configtx.yaml")):
+        return path + "/"
+    return os.path.join(filepath, network) + "/"
+
+
+def _write(path, data):
+    """write yaml atomically, readers see either the old or the new file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    with open(tmp, "w", encoding="utf-8") as f:
+        dump_yaml(data, f, sort_keys=False)
+    os.replace(tmp, path)
+
+
+def _organization(org):
+    data = dict(Name=org.name, ID=org.msp_id, MSPDir=org.msp_dir, Policies=deepcopy(org.policies))
+    if org.type == ConfigTxOrgType.Orderer.value:
+        data["OrdererEndpoints"] = list(org.orderer_endpoints)
+    return data
+
+
+def _sections(config, organizations):
+    """Capabilities, Application, Orderer and Channel sections of configtx.yaml"""
+    capabilities = config.defaults["Capabilities"]
+    application = deepcopy(config.defaults["Application"])
+    application["Capabilities"] = deepcopy(capabilities["Application"])
+    orderer = deepcopy(config.defaults["Orderer"])
+    orderer["Addresses"] = []
+    consenters = []
+    for org in organizations:
+        if org.type != ConfigTxOrgType.Orderer.value:
+            continue
+        orderer["Addresses"] += org.orderer_endpoints
+        consenters += [dict(Host=c.host, Port=c.port, ClientTLSCert=c.client_tls_cert,
+                            ServerTLSCert=c.server_tls_cert) for c in org.consenters.all()]
+    orderer["Policies"] = dict(
+        Readers=dict(Type="ImplicitMeta", Rule="ANY Readers"),
+        Writers=dict(Type="ImplicitMeta", Rule="ANY Writers"),
+        Admins=dict(Type="ImplicitMeta", Rule="MAJORITY Admins"),
+        BlockValidation=dict(Type="ImplicitMeta", Rule="ANY Writers")
+    )
+    orderer.setdefault("EtcdRaft", {})["Consenters"] = consenters
+    channel = deepcopy(config.defaults["Channel"])
+    channel["Capabilities"] = deepcopy(capabilities["Channel"])
+    return dict(
+        Capabilities=deepcopy(capabilities),
+        Application=application,
+        Orderer=orderer,
+        Channel=channel,
+    )
+
+
+def _profile(profile, sections):
+    orgs = list(profile.organizations.all())
+    peers = [_organization(org) for org in orgs if org.type == ConfigTxOrgType.Peer.value]
+    data = deepcopy(sections["Channel"])
+    if profile.type == ConfigTxProfileType.Genesis.value:
+        data["Orderer"] = deepcopy(sections["Orderer"])
+        data["Orderer"]["Organizations"] = [
+            _organization(org) for org in orgs if org.type == ConfigTxOrgType.Orderer.value
+        ]
+        data["Orderer"]["Capabilities"] = deepcopy(sections["Capabilities"]["Orderer"])
+        data["Consortiums"] = {profile.consortium: {"Organizations": peers}}
+    else:
+        data["Consortium"] = profile.consortium
+        data["Application"] = deepcopy(sections["Application"])
+        data["Application"]["Organizations"] = peers
+    return data
+
 
 class ConfigTX:
     """Class represents crypto-config yaml."""
@@ -36,6 +133,105 @@ class ConfigTX:
         #                     'MaxInflightBlocks': 5,
         #                     'SnapshotIntervalSize': "20 MB"} if not raft_option else raft_option
 
+    def _path(self, *names):
+        return os.path.join(self.filepath, self.network, *names)
+
+    def _lock(self, init=None):
+        """config of network, locked until the end of the transaction
+                param:
+                    init: creates the config if there is none, the
+                          configtx.yaml of network is imported by default
+                return: NetworkConfig
+        """
+        config = NetworkConfig.objects.select_for_update().filter(network=self.network).first()
+        if config is not None:
+            return config
+        try:
+            with transaction.atomic():
+                (init or self._import)()
+        except IntegrityError:
+            # created by a concurrent request
+            pass
+        return NetworkConfig.objects.select_for_update().get(network=self.network)
+
+    def _import(self):
+        """import configtx.yaml of a network created before configs were stored"""
+        with open(self._path("configtx.yaml"), "r", encoding="utf-8") as f:
+            configtx = load_yaml(f)
+        config = NetworkConfig.objects.create(
+            network=self.network,
+            defaults={k: configtx.get(k) or {} for k in SECTIONS},
+            emitted_generation=1,
+        )
+        profiles = configtx.get("Profiles") or {}
+        orderer_ids = set(
+            org["ID"] for p in profiles.values()
+            for org in (p.get("Orderer") or {}).get("Organizations") or []
+        )
+        rows = {}
+        for org in configtx.get("Organizations") or []:
+            is_orderer = "OrdererEndpoints" in org or org["ID"] in orderer_ids
+            rows[org["ID"]] = NetworkConfigOrganization.objects.create(
+                config=config, name=org["Name"], msp_id=org["ID"], msp_dir=org.get("MSPDir", ""),
+                type=(ConfigTxOrgType.Orderer if is_orderer else ConfigTxOrgType.Peer).value,
+                policies=org.get("Policies") or {}, orderer_endpoints=org.get("OrdererEndpoints") or [],
+            )
+        orderer_rows = [r for r in rows.values() if r.type == ConfigTxOrgType.Orderer.value]
+        for c in ((configtx.get("Orderer") or {}).get("EtcdRaft") or {}).get("Consenters") or []:
+            endpoint = "{}:{}".format(c["Host"], c["Port"])
+            owner = next((r for r in orderer_rows if endpoint in r.orderer_endpoints), None)
+            if owner is None and orderer_rows:
+                owner = orderer_rows[0]
+            if owner is not None:
+                NetworkConfigConsenter.objects.create(
+                    organization=owner, host=c["Host"], port=c["Port"],
+                    client_tls_cert=c.get("ClientTLSCert", ""), server_tls_cert=c.get("ServerTLSCert", ""),
+                )
+        for name, p in profiles.items():
+            if "Orderer" in p:
+                orgs = list(p["Orderer"].get("Organizations") or [])
+                consortiums = p.get("Consortiums") or {}
+                consortium = next(iter(consortiums), CONSORTIUM)
+                for members in consortiums.values():
+                    orgs += (members or {}).get("Organizations") or []
+                kind = ConfigTxProfileType.Genesis
+            else:
+                orgs = (p.get("Application") or {}).get("Organizations") or []
+                consortium = p.get("Consortium", CONSORTIUM)
+                kind = ConfigTxProfileType.Channel
+            profile = NetworkConfigProfile.objects.create(
+                config=config, name=name, type=kind.value, consortium=consortium,
+                emitted_generation=config.generation,
+            )
+            profile.organizations.set([rows[o["ID"]] for o in orgs if o["ID"] in rows])
+        return config
+
+    def _emit(self, config):
+        """render configtx.yaml files whose content changed since they were emitted"""
+        organizations = list(config.organizations.prefetch_related("consenters"))
+        sections = None
+        if config.emitted_generation != config.generation:
+            sections = _sections(config, organizations)
+            configtx = dict(Organizations=[_organization(org) for org in organizations], **sections)
+            configtx["Profiles"] = {
+                p.name: _profile(p, sections)
+                for p in config.profiles.filter(type=ConfigTxProfileType.Genesis.value)
+            }
+            _write(self._path("configtx.yaml"), configtx)
+            config.emitted_generation = config.generation
+            config.save(update_fields=["emitted_generation"])
+        stale = config.profiles.filter(type=ConfigTxProfileType.Channel.value).exclude(
+            emitted_generation=config.generation)
+        for profile in stale.prefetch_related("organizations"):
+            if sections is None:
+                sections = _sections(config, organizations)
+            members = list(profile.organizations.all())
+            configtx = dict(Organizations=[_organization(org) for org in members], **sections)
+            configtx["Profiles"] = {profile.name: _profile(profile, sections)}
+            _write(self._path(PROFILES_DIR, profile.name, "configtx.yaml"), configtx)
+            profile.emitted_generation = config.generation
+            profile.save(update_fields=["emitted_generation"])
+
     def create(self, consensus, orderers, peers, orderer_cfg=None, application=None, option=None):
         """create the cryptotx.yaml
                 param:
@@ -46,90 +242,65 @@ class ConfigTX:
                     application: application
                     option: option
                 return:
-        """ 
-        OrdererDefaults = self.template["Orderer"]
-        ChannelDefaults = self.template["Channel"]
-        ApplicationDefaults = self.template["Application"]
-        ChannelCapabilities = self.template["Capabilities"]["Channel"]
-        OrdererCapabilities = self.template["Capabilities"]["Orderer"]
-        ApplicationCapabilities = self.template["Capabilities"]["Application"]         
-        
-        OrdererOrganizations = []
-        OrdererAddress = []
-        Consenters = []
-        
+        """
+        organizations = []
         for orderer in orderers:
             OrdererMSP = orderer["name"].capitalize()+"Orderer"
-            OrdererOrg = dict(Name=orderer["name"].split(".")[0].capitalize() + "Orderer",
-                                             ID='{}MSP'.format(OrdererMSP),
-                                             MSPDir='{}/{}/crypto-config/ordererOrganizations/{}/msp'.format(self.filepath,orderer["name"],orderer['name'].split(".", 1)[1]),
-                                             Policies=dict(Readers=dict(Type="Signature",Rule="OR('{}MSP.member')".format(OrdererMSP)),
-                                                           Writers=dict(Type="Signature",Rule="OR('{}MSP.member')".format(OrdererMSP)),
-                                                           Admins=dict(Type="Signature",Rule="OR('{}MSP.admin')".format(OrdererMSP)))
-                        )
-            for host in orderer['hosts']:
-                OrdererAddress.append('{}.{}:{}'.format(host['name'], orderer['name'].split(".", 1)[1], 7050))
-                Consenters.append(dict(
-                    Host='{}.{}'.format(host['name'], orderer['name'].split(".", 1)[1]),
-                    Port=7050,
-                    ClientTLSCert='{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}.{}/tls/server.crt'
-                                           .format(self.filepath, orderer['name'], orderer['name'].split(".", 1)[1],host['name'], orderer['name'].split(".", 1)[1]),
-                    ServerTLSCert='{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}.{}/tls/server.crt'
-                                           .format(self.filepath, orderer['name'], orderer['name'].split(".", 1)[1], host['name'], orderer['name'].split(".", 1)[1])))
-            OrdererOrg["OrdererEndpoints"] = deepcopy(OrdererAddress)
-            OrdererOrganizations.append(OrdererOrg)
-
-        PeerOrganizations = []
-
+            domain = orderer["name"].split(".", 1)[1]
+            organizations.append(dict(
+                name=orderer["name"].split(".")[0].capitalize() + "Orderer",
+                msp_id='{}MSP'.format(OrdererMSP),
+                type=ConfigTxOrgType.Orderer.value,
+                msp_dir='{}/{}/crypto-config/ordererOrganizations/{}/msp'.format(self.filepath, orderer["name"], domain),
+                policies=dict(Readers=dict(Type="Signature", Rule="OR('{}MSP.member')".format(OrdererMSP)),
+                              Writers=dict(Type="Signature", Rule="OR('{}MSP.member')".format(OrdererMSP)),
+                              Admins=dict(Type="Signature", Rule="OR('{}MSP.admin')".format(OrdererMSP))),
+                orderer_endpoints=['{}.{}:{}'.format(host['name'], domain, 7050) for host in orderer['hosts']],
+                consenters=[dict(
+                    host='{}.{}'.format(host['name'], domain),
+                    port=7050,
+                    client_tls_cert='{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}.{}/tls/server.crt'
+                                    .format(self.filepath, orderer['name'], domain, host['name'], domain),
+                    server_tls_cert='{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}.{}/tls/server.crt'
+                                    .format(self.filepath, orderer['name'], domain, host['name'], domain),
+                ) for host in orderer['hosts']],
+            ))
         for peer in peers:
             PeerMSP = peer["name"].capitalize()
-            PeerOrganizations.append(dict(Name=peer["name"].split(".")[0].capitalize(),
-                                          ID='{}MSP'.format(PeerMSP),
-                                          MSPDir='{}/{}/crypto-config/peerOrganizations/{}/msp'.format(self.filepath,peer['name'],peer['name']),
-                                          #AnchorPeers=[{'Port': peer["hosts"][0]["port"], 'Host': '{}.{}'.format(peer["hosts"][0]["name"],peer["name"])}],
-                                          Policies=dict(Readers=dict(Type="Signature",Rule="OR('{}MSP.member')".format(PeerMSP)),
-                                                        Writers=dict(Type="Signature",Rule="OR('{}MSP.member')".format(PeerMSP)),
-                                                        Admins=dict(Type="Signature",Rule="OR('{}MSP.admin')".format(PeerMSP)),
-                                                        Endorsement=dict(Type="Signature",Rule="OR('{}MSP.member')".format(PeerMSP)))
-                                          ))
-        Organizations = OrdererOrganizations + PeerOrganizations
-        Capabilities = dict(
-            Channel=ChannelCapabilities,
-            Orderer=OrdererCapabilities,
-            Application=ApplicationCapabilities
-        )
-        Application = deepcopy(ApplicationDefaults)
-        Application["Capabilities"] = Capabilities["Application"]
-        Orderer = deepcopy(OrdererDefaults)
-        Orderer["Addresses"] = deepcopy(OrdererAddress)
-        Orderer["Policies"] = dict(
-                Readers=dict(Type="ImplicitMeta", Rule="ANY Readers"),
-                Writers=dict(Type="ImplicitMeta", Rule="ANY Writers"),
-                Admins=dict(Type="ImplicitMeta", Rule="MAJORITY Admins"),
-                BlockValidation=dict(Type="ImplicitMeta",Rule="ANY Writers")
-            )
-        Orderer["EtcdRaft"]["Consenters"] = deepcopy(Consenters)
-        Channel = deepcopy(ChannelDefaults)
-        Channel["Capabilities"] = Capabilities["Channel"]
-        Profiles = {}
-        Profiles["TwoOrgsOrdererGenesis"] = deepcopy(Channel)
-        Profiles["TwoOrgsOrdererGenesis"]["Orderer"] = deepcopy(Orderer)
-        Profiles["TwoOrgsOrdererGenesis"]["Orderer"]["Organizations"] = OrdererOrganizations
-        Profiles["TwoOrgsOrdererGenesis"]["Orderer"]["Capabilities"] = Capabilities["Orderer"]
-        Profiles["TwoOrgsOrdererGenesis"]["Consortiums"] = {'SampleConsortium': {'Organizations': deepcopy(PeerOrganizations)}}
-
-        configtx = dict(
-            Organizations=Organizations,
-            Capabilities=Capabilities,
-            Application=Application,
-            Orderer=Orderer,
-            Channel=Channel,
-            Profiles=Profiles
-        )
-        os.system('mkdir -p {}/{}'.format(self.filepath, self.network))
+            organizations.append(dict(
+                name=peer["name"].split(".")[0].capitalize(),
+                msp_id='{}MSP'.format(PeerMSP),
+                type=ConfigTxOrgType.Peer.value,
+                msp_dir='{}/{}/crypto-config/peerOrganizations/{}/msp'.format(self.filepath, peer['name'], peer['name']),
+                policies=dict(Readers=dict(Type="Signature", Rule="OR('{}MSP.member')".format(PeerMSP)),
+                              Writers=dict(Type="Signature", Rule="OR('{}MSP.member')".format(PeerMSP)),
+                              Admins=dict(Type="Signature", Rule="OR('{}MSP.admin')".format(PeerMSP)),
+                              Endorsement=dict(Type="Signature", Rule="OR('{}MSP.member')".format(PeerMSP))),
+                orderer_endpoints=[],
+                consenters=[],
+            ))
 
-        with open('{}/{}/configtx.yaml'.format(self.filepath, self.network), 'w', encoding='utf-8') as f:
-            yaml.dump(configtx, f, sort_keys=False)
+        with transaction.atomic():
+            config = self._lock(lambda: NetworkConfig.objects.create(network=self.network))
+            config.defaults = {k: self.template[k] for k in SECTIONS}
+            config.generation += 1
+            config.save(update_fields=["defaults", "generation", "updated_at"])
+
+            rows = []
+            for org in organizations:
+                consenters = org.pop("consenters")
+                row, _ = NetworkConfigOrganization.objects.update_or_create(
+                    config=config, msp_id=org.pop("msp_id"), defaults=org)
+                row.consenters.all().delete()
+                NetworkConfigConsenter.objects.bulk_create(
+                    [NetworkConfigConsenter(organization=row, **c) for c in consenters])
+                rows.append(row)
+            config.organizations.exclude(id__in=[row.id for row in rows]).delete()
+            profile, _ = NetworkConfigProfile.objects.update_or_create(
+                config=config, name=GENESIS_PROFILE,
+                defaults=dict(type=ConfigTxProfileType.Genesis.value, consortium=CONSORTIUM))
+            profile.organizations.set(rows)
+            self._emit(config)
 
     def createChannel(self, name, organizations):
         """create the channel.tx
@@ -139,38 +310,21 @@ class ConfigTX:
                 return:
         """
         try:
-            with open('{}/{}/{}'.format(self.filepath, self.network, "configtx.yaml"), 'r+', encoding='utf-8') as f:
-                configtx = yaml.load(f, Loader=yaml.FullLoader)
-                Profiles = configtx["Profiles"]
-                Channel = configtx["Channel"]
-                Application = configtx["Application"]
-                Capabilities = configtx["Capabilities"]["Application"]        
-                PeerOrganizations = []
-                for org in configtx["Organizations"]:
-                    for item in organizations:
-                        if org["ID"] == item.capitalize()+"MSP":
-                            PeerOrganizations.append(org)
+            with transaction.atomic():
+                config = self._lock()
+                PeerOrganizations = list(config.organizations.filter(
+                    type=ConfigTxOrgType.Peer.value,
+                    msp_id__in=[item.capitalize()+"MSP" for item in organizations]))
                 if PeerOrganizations == []:
                     raise Exception("can't find organnization")
-                Profiles[name] = deepcopy(Channel)
-                Profiles[name]["Consortium"] = "SampleConsortium"
-                Profiles[name]["Application"] = deepcopy(Application)
-                Profiles[name]["Application"]["Organizations"] = deepcopy(PeerOrganizations)
-                Profiles[name]["Application"]["Capabilities"] = deepcopy(Capabilities)
-
-            with open('{}/{}/{}'.format(self.filepath, self.network, "configtx.yaml"), 'w', encoding='utf-8') as f:
-                yaml.safe_dump(configtx, f, sort_keys=False)
+                profile, _ = NetworkConfigProfile.objects.update_or_create(
+                    config=config, name=name,
+                    defaults=dict(type=ConfigTxProfileType.Channel.value, consortium=CONSORTIUM,
+                                  emitted_generation=0))
+                profile.organizations.set(PeerOrganizations)
+                # only the file of this profile is written
+                self._emit(config)
 
         except Exception as e:
             err_msg = "Configtx create channel failed for {}!".format(e)
             raise Exception(err_msg)
-
-
-if __name__ == "__main__":
-    orderers=[{"name":"org1.cello.com","hosts":[{"name": "orderer1", "port":8051}]}]
-    # peers = [{"name": "org1.cello.com", "hosts": [{"name": "foo", "port": 7051},{"name": "car", "port": 7052}]},
-    #         {"name": "org2.cello.com", "hosts": [{"name": "zoo", "port": 7053}]}]
-    peers = [{"name": "org1.cello.com", "hosts": [{"name": "foo", "port": 7051}, {"name": "car", "port": 7052}]}]
-    ConfigTX("test3").create(consensus="etcdraft", orderers=orderers, peers=peers)
-    # tx = ConfigTX("test3")
-    # print(tx.template)
@@ -1,8 +1,10 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-from subprocess import call
+from api.lib.runner import run
 from api.config import CELLO_HOME, FABRIC_TOOL
+from api.utils import artifact_cache
+from api.lib.configtxgen.configtx import config_path
 
 
 class ConfigTxGen:
@@ -22,6 +24,28 @@ class ConfigTxGen:
         self.filepath = filepath
         self.version = version
 
+    def _generate(self, kind, flag, profile, channelid, output):
+        """run configtxgen unless an identical artifact is cached
+                param:
+                    kind: artifact kind
+                    flag: configtxgen output flag
+                    profile: profile
+                    channelid: channelid
+                    output: path of artifact
+                return:
+        """
+        path = config_path(self.network, profile, self.filepath)
+        key = artifact_cache.artifact_key(kind, path, profile, channelid, self.version)
+        if artifact_cache.fetch(key, output):
+            return
+        res = run([self.configtxgen, "-configPath", path,
+                   "-profile", "{}".format(profile),
+                   flag, output,
+                   "-channelID", "{}".format(channelid)])
+        if res.returncode != 0:
+            raise Exception(str(res.stderr, encoding="utf-8"))
+        artifact_cache.store(key, output)
+
     def genesis(self, profile="TwoOrgsOrdererGenesis", channelid="testchainid", outputblock="genesis.block"):
         """generate gensis
                 param:
@@ -31,10 +55,8 @@ class ConfigTxGen:
                 return:
         """
         try:
-            call([self.configtxgen, "-configPath", "{}/{}/".format(self.filepath, self.network),
-                  "-profile", "{}".format(profile),
-                  "-outputBlock", "{}/{}/{}".format(self.filepath, self.network, outputblock),
-                  "-channelID", "{}".format(channelid)])
+            self._generate("genesis", "-outputBlock", profile, channelid,
+                           "{}/{}/{}".format(self.filepath, self.network, outputblock))
         except Exception as e:
             err_msg = "configtxgen genesis fail! "
             raise Exception(err_msg + str(e))
@@ -48,10 +70,8 @@ class ConfigTxGen:
                 return:
         """
         try:
-            call([self.configtxgen, "-configPath", "{}/{}/".format(self.filepath, self.network),
-                  "-profile", "{}".format(profile),
-                  "-outputCreateChannelTx", "{}/{}/{}".format(self.filepath, self.network, "channel-artifacts/"+outputCreateChannelTx),
-                  "-channelID", "{}".format(channelid)])
+            self._generate("channeltx", "-outputCreateChannelTx", profile, channelid,
+                           "{}/{}/{}".format(self.filepath, self.network, "channel-artifacts/"+outputCreateChannelTx))
         except Exception as e:
             err_msg = "configtxgen genesis fail! "
             raise Exception(err_msg + str(e))
@@ -1,19 +1,69 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-from subprocess import call
+import json
+import os
+
+from api.lib.runner import run
 from api.config import FABRIC_TOOL
 
+# "native" translates in process, "binary" runs the fabric configtxlator tool
+CONFIGTXLATOR_BACKEND = os.getenv("CONFIGTXLATOR_BACKEND", "native")
+
 
 class ConfigTxLator:
     """
     Class represents configtxlator CLI.
     """
 
-    def __init__(self, filepath="", configtxlator=FABRIC_TOOL, version="2.2.0"):
+    def __init__(self, filepath="", configtxlator=FABRIC_TOOL, version="2.2.0", backend=CONFIGTXLATOR_BACKEND):
         self.configtxlator = configtxlator + "/configtxlator"
         self.filepath = filepath
         self.version = version
+        self.backend = backend
+
+    def _path(self, name):
+        return "{}/{}".format(self.filepath, name)
+
+    @staticmethod
+    def _native():
+        from api.lib.configtxlator import protolator
+
+        return protolator
+
+    def encode(self, type, obj):
+        """
+        Marshal a message from its JSON structure, in memory.
+
+        params:
+            type: The type of protobuf structure to encode to. For example, 'common.Config'.
+            obj: The JSON document as dict.
+        return: marshaled message
+        """
+        return self._native().encode(type, obj)
+
+    def decode(self, type, data):
+        """
+        Translate a marshaled message to its JSON structure, in memory.
+
+        params:
+            type: The type of protobuf structure to decode from. For example, 'common.Config'.
+            data: marshaled message.
+        return: JSON document as dict
+        """
+        return self._native().decode(type, data)
+
+    def compute_update_bytes(self, original, updated, channel_id):
+        """
+        Compute the config update between two marshaled common.Config messages, in memory.
+
+        params:
+            original: The original config message.
+            updated: The updated config message.
+            channel_id: The name of the channel for this update.
+        return: marshaled common.ConfigUpdate
+        """
+        return self._native().compute_update(original, updated, channel_id).SerializeToString()
 
     def proto_encode(self, input, type, output):
         """
@@ -25,13 +75,21 @@ class ConfigTxLator:
             output: A file to write the output to.
         """
         try:
-            call([self.configtxlator,
-                  "--input", "{}/{}".format(self.filepath, input),
-                  "--type", type,
-                  "--output", "{}/{}".format(self.filepath, output),
-                  ])
+            if self.backend == "native":
+                with open(self._path(input), "r", encoding="utf-8") as f:
+                    data = self.encode(type, json.load(f))
+                with open(self._path(output), "wb") as f:
+                    f.write(data)
+                return
+            res = run([self.configtxlator, "proto_encode",
+                       "--input", self._path(input),
+                       "--type", type,
+                       "--output", self._path(output),
+                       ])
+            if res.returncode != 0:
+                raise Exception(str(res.stderr, encoding="utf-8"))
         except Exception as e:
-            err_msg = "configtxlator proto decode fail! "
+            err_msg = "configtxlator proto encode fail! "
             raise Exception(err_msg + str(e))
 
     def proto_decode(self, input, type, output):
@@ -44,11 +102,19 @@ class ConfigTxLator:
             output: A file to write the output to.
         """
         try:
-            call([self.configtxlator,
-                  "--input", "{}/{}".format(self.filepath, input),
-                  "--type", type,
-                  "--output", "{}/{}".format(self.filepath, output),
-                  ])
+            if self.backend == "native":
+                with open(self._path(input), "rb") as f:
+                    obj = self.decode(type, f.read())
+                with open(self._path(output), "w", encoding="utf-8") as f:
+                    json.dump(obj, f, indent=2)
+                return
+            res = run([self.configtxlator, "proto_decode",
+                       "--input", self._path(input),
+                       "--type", type,
+                       "--output", self._path(output),
+                       ])
+            if res.returncode != 0:
+                raise Exception(str(res.stderr, encoding="utf-8"))
         except Exception as e:
             err_msg = "configtxlator proto decode fail! "
             raise Exception(err_msg + str(e))
@@ -65,12 +131,22 @@ class ConfigTxLator:
             output: A file to write the JSON document to.
         """
         try:
-            call([self.configtxlator,
-                  "--original", original,
-                  "--updated", updated,
-                  "--channel_id", channel_id,
-                  "--output", "{}/{}".format(self.filepath, output)
-                  ])
+            if self.backend == "native":
+                with open(original, "rb") as f:
+                    original_config = f.read()
+                with open(updated, "rb") as f:
+                    updated_config = f.read()
+                with open(self._path(output), "wb") as f:
+                    f.write(self.compute_update_bytes(original_config, updated_config, channel_id))
+                return
+            res = run([self.configtxlator, "compute_update",
+                       "--original", original,
+                       "--updated", updated,
+                       "--channel_id", channel_id,
+                       "--output", self._path(output)
+                       ])
+            if res.returncode != 0:
+                raise Exception(str(res.stderr, encoding="utf-8"))
         except Exception as e:
             err_msg = "configtxlator compute update fail! "
             raise Exception(err_msg + str(e))
@@ -0,0 +1,432 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""
+In-process replacement of configtxlator proto_encode, proto_decode and
+compute_update.
+
+Messages are translated to the same JSON structure configtxlator prints:
+opaque bytes fields holding known messages (config values, policies,
+envelopes, headers) are decoded in place, everything else is base64.
+"""
+import base64
+
+from google.protobuf.json_format import MessageToDict, ParseDict
+
+from api.lib.peer import protos
+
+# config value key -> message of value
+VALUE_TYPES = {
+    "HashingAlgorithm": protos.HashingAlgorithm,
+    "BlockDataHashingStructure": protos.BlockDataHashingStructure,
+    "OrdererAddresses": protos.OrdererAddresses,
+    "Endpoints": protos.OrdererAddresses,
+    "Consortium": protos.Consortium,
+    "Capabilities": protos.Capabilities,
+    "ACLs": protos.ACLs,
+    "MSP": protos.MSPConfig,
+    "AnchorPeers": protos.AnchorPeers,
+    "ConsensusType": protos.ConsensusType,
+    "BatchSize": protos.BatchSize,
+    "BatchTimeout": protos.BatchTimeout,
+    "ChannelRestrictions": protos.ChannelRestrictions,
+    "KafkaBrokers": protos.KafkaBrokers,
+}
+# msp.MSPConfig.type of fabric msp
+FABRIC_MSP = 0
+
+
+def _to_dict(message):
+    try:
+        return MessageToDict(
+            message, preserving_proto_field_name=True,
+            always_print_fields_with_no_presence=True,
+        )
+    except TypeError:
+        # protobuf < 5
+        return MessageToDict(
+            message, preserving_proto_field_name=True,
+            including_default_value_fields=True,
+        )
+
+
+def _convert(obj, field, cls, decode, inner=None):
+    """
+    Decode a base64 field of obj into the dict of message cls, or encode it back
+    """
+    if decode:
+        message = cls.FromString(base64.b64decode(obj.get(field) or ""))
+        obj[field] = _to_dict(message)
+        if inner:
+            inner(obj[field], decode)
+    elif isinstance(obj.get(field), dict):
+        if inner:
+            inner(obj[field], decode)
+        obj[field] = base64.b64encode(
+            ParseDict(obj[field], cls()).SerializeToString()
+        ).decode("ascii")
+
+
+def _msp_principal(principal, decode):
+    if principal.get("principal_classification", "ROLE") == "ROLE":
+        _convert(principal, "principal", protos.MSPRole, decode)
+
+
+def _signature_policy(policy, decode):
+    for principal in policy.get("identities", []):
+        _msp_principal(principal, decode)
+
+
+def _policy(policy, decode):
+    policy_type = policy.get("type", 0)
+    if policy_type == protos.SIGNATURE_POLICY:
+        _convert(policy, "value", protos.SignaturePolicyEnvelope, decode, _signature_policy)
+    elif policy_type == protos.IMPLICIT_META_POLICY:
+        _convert(policy, "value", protos.ImplicitMetaPolicy, decode)
+
+
+def _msp(msp, decode):
+    if msp.get("type", FABRIC_MSP) == FABRIC_MSP:
+        _convert(msp, "config", protos.FabricMSPConfig, decode)
+
+
+def _consensus_type(consensus, decode):
+    if consensus.get("type") == "etcdraft":
+        _convert(consensus, "metadata", protos.ConfigMetadata, decode)
+
+
+VALUE_HOOKS = {
+    "MSP": _msp,
+    "ConsensusType": _consensus_type,
+}
+
+
+def _config_group(group, decode):
+    for sub_group in group.get("groups", {}).values():
+        _config_group(sub_group, decode)
+    for key, value in group.get("values", {}).items():
+        if key in VALUE_TYPES:
+            _convert(value, "value", VALUE_TYPES[key], decode, VALUE_HOOKS.get(key))
+    for policy in group.get("policies", {}).values():
+        if policy.get("policy"):
+            _policy(policy["policy"], decode)
+
+
+def _config(config, decode):
+    if config.get("channel_group"):
+        _config_group(config["channel_group"], decode)
+
+
+def _config_update(update, decode):
+    for field in ("read_set", "write_set"):
+        if update.get(field):
+            _config_group(update[field], decode)
+
+
+def _signature_header(header, decode):
+    _convert(header, "creator", protos.SerializedIdentity, decode)
+
+
+def _config_update_envelope(envelope, decode):
+    _convert(envelope, "config_update", protos.ConfigUpdate, decode, _config_update)
+    for signature in envelope.get("signatures", []):
+        _convert(signature, "signature_header", protos.SignatureHeader, decode, _signature_header)
+
+
+def _config_envelope(envelope, decode):
+    if envelope.get("config"):
+        _config(envelope["config"], decode)
+    if envelope.get("last_update"):
+        _envelope(envelope["last_update"], decode)
+
+
+PAYLOAD_TYPES = {
+    protos.CONFIG: (protos.ConfigEnvelope, _config_envelope),
+    protos.CONFIG_UPDATE: (protos.ConfigUpdateEnvelope, _config_update_envelope),
+}
+
+
+def _payload(payload, decode):
+    header = payload.get("header") or {}
+    if decode:
+        header_type = protos.ChannelHeader.FromString(
+            base64.b64decode(header.get("channel_header") or "")
+        ).type
+    else:
+        header_type = (header.get("channel_header") or {}).get("type", 0)
+    # data is translated first, its type is read from the channel header
+    if header_type in PAYLOAD_TYPES:
+        cls, inner = PAYLOAD_TYPES[header_type]
+        _convert(payload, "data", cls, decode, inner)
+    if header:
+        _convert(header, "channel_header", protos.ChannelHeader, decode)
+        _convert(header, "signature_header", protos.SignatureHeader, decode, _signature_header)
+
+
+def _envelope(envelope, decode):
+    _convert(envelope, "payload", protos.Payload, decode, _payload)
+
+
+def _block(block, decode):
+    data = (block.get("data") or {}).get("data", [])
+    for i, envelope in enumerate(data):
+        holder = {"envelope": envelope}
+        _convert(holder, "envelope", protos.Envelope, decode, _envelope)
+        data[i] = holder["envelope"]
+
+
+# configtxlator type -> message and translation of its nested fields
+TYPES = {
+    "common.Block": (protos.Block, _block),
+    "common.Envelope": (protos.Envelope, _envelope),
+    "common.Payload": (protos.Payload, _payload),
+    "common.Config": (protos.Config, _config),
+    "common.ConfigEnvelope": (protos.ConfigEnvelope, _config_envelope),
+    "common.ConfigUpdate": (protos.ConfigUpdate, _config_update),
+    "common.ConfigUpdateEnvelope": (protos.ConfigUpdateEnvelope, _config_update_envelope),
+    "common.ConfigGroup": (protos.ConfigGroup, _config_group),
+}
+
+
+def _type(type_name):
+    try:
+        return TYPES[type_name]
+    except KeyError:
+        raise ValueError("unsupported message type {}".format(type_name))
+
+
+def decode(type_name, data):
+    """
+    Translate a marshaled message to its configtxlator JSON structure
+
+    :param type_name: message type, e.g. common.Config
+    :param data: marshaled message
+    :return: translated message
+    :rtype: dict
+    """
+    cls, walk = _type(type_name)
+    obj = _to_dict(cls.FromString(data))
+    walk(obj, True)
+    return obj
+
+
+def encode(type_name, obj):
+    """
+    Marshal a message from its configtxlator JSON structure
+
+    :param type_name: message type, e.g. common.Config
+    :param obj: translated message, it is not modified
+    :return: marshaled message
+    :rtype: bytes
+    """
+    return to_message(type_name, obj).SerializeToString()
+
+
+def to_message(type_name, obj):
+    """
+    Message from its configtxlator JSON structure
+
+    :param type_name: message type, e.g. common.Config
+    :param obj: translated message, it is not modified
+    :return: message
+    :rtype: protobuf message
+    """
+    cls, walk = _type(type_name)
+    obj = _copy(obj)
+    walk(obj, False)
+    return ParseDict(obj, cls())
+
+
+def _copy(obj):
+    if isinstance(obj, dict):
+        return {k: _copy(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_copy(v) for v in obj]
+    return obj
+
+
+def config_from_block(data):
+    """
+    Channel config carried by a config block
+
+    :param data: marshaled config block
+    :return: config
+    :rtype: protos.Config
+    """
+    block = protos.Block.FromString(data)
+    envelope = protos.Envelope.FromString(block.data.data[0])
+    payload = protos.Payload.FromString(envelope.payload)
+    return protos.ConfigEnvelope.FromString(payload.data).config
+
+
+def _value_equal(key, original, updated):
+    if original == updated:
+        return True
+    if key not in VALUE_TYPES:
+        return False
+    # re-encoding may reorder map entries of an unchanged value
+    try:
+        holders = [{"value": base64.b64encode(v).decode("ascii")} for v in (original, updated)]
+        for holder in holders:
+            _convert(holder, "value", VALUE_TYPES[key], True, VALUE_HOOKS.get(key))
+        return holders[0] == holders[1]
+    except Exception:
+        return False
+
+
+def _policy_equal(original, updated):
+    if original.type != updated.type:
+        return False
+    if original.value == updated.value:
+        return True
+    try:
+        holders = [_to_dict(p) for p in (original, updated)]
+        for holder in holders:
+            _policy(holder, True)
+        return holders[0] == holders[1]
+    except Exception:
+        return False
+
+
+def _policies_update(original, updated):
+    read_set, write_set, same_set, members_updated = {}, {}, {}, False
+    for name, original_policy in original.items():
+        if name not in updated:
+            members_updated = True
+            continue
+        updated_policy = updated[name]
+        if (original_policy.mod_policy == updated_policy.mod_policy
+                and _policy_equal(original_policy.policy, updated_policy.policy)):
+            same_set[name] = protos.ConfigPolicy(version=original_policy.version)
+            continue
+        write_set[name] = protos.ConfigPolicy(
+            version=original_policy.version + 1,
+            mod_policy=updated_policy.mod_policy,
+            policy=updated_policy.policy,
+        )
+    for name, updated_policy in updated.items():
+        if name in original:
+            continue
+        members_updated = True
+        write_set[name] = protos.ConfigPolicy(
+            version=0, mod_policy=updated_policy.mod_policy, policy=updated_policy.policy,
+        )
+    return read_set, write_set, same_set, members_updated
+
+
+def _values_update(original, updated):
+    read_set, write_set, same_set, members_updated = {}, {}, {}, False
+    for name, original_value in original.items():
+        if name not in updated:
+            members_updated = True
+            continue
+        updated_value = updated[name]
+        if (original_value.mod_policy == updated_value.mod_policy
+                and _value_equal(name, original_value.value, updated_value.value)):
+            same_set[name] = protos.ConfigValue(version=original_value.version)
+            continue
+        write_set[name] = protos.ConfigValue(
+            version=original_value.version + 1,
+            mod_policy=updated_value.mod_policy,
+            value=updated_value.value,
+        )
+    for name, updated_value in updated.items():
+        if name in original:
+            continue
+        members_updated = True
+        write_set[name] = protos.ConfigValue(
+            version=0, mod_policy=updated_value.mod_policy, value=updated_value.value,
+        )
+    return read_set, write_set, same_set, members_updated
+
+
+def _groups_update(original, updated):
+    read_set, write_set, same_set, members_updated = {}, {}, {}, False
+    for name, original_group in original.items():
+        if name not in updated:
+            members_updated = True
+            continue
+        group_read_set, group_write_set, group_updated = _group_update(original_group, updated[name])
+        if not group_updated:
+            same_set[name] = group_read_set
+            continue
+        read_set[name] = group_read_set
+        write_set[name] = group_write_set
+    for name, updated_group in updated.items():
+        if name in original:
+            continue
+        members_updated = True
+        _, group_write_set, _ = _group_update(protos.ConfigGroup(), updated_group)
+        group_write_set.version = 0
+        group_write_set.mod_policy = updated_group.mod_policy
+        write_set[name] = group_write_set
+    return read_set, write_set, same_set, members_updated
+
+
+def _group(version, policies=None, values=None, groups=None, mod_policy=""):
+    group = protos.ConfigGroup(version=version, mod_policy=mod_policy)
+    for name, policy in (policies or {}).items():
+        group.policies[name].CopyFrom(policy)
+    for name, value in (values or {}).items():
+        group.values[name].CopyFrom(value)
+    for name, sub_group in (groups or {}).items():
+        group.groups[name].CopyFrom(sub_group)
+    return group
+
+
+def _group_update(original, updated):
+    read_policies, write_policies, same_policies, policies_updated = _policies_update(
+        original.policies, updated.policies)
+    read_values, write_values, same_values, values_updated = _values_update(
+        original.values, updated.values)
+    read_groups, write_groups, same_groups, groups_updated = _groups_update(
+        original.groups, updated.groups)
+
+    if not (policies_updated or values_updated or groups_updated
+            or original.mod_policy != updated.mod_policy):
+        # no member was added or removed, only modified members are in the sets
+        if not (read_policies or write_policies or read_values or write_values
+                or read_groups or write_groups):
+            return _group(original.version), _group(original.version), False
+        return (
+            _group(original.version, read_policies, read_values, read_groups),
+            _group(original.version, write_policies, write_values, write_groups),
+            True,
+        )
+
+    # members which did not change are read and written with their version
+    for read_set, write_set, same_set in (
+        (read_policies, write_policies, same_policies),
+        (read_values, write_values, same_values),
+        (read_groups, write_groups, same_groups),
+    ):
+        read_set.update(same_set)
+        write_set.update(same_set)
+
+    return (
+        _group(original.version, read_policies, read_values, read_groups),
+        _group(original.version + 1, write_policies, write_values, write_groups, updated.mod_policy),
+        True,
+    )
+
+
+def compute_update(original, updated, channel_id):
+    """
+    Config update which transitions a channel from original to updated config
+
+    :param original: original config, marshaled or protos.Config
+    :param updated: updated config, marshaled or protos.Config
+    :param channel_id: channel of update
+    :return: config update
+    :rtype: protos.ConfigUpdate
+    """
+    if isinstance(original, bytes):
+        original = protos.Config.FromString(original)
+    if isinstance(updated, bytes):
+        updated = protos.Config.FromString(updated)
+    read_set, write_set, group_updated = _group_update(
+        original.channel_group, updated.channel_group
+    )
+    if not group_updated:
+        raise ValueError("no differences detected between original and updated config")
+    return protos.ConfigUpdate(channel_id=channel_id, read_set=read_set, write_set=write_set)
@@ -0,0 +1,102 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import logging
+import os
+import shutil
+
+from api.config import FABRIC_CHAINCODE_STORE
+from api.lib.runner import run
+
+LOG = logging.getLogger(__name__)
+
+GO_BINARY = os.getenv("GO_BINARY", "go")
+# module cache shared by every vendoring run, written by go itself
+GO_MODULE_CACHE = os.getenv("GO_MODULE_CACHE", os.path.join(FABRIC_CHAINCODE_STORE, "gomod"))
+# pre-seeded mirror in GOPROXY layout, can be copied to hosts without network
+GO_PROXY_MIRROR = os.getenv("GO_PROXY_MIRROR", os.path.join(FABRIC_CHAINCODE_STORE, "goproxy"))
+# proxy asked when a module is neither in mirror nor cache, "off" for offline hosts
+GO_PROXY_UPSTREAM = os.getenv("GO_PROXY_UPSTREAM", "https://proxy.golang.org")
+# deadline of one go command in seconds
+GO_COMMAND_TIMEOUT = int(os.getenv("GO_COMMAND_TIMEOUT", 600))
+
+
+def go_env(upstream=GO_PROXY_UPSTREAM):
+    """
+    Environment of go commands, resolving modules from cache, mirror, then upstream
+
+    :param upstream: upstream proxy, "off" to never use the network
+    :return: environment
+    :rtype: dict
+    """
+    # modules already in the cache are used without asking any proxy
+    proxies = ["file://{}".format(GO_PROXY_MIRROR)]
+    if upstream != "off":
+        proxies.append(upstream)
+    env = dict(os.environ)
+    env.update({
+        "GO111MODULE": "on",
+        "GOFLAGS": "-mod=mod",
+        "GOPATH": os.path.join(GO_MODULE_CACHE, "gopath"),
+        "GOMODCACHE": GO_MODULE_CACHE,
+        "GOCACHE": os.path.join(GO_MODULE_CACHE, "gocache"),
+        "GOPROXY": ",".join(proxies),
+    })
+    if upstream == "off":
+        # go.sum of the chaincode still pins every module hash
+        env["GOSUMDB"] = "off"
+    return env
+
+
+def _go(args, path, upstream=GO_PROXY_UPSTREAM):
+    os.makedirs(GO_PROXY_MIRROR, exist_ok=True)
+    os.makedirs(GO_MODULE_CACHE, exist_ok=True)
+    res = run([GO_BINARY] + args, env=go_env(upstream), cwd=path, timeout=GO_COMMAND_TIMEOUT)
+    if res.returncode != 0:
+        raise Exception("go {} failed: {}".format(" ".join(args), str(res.stderr, encoding="utf-8")))
+    return res
+
+
+def vendor(path, upstream=GO_PROXY_UPSTREAM):
+    """
+    Vendor dependencies of a go module through the shared module cache
+
+    :param path: directory holding go.mod
+    :param upstream: upstream proxy, "off" to never use the network
+    :return: none
+    :rtype: none
+    """
+    if not os.path.exists(os.path.join(path, "go.sum")):
+        # vendor refuses modules without go.sum entries
+        _go(["mod", "tidy"], path, upstream)
+    _go(["mod", "vendor"], path, upstream)
+
+
+def seed(path, upstream=GO_PROXY_UPSTREAM):
+    """
+    Download every dependency of a go module and copy it to mirror
+
+    :param path: directory holding go.mod
+    :param upstream: upstream proxy to download from
+    :return: number of files added to mirror
+    :rtype: int
+    """
+    _go(["mod", "download", "all"], path, upstream)
+
+    download = os.path.join(GO_MODULE_CACHE, "cache", "download")
+    added = 0
+    for root, dirs, files in os.walk(download):
+        dirs[:] = [d for d in dirs if d != "sumdb"]
+        target = os.path.join(GO_PROXY_MIRROR, os.path.relpath(root, download))
+        for name in files:
+            if name.endswith(".lock") or name.endswith(".partial"):
+                continue
+            if os.path.exists(os.path.join(target, name)):
+                continue
+            os.makedirs(target, exist_ok=True)
+            tmp = os.path.join(target, ".{}.tmp".format(name))
+            shutil.copyfile(os.path.join(root, name), tmp)
+            os.rename(tmp, os.path.join(target, name))
+            added += 1
+    LOG.info("Seeded %s files of %s into go module mirror", added, path)
+    return added
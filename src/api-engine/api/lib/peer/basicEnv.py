@@ -1,5 +1,9 @@
+import logging
 import os
 from api.config import FABRIC_CFG
+from api.lib.runner import run
+
+LOG = logging.getLogger(__name__)
 
 
 class BasicEnv:
@@ -8,9 +12,51 @@ class BasicEnv:
         # Setting environment variables according to user input. Recommended main settings: CORE_PEER_LOCALMSPID、
         # CORE_PEER_TLS_CERT_FILE、 CORE_PEER_TLS_KEY_FILE、CORE_PEER_TLS_ROOTCERT_FILE、CORE_PEER_MSPCONFIGPATH，
         # CORE_PEER_MSPCONFIGPATH、 CORE_PEER_TLS_ROOTCERT_FILE，CORE_PEER_ADDRESS and so on.
+        # The variables only belong to this instance and are passed to every peer command it runs,
+        # os.environ is never modified, so instances for different peers can be used concurrently.
+        self.env = dict(os.environ)
 
         # Please put the config configuration file of the fabric binary in the /opt/node directory
-        os.environ["FABRIC_CFG_PATH"] = FABRIC_CFG
-        # os.environ["CORE_PEER_TLS_ENABLED"] = "true"
+        self.env["FABRIC_CFG_PATH"] = FABRIC_CFG
+        # self.env["CORE_PEER_TLS_ENABLED"] = "true"
         for k, v in kwargs.items():
-            os.environ[k] = v
+            self.env[k] = v
+
+    @property
+    def tls_enabled(self):
+        return self.env.get("CORE_PEER_TLS_ENABLED") not in (None, "false")
+
+    def run(self, args, **kwargs):
+        """
+        Run a peer command with the environment of this instance
+
+        :param args: argument vector
+        :return: result of command
+        :rtype: CommandResult
+        """
+        return run(args, env=self.env, **kwargs)
+
+    def gateway(self, query, *args):
+        """
+        Run a read query through the pooled grpc client of the peer
+
+        :param query: name of PeerClient query
+        :param args: arguments of query
+        :return: (0, result) or (1, error of peer), None if the peer binary has to be used
+        :rtype: tuple
+        """
+        try:
+            from api.lib.peer.gateway import GatewayError, PEER_GATEWAY_ENABLED, gateway_pool
+        except ImportError:
+            return None
+        if not PEER_GATEWAY_ENABLED:
+            return None
+
+        try:
+            return 0, getattr(gateway_pool.client(self.env), query)(*args)
+        except GatewayError as e:
+            return 1, str(e)
+        except Exception as e:
+            LOG.warning("Gateway %s on %s failed, use peer binary: %s",
+                        query, self.env.get("CORE_PEER_ADDRESS"), e)
+            return None
@@ -0,0 +1,129 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import hashlib
+import logging
+import os
+
+LOG = logging.getLogger(__name__)
+
+# seconds a lifecycle query result is served from cache
+LIFECYCLE_QUERY_TTL = int(os.getenv("LIFECYCLE_QUERY_TTL", 10))
+# backends only seen by the process holding them, api and task workers would
+# serve results the other side already invalidated
+LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+class LifecycleCache:
+    """
+    Short lived cache of lifecycle query results, per peer and channel.
+
+    Entries live in the default django cache, which must be shared by the api
+    and task workers, e.g. redis. With a process local backend the cache is
+    disabled. Invalidation bumps a generation number of the peer or channel
+    which is part of every entry key, the stale entries are never read again
+    and expire with their ttl.
+    """
+
+    def __init__(self, ttl=LIFECYCLE_QUERY_TTL, prefix="lifecycle"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._shared = None
+
+    def enabled(self):
+        """
+        Whether results are cached, the cache backend is checked once
+
+        :return: ttl is positive and the cache backend is shared
+        :rtype: bool
+        """
+        if self.ttl <= 0:
+            return False
+        if self._shared is None:
+            from django.conf import settings
+
+            backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+            self._shared = backend not in LOCAL_BACKENDS
+            if not self._shared:
+                LOG.warning("lifecycle cache disabled, cache backend %s is not shared", backend)
+        return self._shared
+
+    @staticmethod
+    def _cache():
+        from django.core.cache import cache
+
+        return cache
+
+    def _scope(self, kind, value):
+        digest = hashlib.sha1(value.encode("utf-8")).hexdigest()
+        return "{}:gen:{}:{}".format(self.prefix, kind, digest)
+
+    def _key(self, peer, query, channel, args):
+        scopes = [self._scope("peer", peer), self._scope("channel", channel)]
+        generations = self._cache().get_many(scopes)
+        raw = "\0".join(
+            [peer, query, channel] + [str(a) for a in args]
+            + [str(generations.get(scope, 0)) for scope in scopes]
+        )
+        return "{}:{}".format(self.prefix, hashlib.sha1(raw.encode("utf-8")).hexdigest())
+
+    def get(self, peer, query, channel="", args=()):
+        """
+        Cached result of a query
+
+        :param peer: peer address and identity
+        :param query: query name
+        :param channel: channel of query, empty for peer wide queries
+        :param args: other arguments of query
+        :return: cached result, None on a miss
+        :rtype: any
+        """
+        if not self.enabled():
+            return None
+        try:
+            return self._cache().get(self._key(peer, query, channel, args))
+        except Exception as e:
+            LOG.debug("lifecycle cache unavailable: %s", e)
+            return None
+
+    def set(self, peer, query, result, channel="", args=()):
+        """
+        Cache result of a query, arguments are the same as get
+        """
+        if not self.enabled():
+            return
+        try:
+            self._cache().set(self._key(peer, query, channel, args), result, self.ttl)
+        except Exception as e:
+            LOG.debug("lifecycle cache unavailable: %s", e)
+
+    def invalidate(self, peer=None, channel=None):
+        """
+        Drop cached results of a peer and/or a channel
+
+        :param peer: peer address and identity
+        :param channel: channel name
+        :return: none
+        :rtype: none
+        """
+        if not self.enabled():
+            return
+        cache = None
+        try:
+            cache = self._cache()
+            for kind, value in (("peer", peer), ("channel", channel)):
+                if value is None:
+                    continue
+                scope = self._scope(kind, value)
+                # generations never expire, add is a no-op if it exists
+                cache.add(scope, 0, None)
+                cache.incr(scope)
+        except Exception as e:
+            if cache is not None:
+                LOG.warning("invalidate lifecycle cache failed: %s", e)
+
+
+lifecycle_cache = LifecycleCache()
@@ -1,7 +1,6 @@
-import os
 import json
-import subprocess
 from api.lib.peer.basicEnv import BasicEnv
+from api.lib.peer.cache import lifecycle_cache
 from api.config import FABRIC_TOOL, FABRIC_CFG
 
 
@@ -9,21 +8,25 @@ class ChainCode(BasicEnv):
     def __init__(self, version="2.2.0", peer=FABRIC_TOOL, **kwargs):
         self.peer = peer + "/peer"
         super(ChainCode, self).__init__(version, **kwargs)
+        # cache scope of this peer, the same peer may be queried as another identity
+        self.peer_id = "{}|{}".format(
+            self.env.get("CORE_PEER_ADDRESS", ""), self.env.get("CORE_PEER_LOCALMSPID", "")
+        )
 
-    def lifecycle_package(self, cc_name, cc_version, cc_path, language):
+    def lifecycle_package(self, cc_name, cc_version, cc_path, language, output=None):
         """
             package the chaincode to a tar.gz file.
         :param cc_name: chaincode name
         :param cc_version: chaincode version
         :param cc_path: where the chaincode is
         :param language: Chain code development language, default: golang
+        :param output: path of package, <cc_name>.tar.gz in working directory by default
         :return 0 means success.
         """
         try:
             label = cc_name+"_"+cc_version
-            res = os.system("{} lifecycle chaincode package {}.tar.gz --path {} --lang {} --label {}"
-                            .format(self.peer, cc_name, cc_path, language, label))
-            res = res >> 8
+            res = self.run([self.peer, "lifecycle", "chaincode", "package", output or "{}.tar.gz".format(cc_name),
+                            "--path", cc_path, "--lang", language, "--label", label]).returncode
         except Exception as e:
             err_msg = "package chaincode failed for {}!".format(e)
             raise Exception(err_msg)
@@ -36,34 +39,61 @@ class ChainCode(BasicEnv):
         :return: 0 means success.
         """
         try:
-            res = os.system("{} lifecycle chaincode install {}".format(self.peer, cc_targz))
-            res = res >> 8
+            res = self.run([self.peer, "lifecycle", "chaincode", "install", cc_targz]).returncode
         except Exception as e:
             err_msg = "install chaincode failed for {}!".format(e)
             raise Exception(err_msg)
+        lifecycle_cache.invalidate(peer=self.peer_id)
         return res
 
-    def lifecycle_query_installed(self, timeout):
+    def _cached(self, query, fn, channel="", args=()):
+        """
+        Serve a lifecycle query from cache, successful results are cached
+
+        :param query: query name
+        :param fn: callable running the query, returns (return code, result)
+        :param channel: channel of query
+        :param args: other arguments of query
+        :return: (return code, result)
+        :rtype: tuple
+        """
+        res = lifecycle_cache.get(self.peer_id, query, channel, args)
+        if res is not None:
+            return res
+        res = fn()
+        if res[0] == 0:
+            lifecycle_cache.set(self.peer_id, query, res, channel, args)
+        return res
+
+    def lifecycle_query_installed(self, timeout, cached=True):
         """
             get the chaincode info installed in peer.
         :param timeout:
+        :param cached: whether a cached result may be returned
         :return: res 0 means success
                  installed_chaincodes: the json format of installed_chaincodes info
         """
+        if not cached:
+            return self._query_installed(timeout)
+        return self._cached("installed", lambda: self._query_installed(timeout))
 
-        try:
-            res = subprocess.Popen("{} lifecycle chaincode queryinstalled --output json --connTimeout {}"
-                                   .format(self.peer, timeout), shell=True,
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    def _query_installed(self, timeout):
+        res = self.gateway("query_installed")
+        if res is not None:
+            if res[0] == 0:
+                res[1].setdefault("installed_chaincodes", [])
+            return res
 
-            stdout, stderr = res.communicate()
+        try:
+            res = self.run([self.peer, "lifecycle", "chaincode", "queryinstalled", "--output", "json",
+                            "--connTimeout", timeout])
             return_code = res.returncode
 
             if return_code == 0:
-                content = str(stdout, encoding="utf-8")
+                content = str(res.stdout, encoding="utf-8")
                 installed_chaincodes = json.loads(content)
             else:
-                stderr = str(stderr, encoding="utf-8")
+                stderr = str(res.stderr, encoding="utf-8")
                 return return_code, stderr
         except Exception as e:
             err_msg = "query_installed chaincode info failed for {}!".format(e)
@@ -82,10 +112,9 @@ class ChainCode(BasicEnv):
             res_return = 0
             if res == 0:
                 for item in installed['installed_chaincodes']:
-                    res_get = os.system("{} lifecycle chaincode getinstalledpackage --package-id {} "
-                                        "--output-directory {} --connTimeout {}".format(self.peer,
-                                                                                        item['package_id'], FABRIC_CFG, timeout))
-                    res_get = res_get >> 8
+                    res_get = self.run([self.peer, "lifecycle", "chaincode", "getinstalledpackage",
+                                        "--package-id", item['package_id'], "--output-directory", FABRIC_CFG,
+                                        "--connTimeout", timeout]).returncode
                     res_return = res_return or res_get
             else:
                 print("package_id get failed.")
@@ -120,25 +149,20 @@ class ChainCode(BasicEnv):
             if package_id == "":
                 return 1, "not exist the chaincode, please check chaincode_name and chaincode_version"
 
-            if os.getenv("CORE_PEER_TLS_ENABLED") == "false" or os.getenv("CORE_PEER_TLS_ENABLED") is None:
-                res = subprocess.Popen("{} lifecycle chaincode approveformyorg -o {} - --channelID {} --name {} "
-                                       "--version {} --init-required --package-id {} --sequence {} --signature-policy {}"
-                                       .format(self.peer, orderer_url, channel_name, cc_name, chaincode_version, package_id,
-                                               sequence, policy), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            else:
-                res = subprocess.Popen("{} lifecycle chaincode approveformyorg -o {} --tls --cafile {} --channelID {} "
-                                       "--name {} --version {} --init-required --package-id {} --sequence {} "
-                                       "--signature-policy {}"
-                                       .format(self.peer, orderer_url, orderer_tls_rootcert, channel_name,
-                                               cc_name, chaincode_version, package_id, sequence, policy), shell=True,
-                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = res.communicate()
+            args = [self.peer, "lifecycle", "chaincode", "approveformyorg", "-o", orderer_url]
+            if self.tls_enabled:
+                args += ["--tls", "--cafile", orderer_tls_rootcert]
+            args += ["--channelID", channel_name, "--name", cc_name, "--version", chaincode_version,
+                     "--init-required", "--package-id", package_id, "--sequence", sequence,
+                     "--signature-policy", policy]
+            res = self.run(args)
             return_code = res.returncode
+            lifecycle_cache.invalidate(channel=channel_name)
 
             if return_code == 0:
-                content = str(stdout, encoding="utf-8")
+                content = str(res.stdout, encoding="utf-8")
             else:
-                stderr = str(stderr, encoding="utf-8")
+                stderr = str(res.stderr, encoding="utf-8")
                 return return_code, stderr
         except Exception as e:
             err_msg = "lifecycle_approve_for_my_org failed for {}!".format(e)
@@ -152,18 +176,21 @@ class ChainCode(BasicEnv):
         :param cc_name: chaincode name
         :return:
         """
+        return self._cached(
+            "approved", lambda: self._query_approved(channel_name, cc_name), channel_name, (cc_name,)
+        )
+
+    def _query_approved(self, channel_name, cc_name):
 
         try:
-            res = subprocess.Popen("{} lifecycle chaincode queryapproved --output json --channelID {}"
-                                   " --name {}".format(self.peer, channel_name, cc_name),
-                                   shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = res.communicate()
+            res = self.run([self.peer, "lifecycle", "chaincode", "queryapproved", "--output", "json",
+                            "--channelID", channel_name, "--name", cc_name])
             return_code = res.returncode
             if return_code == 0:
-                content = str(stdout, encoding="utf-8")
+                content = str(res.stdout, encoding="utf-8")
                 chaincodes_info = json.loads(content)
             else:
-                stderr = str(stderr, encoding="utf-8")
+                stderr = str(res.stderr, encoding="utf-8")
                 return return_code, stderr
         except Exception as e:
             err_msg = "lifecycle_query_approved failed for {}!".format(e)
@@ -185,37 +212,20 @@ class ChainCode(BasicEnv):
         :return:
         """
         try:
-            if os.getenv("CORE_PEER_TLS_ENABLED") == "false" or os.getenv("CORE_PEER_TLS_ENABLED") is None:
-                res = subprocess.Popen("{} lifecycle chaincode checkcommitreadiness --output json "
-                                       " --channelID {}  --name {} --version {} --init-required --sequence {} "
-                                       "--signature-policy {}"
-                                       .format(self.peer, channel_name, cc_name, cc_version, sequence, policy),
-                                       shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = res.communicate()
-                return_code = res.returncode
-                if return_code == 0:
-                    content = str(stdout, encoding="utf-8")
-                    chaincodes_info = json.loads(content)
-                    return return_code, chaincodes_info
-                else:
-                    stderr = str(stderr, encoding="utf-8")
-                    return return_code, stderr
+            args = [self.peer, "lifecycle", "chaincode", "checkcommitreadiness", "--output", "json"]
+            if self.tls_enabled:
+                args += ["-o", orderer_url, "--tls", "--cafile", orderer_tls_rootcert]
+            args += ["--channelID", channel_name, "--name", cc_name, "--version", cc_version,
+                     "--init-required", "--sequence", sequence, "--signature-policy", policy]
+            res = self.run(args)
+            return_code = res.returncode
+            if return_code == 0:
+                content = str(res.stdout, encoding="utf-8")
+                chaincodes_info = json.loads(content)
+                return return_code, chaincodes_info
             else:
-                res = subprocess.Popen("{} lifecycle chaincode checkcommitreadiness --output json "
-                                       "-o {} --tls --cafile {} --channelID {}  --name {} --version {} "
-                                       "--signature-policy {} --init-required --sequence {}"
-                                       .format(self.peer, orderer_url, orderer_tls_rootcert, channel_name, cc_name,
-                                               cc_version, policy, sequence),
-                                       shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = res.communicate()
-                return_code = res.returncode
-                if return_code == 0:
-                    content = str(stdout, encoding="utf-8")
-                    chaincodes_info = json.loads(content)
-                    return return_code, chaincodes_info
-                else:
-                    stderr = str(stderr, encoding="utf-8")
-                    return return_code, stderr
+                stderr = str(res.stderr, encoding="utf-8")
+                return return_code, stderr
         except Exception as e:
             err_msg = "lifecycle_check_commit_readiness failed for {}!".format(e)
             raise Exception(err_msg)
@@ -237,30 +247,17 @@ class ChainCode(BasicEnv):
         :return:
         """
         try:
-            peer_addresses_format = " --peerAddresses {} --tlsRootCertFiles {}"
-            command_str_with_tls = "{} lifecycle chaincode commit -o {} --tls --cafile {} " \
-                                   "--channelID {} --name {} --version {} --init-required --sequence {} " \
-                                   "--signature-policy {}"
-            command_str_without_tls = "{} lifecycle chaincode commit -o {} --channelID {} --name {} " \
-                                      "--version {} --init-required --sequence {} --signature-policy {}"
+            args = [self.peer, "lifecycle", "chaincode", "commit", "-o", orderer_url]
+            if self.tls_enabled:
+                args += ["--tls", "--cafile", orderer_tls_rootcert]
+            args += ["--channelID", channel_name, "--name", cc_name, "--version", chaincode_version,
+                     "--init-required", "--sequence", sequency, "--signature-policy", policy]
+            # --collections-config {}
+            for peer_address, peer_root_cert in zip(peerlist, peer_root_certs):
+                args += ["--peerAddresses", peer_address, "--tlsRootCertFiles", peer_root_cert]
 
-            peer_addressed = []
-            for i in range(len(peerlist)):
-                peer_addressed.append(peerlist[i])
-                peer_addressed.append(peer_root_certs[i])
-            if os.getenv("CORE_PEER_TLS_ENABLED") == "false" or os.getenv("CORE_PEER_TLS_ENABLED") is None:
-                for i in range(len(peerlist)):
-                    command_str_without_tls = command_str_without_tls + peer_addresses_format
-                res = os.system(command_str_without_tls.format(self.peer, orderer_url, channel_name, cc_name,
-                                chaincode_version, sequency, policy, *peer_addressed))      #--collections-config {}
-            else:
-                for i in range(len(peerlist)):
-                    command_str_with_tls = command_str_with_tls + peer_addresses_format
-
-                res = os.system(command_str_with_tls.format(self.peer, orderer_url, orderer_tls_rootcert, channel_name,
-                                cc_name, chaincode_version, sequency, policy, *peer_addressed))
-
-            res = res >> 8
+            res = self.run(args).returncode
+            lifecycle_cache.invalidate(channel=channel_name)
             return res
 
         except Exception as e:
@@ -274,18 +271,24 @@ class ChainCode(BasicEnv):
         :param cc_name:chaincode name
         :return: chaincodes info has commited in channel of the cc_name
         """
+        return self._cached(
+            "committed", lambda: self._query_committed(channel_name, cc_name), channel_name, (cc_name,)
+        )
+
+    def _query_committed(self, channel_name, cc_name):
+        res = self.gateway("query_committed", channel_name, cc_name)
+        if res is not None:
+            return res
         try:
-            res = subprocess.Popen("{} lifecycle chaincode querycommitted --channelID {} "
-                                   "--output json --name {}".format(self.peer, channel_name, cc_name),
-                                   shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = res.communicate()
+            res = self.run([self.peer, "lifecycle", "chaincode", "querycommitted", "--channelID", channel_name,
+                            "--output", "json", "--name", cc_name])
             return_code = res.returncode
             if return_code == 0:
-                content = str(stdout, encoding="utf-8")
+                content = str(res.stdout, encoding="utf-8")
                 chaincodes_commited = json.loads(content)
                 return return_code, chaincodes_commited
             else:
-                stderr = str(stderr, encoding="utf-8")
+                stderr = str(res.stderr, encoding="utf-8")
                 return return_code, stderr
         except Exception as e:
             err_msg = "lifecycle_query_committed failed for {}!".format(e)
@@ -304,67 +307,53 @@ class ChainCode(BasicEnv):
             else: 1, stderr
         """
         try:
+            command = [self.peer, "chaincode", "invoke"]
             if init:
-                invoke_command = "{} chaincode invoke -I -o {} --channelID {} --name {} -c '{}'"
-                invoke_command_tls = "{} chaincode invoke -I -o {} --tls --cafile {} --channelID {} --name {} -c '{}'"
-            else:
-                invoke_command = "{} chaincode invoke -o {} --channelID {} --name {} -c '{}'"
-                invoke_command_tls = "{} chaincode invoke -o {} --tls --cafile {} --channelID {} --name {} -c '{}'"
+                command.append("-I")
+            command += ["-o", orderer_url]
+            if self.tls_enabled:
+                command += ["--tls", "--cafile", orderer_tls_rootcert]
+            command += ["--channelID", channel_name, "--name", cc_name, "-c", args]
 
-            if os.getenv("CORE_PEER_TLS_ENABLED") == "false" or os.getenv("CORE_PEER_TLS_ENABLED") is None:
-                if self.version in BasicEnv.binary_versions_v2:
-                    res = subprocess.Popen(invoke_command.format(self.peer, orderer_url, channel_name, cc_name, args),
-                                           shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    stdout, stderr = res.communicate()
-                    return_code = res.returncode
-                    if return_code == 0:
-                        return return_code, ''
-                    else:
-                        stderr = str(stderr, encoding="utf-8")
-                        return return_code, stderr
-            else:
-                if self.version in BasicEnv.binary_versions_v2:
-                    res = subprocess.Popen(invoke_command_tls.format(self.peer, orderer_url, orderer_tls_rootcert,
-                                                                     channel_name, cc_name, args),
-                                           shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    stdout, stderr = res.communicate()
-                    return_code = res.returncode
-                    if return_code == 0:
-                        return return_code, ''
-                    else:
-                        stderr = str(stderr, encoding="utf-8")
-                        return return_code, stderr
+            if self.version in BasicEnv.binary_versions_v2:
+                res = self.run(command)
+                return_code = res.returncode
+                if return_code == 0:
+                    return return_code, ''
+                else:
+                    stderr = str(res.stderr, encoding="utf-8")
+                    return return_code, stderr
         except Exception as e:
             err_msg = "invoke failed for {}!".format(e)
             raise Exception(err_msg)
 
     def query(self, orderer_url, orderer_tls_rootcert, channel_name, cc_name, args):
+        res = self.gateway("query", channel_name, cc_name, args)
+        if res is not None:
+            return_code, content = res
+            if return_code == 0:
+                content = str(content, encoding="utf-8")
+                try:
+                    content = json.loads(content)
+                except ValueError:
+                    pass
+            return return_code, content
         try:
-            if os.getenv("CORE_PEER_TLS_ENABLED") == "false" or os.getenv("CORE_PEER_TLS_ENABLED") is None:
-                res = subprocess.Popen("{} chaincode query -o {} --channelID {} --name {} -c '{}'"
-                                       .format(self.peer, orderer_url, channel_name, cc_name, args),
-                                       shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = res.communicate()
-                return_code = res.returncode
-                if return_code == 0:
+            command = [self.peer, "chaincode", "query", "-o", orderer_url]
+            if self.tls_enabled:
+                command += ["--tls", "--cafile", orderer_tls_rootcert]
+            command += ["--channelID", channel_name, "--name", cc_name, "-c", args]
+            res = self.run(command)
+            return_code = res.returncode
+            if return_code == 0:
+                if not self.tls_enabled:
                     return return_code, ''
-                else:
-                    stderr = str(stderr, encoding="utf-8")
-                    return return_code, stderr
+                content = str(res.stdout, encoding="utf-8")
+                query_result = json.loads(content)
+                return return_code, query_result
             else:
-                res = subprocess.Popen("{} chaincode query -o {} --tls --cafile {} --channelID {}"
-                                       " --name {} -c '{}'".format(self.peer, orderer_url, orderer_tls_rootcert,
-                                                                   channel_name, cc_name, args),
-                                       shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = res.communicate()
-                return_code = res.returncode
-                if return_code == 0:
-                    content = str(stdout, encoding="utf-8")
-                    query_result = json.loads(content)
-                    return return_code, query_result
-                else:
-                    stderr = str(stderr, encoding="utf-8")
-                    return return_code, stderr
+                stderr = str(res.stderr, encoding="utf-8")
+                return return_code, stderr
         except Exception as e:
             err_msg = "query failed for {}!".format(e)
             raise Exception(err_msg)
@@ -1,6 +1,4 @@
-import os
 import json
-import subprocess
 from api.lib.peer.basicEnv import BasicEnv
 from api.config import FABRIC_TOOL
 
@@ -14,36 +12,29 @@ class Channel(BasicEnv):
 
     def create(self, channel, orderer_url, channel_tx, output_block, time_out="90s"):
         try:
-            res = 0x100
-            if os.getenv("CORE_PEER_TLS_ENABLED") == "false" or os.getenv("CORE_PEER_TLS_ENABLED") is None:
-                res = os.system("{} channel create -c {} -o {} -f {} --outputBlock {} --timeout {}"
-                                .format(self.peer, channel, orderer_url, channel_tx, output_block, time_out))
-            else:
-                ORDERER_CA = os.getenv("ORDERER_CA")
-                res = os.system("{} channel create -c {} -o {} -f {} --outputBlock {} --timeout {} --tls --cafile {}"
-                    .format(self.peer, channel, orderer_url, channel_tx, output_block, time_out, ORDERER_CA))
-
-            # The return value of os.system is not the result of executing the program. It is a 16 bit number,
-            #  and its high bit is the return code
-            res = res >> 8
+            args = [self.peer, "channel", "create", "-c", channel, "-o", orderer_url, "-f", channel_tx,
+                    "--outputBlock", output_block, "--timeout", time_out]
+            if self.tls_enabled:
+                args += ["--tls", "--cafile", self.env.get("ORDERER_CA")]
+            res = self.run(args).returncode
         except Exception as e:
             err_msg = "create channel failed for {}!".format(e)
             raise Exception(err_msg)
         return res
 
     def list(self):
+        res = self.gateway("channels")
+        if res is not None:
+            return res
         try:
-            res = subprocess.Popen("{} channel list".format(self.peer), shell=True,
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            stdout, stderr = res.communicate()
+            res = self.run([self.peer, "channel", "list"])
             return_code = res.returncode
 
             if return_code == 0:
-                content = str(stdout, encoding="utf-8")
+                content = str(res.stdout, encoding="utf-8")
                 content = content.split("\n")
             else:
-                stderr = str(stderr, encoding="utf-8")
+                stderr = str(res.stderr, encoding="utf-8")
                 return return_code, stderr
         except Exception as e:
             err_msg = "get channel list failed for {}!".format(e)
@@ -59,12 +50,11 @@ class Channel(BasicEnv):
             orderer_url: Ordering service endpoint.
         """
         try:
-            res = os.system("{} channel update -c {}  -f {} -o {}"
-                            .format(self.peer, channel, channel_tx, orderer_url))
+            res = self.run([self.peer, "channel", "update", "-c", channel, "-f", channel_tx,
+                            "-o", orderer_url]).returncode
         except Exception as e:
-            err_msg = "update channel failed for {e}!"
+            err_msg = "update channel failed for {}!".format(e)
             raise Exception(err_msg)
-        res = res >> 8
         return res
 
     def fetch(self, option, channel, orderer_url, time_out="90s"):
@@ -76,12 +66,11 @@ class Channel(BasicEnv):
             orderer_url: Ordering service endpoint.
         """
         try:
-            res = os.system("{} channel fetch {} -c {} -o {} --timeout {}".format(
-                self.peer, option, channel, orderer_url, time_out))
+            res = self.run([self.peer, "channel", "fetch", option, "-c", channel, "-o", orderer_url,
+                            "--timeout", time_out]).returncode
         except Exception as e:
             err_msg = "fetch a specified block failed {}!".format(e)
             raise Exception(err_msg)
-        res = res >> 8
         return res
 
     def signconfigtx(self, channel_tx):
@@ -91,12 +80,10 @@ class Channel(BasicEnv):
             channel_tx: Configuration transaction file generated by a tool such as configtxgen for submitting to orderer
         """
         try:
-            res = os.system(
-                "{} channel signconfigtx -f {}".format(self.peer, channel_tx))
+            res = self.run([self.peer, "channel", "signconfigtx", "-f", channel_tx]).returncode
         except Exception as e:
             err_msg = "signs a configtx update failed {}".format(e)
             raise Exception(err_msg)
-        res = res >> 8
         return res
 
     def join(self, block_file):
@@ -106,13 +93,10 @@ class Channel(BasicEnv):
             block_file: Path to file containing genesis block.
         """
         try:
-            res = os.system(
-                "{} channel join -b {} ".format(self.peer, block_file)
-            )
+            res = self.run([self.peer, "channel", "join", "-b", block_file]).returncode
         except Exception as e:
             err_msg = "join the peer to a channel failed. {}".format(e)
             raise Exception(err_msg)
-        res = res >> 8
         return res
 
     def getinfo(self, channel):
@@ -121,20 +105,21 @@ class Channel(BasicEnv):
         params:
             channel: In case of a newChain command, the channel ID to create.
         """
+        res = self.gateway("chain_info", channel)
+        if res is not None:
+            return_code, body = res
+            return (return_code, {"block_info": body}) if return_code == 0 else res
         try:
-            res = subprocess.Popen("{} channel getinfo  -c {}".format(self.peer, channel), shell=True,
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            stdout, stderr = res.communicate()
+            res = self.run([self.peer, "channel", "getinfo", "-c", channel])
             return_code = res.returncode
 
             if return_code == 0:
-                content = str(stdout, encoding="utf-8")
+                content = str(res.stdout, encoding="utf-8")
                 content = content.split("\n")[0].split(":", 1)[1]
                 block_info = json.loads(content)
                 body = {"block_info": block_info}
             else:
-                stderr = str(stderr, encoding="utf-8")
+                stderr = str(res.stderr, encoding="utf-8")
                 return return_code, stderr
         except Exception as e:
             err_msg = "get blockchain information of a specified channel failed. {}".format(
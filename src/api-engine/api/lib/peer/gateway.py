@@ -0,0 +1,445 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import grpc
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import (
+    decode_dss_signature,
+    encode_dss_signature,
+)
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.json_format import MessageToDict
+
+from api.lib.peer import protos
+
+LOG = logging.getLogger(__name__)
+
+# serve read queries through pooled grpc connections instead of the peer binary
+PEER_GATEWAY_ENABLED = os.getenv("PEER_GATEWAY_ENABLED", "true") == "true"
+# seconds an unused connection is kept open
+PEER_GATEWAY_IDLE_TIMEOUT = int(os.getenv("PEER_GATEWAY_IDLE_TIMEOUT", 300))
+# deadline of one proposal in seconds
+PEER_GATEWAY_TIMEOUT = float(os.getenv("PEER_GATEWAY_TIMEOUT", 10))
+
+PROCESS_PROPOSAL = "/protos.Endorser/ProcessProposal"
+BROADCAST = "/orderer.AtomicBroadcast/Broadcast"
+DELIVER = "/orderer.AtomicBroadcast/Deliver"
+# 64 bit integers are strings in proto3 json, numbers in the json of peer cli
+INT64_TYPES = (
+    FieldDescriptor.TYPE_INT64, FieldDescriptor.TYPE_UINT64,
+    FieldDescriptor.TYPE_SINT64, FieldDescriptor.TYPE_FIXED64,
+    FieldDescriptor.TYPE_SFIXED64,
+)
+# order of the P-256 group, fabric only accepts low-S signatures
+P256_ORDER = 0xFFFFFFFF00000000FFFFFFFFFFFFFFFFBCE6FAADA7179E84F3B9CAC2FC632551
+
+
+class GatewayError(Exception):
+    """Peer answered the proposal with an error status."""
+
+
+def _int64_to_int(descriptor, obj):
+    for field in descriptor.fields:
+        if field.name not in obj:
+            continue
+        if field.message_type is not None and field.message_type.GetOptions().map_entry:
+            value_field = field.message_type.fields_by_name["value"]
+            if value_field.type in INT64_TYPES:
+                obj[field.name] = {k: int(v) for k, v in obj[field.name].items()}
+            elif value_field.message_type is not None:
+                for v in obj[field.name].values():
+                    _int64_to_int(value_field.message_type, v)
+        elif field.type in INT64_TYPES:
+            if field.label == FieldDescriptor.LABEL_REPEATED:
+                obj[field.name] = [int(v) for v in obj[field.name]]
+            else:
+                obj[field.name] = int(obj[field.name])
+        elif field.message_type is not None:
+            values = obj[field.name]
+            for v in values if field.label == FieldDescriptor.LABEL_REPEATED else [values]:
+                _int64_to_int(field.message_type, v)
+    return obj
+
+
+def _to_dict(message):
+    """
+    Dict of a message in the shape peer cli prints it as json
+
+    Field names are kept as declared in the proto, fields with default values
+    are included and 64 bit integers are numbers.
+
+    :param message: protobuf message
+    :return: json compatible dict
+    :rtype: dict
+    """
+    return _int64_to_int(message.DESCRIPTOR, MessageToDict(
+        message, preserving_proto_field_name=True,
+        including_default_value_fields=True,
+    ))
+
+
+class Signer:
+    """MSP identity which signs proposals, loaded from an msp directory."""
+
+    def __init__(self, mspid, msp_path):
+        self.mspid = mspid
+        with open(sorted(glob.glob(os.path.join(msp_path, "signcerts", "*")))[0], "rb") as f:
+            self.cert = f.read()
+        with open(sorted(glob.glob(os.path.join(msp_path, "keystore", "*")))[0], "rb") as f:
+            self.key = serialization.load_pem_private_key(f.read(), password=None)
+        self.creator = protos.SerializedIdentity(
+            mspid=mspid, id_bytes=self.cert
+        ).SerializeToString()
+
+    def sign(self, data):
+        r, s = decode_dss_signature(self.key.sign(data, ec.ECDSA(hashes.SHA256())))
+        if s > P256_ORDER // 2:
+            s = P256_ORDER - s
+        return encode_dss_signature(r, s)
+
+
+class PeerClient:
+    """Endorser client of one peer over a pooled grpc channel."""
+
+    def __init__(self, channel, signer, timeout=PEER_GATEWAY_TIMEOUT):
+        self.signer = signer
+        self.timeout = timeout
+        self._process = channel.unary_unary(
+            PROCESS_PROPOSAL,
+            request_serializer=protos.SignedProposal.SerializeToString,
+            response_deserializer=protos.ProposalResponse.FromString,
+        )
+
+    def _proposal(self, channel_id, chaincode, args):
+        spec = protos.ChaincodeInvocationSpec(
+            chaincode_spec=protos.ChaincodeSpec(
+                type=protos.GOLANG,
+                chaincode_id=protos.ChaincodeID(name=chaincode),
+                input=protos.ChaincodeInput(
+                    args=[a if isinstance(a, bytes) else a.encode() for a in args]
+                ),
+            )
+        )
+        nonce = os.urandom(24)
+        now = time.time()
+        channel_header = protos.ChannelHeader(
+            type=protos.ENDORSER_TRANSACTION,
+            timestamp=protos.Timestamp(seconds=int(now), nanos=int(now % 1 * 1e9)),
+            channel_id=channel_id,
+            tx_id=hashlib.sha256(nonce + self.signer.creator).hexdigest(),
+            extension=protos.ChaincodeHeaderExtension(
+                chaincode_id=protos.ChaincodeID(name=chaincode)
+            ).SerializeToString(),
+        )
+        header = protos.Header(
+            channel_header=channel_header.SerializeToString(),
+            signature_header=protos.SignatureHeader(
+                creator=self.signer.creator, nonce=nonce
+            ).SerializeToString(),
+        )
+        proposal = protos.Proposal(
+            header=header.SerializeToString(),
+            payload=protos.ChaincodeProposalPayload(
+                input=spec.SerializeToString()
+            ).SerializeToString(),
+        ).SerializeToString()
+        return protos.SignedProposal(
+            proposal_bytes=proposal, signature=self.signer.sign(proposal)
+        )
+
+    def evaluate(self, channel_id, chaincode, args):
+        """
+        Send a proposal to the peer and return the payload of its response
+
+        :param channel_id: channel id, empty for system chaincodes of peer
+        :param chaincode: chaincode name
+        :param args: arguments of invocation
+        :return: payload of response
+        :rtype: bytes
+        """
+        response = self._process(
+            self._proposal(channel_id, chaincode, args), timeout=self.timeout
+        ).response
+        if response.status >= 400:
+            raise GatewayError(response.message)
+        return response.payload
+
+    def channels(self):
+        result = protos.ChannelQueryResponse.FromString(
+            self.evaluate("", "cscc", ["GetChannels"])
+        )
+        return [channel.channel_id for channel in result.channels]
+
+    def chain_info(self, channel_id):
+        result = protos.BlockchainInfo.FromString(
+            self.evaluate("", "qscc", ["GetChainInfo", channel_id])
+        )
+        return _to_dict(result)
+
+    def query_installed(self):
+        result = protos.QueryInstalledChaincodesResult.FromString(
+            self.evaluate(
+                "", "_lifecycle",
+                ["QueryInstalledChaincodes",
+                 protos.QueryInstalledChaincodesArgs().SerializeToString()],
+            )
+        )
+        return _to_dict(result)
+
+    def query_committed(self, channel_id, name):
+        result = protos.QueryChaincodeDefinitionResult.FromString(
+            self.evaluate(
+                channel_id, "_lifecycle",
+                ["QueryChaincodeDefinition",
+                 protos.QueryChaincodeDefinitionArgs(name=name).SerializeToString()],
+            )
+        )
+        return _to_dict(result)
+
+    def query(self, channel_id, name, args):
+        """
+        Query a chaincode, args is the json of peer chaincode query -c
+        """
+        spec = json.loads(args)
+        call_args = spec.get("Args") or spec.get("args") or []
+        if spec.get("function"):
+            call_args = [spec["function"]] + call_args
+        return self.evaluate(channel_id, name, call_args)
+
+
+def _timestamp():
+    now = time.time()
+    return protos.Timestamp(seconds=int(now), nanos=int(now % 1 * 1e9))
+
+
+class OrdererClient:
+    """Broadcast and deliver client of one orderer over a pooled grpc channel."""
+
+    def __init__(self, channel, signer, timeout=PEER_GATEWAY_TIMEOUT):
+        self.signer = signer
+        self.timeout = timeout
+        self._broadcast = channel.stream_stream(
+            BROADCAST,
+            request_serializer=protos.Envelope.SerializeToString,
+            response_deserializer=protos.BroadcastResponse.FromString,
+        )
+        self._deliver = channel.stream_stream(
+            DELIVER,
+            request_serializer=protos.Envelope.SerializeToString,
+            response_deserializer=protos.DeliverResponse.FromString,
+        )
+
+    def envelope(self, header_type, channel_id, data):
+        """
+        Envelope of data signed by the client identity
+
+        :param header_type: common.HeaderType of payload
+        :param channel_id: channel id
+        :param data: marshaled payload data
+        :return: signed envelope
+        :rtype: protos.Envelope
+        """
+        payload = protos.Payload(
+            header=protos.Header(
+                channel_header=protos.ChannelHeader(
+                    type=header_type, timestamp=_timestamp(), channel_id=channel_id,
+                ).SerializeToString(),
+                signature_header=protos.SignatureHeader(
+                    creator=self.signer.creator, nonce=os.urandom(24)
+                ).SerializeToString(),
+            ),
+            data=data,
+        ).SerializeToString()
+        return protos.Envelope(payload=payload, signature=self.signer.sign(payload))
+
+    def broadcast(self, envelope):
+        """
+        Submit an envelope to the ordering service
+
+        :param envelope: signed envelope
+        :return: none
+        :rtype: none
+        """
+        for response in self._broadcast(iter([envelope]), timeout=self.timeout):
+            if response.status != protos.STATUS_SUCCESS:
+                raise GatewayError("broadcast rejected with status {}: {}".format(
+                    response.status, response.info))
+            return
+        raise GatewayError("broadcast closed without response")
+
+    def block(self, channel_id, number=None):
+        """
+        Fetch one block of a channel
+
+        :param channel_id: channel id
+        :param number: block number, None for the newest block
+        :return: block
+        :rtype: protos.Block
+        """
+        if number is None:
+            position = protos.SeekPosition(newest=protos.SeekNewest())
+        else:
+            position = protos.SeekPosition(specified=protos.SeekSpecified(number=number))
+        seek = protos.SeekInfo(start=position, stop=position, behavior=protos.FAIL_IF_NOT_READY)
+        envelope = self.envelope(protos.DELIVER_SEEK_INFO, channel_id, seek.SerializeToString())
+        block = None
+        for response in self._deliver(iter([envelope]), timeout=self.timeout):
+            if response.WhichOneof("Type") == "block":
+                block = response.block
+            elif response.status != protos.STATUS_SUCCESS:
+                raise GatewayError("deliver of channel {} failed with status {}".format(
+                    channel_id, response.status))
+            else:
+                break
+        if block is None:
+            raise GatewayError("deliver of channel {} returned no block".format(channel_id))
+        return block
+
+    def config_block(self, channel_id):
+        """
+        Fetch the latest config block of a channel
+
+        :param channel_id: channel id
+        :return: config block
+        :rtype: protos.Block
+        """
+        return self.block(channel_id, last_config_index(self.block(channel_id)))
+
+
+def last_config_index(block):
+    """
+    Number of the last config block, as recorded in the metadata of a block
+
+    :param block: block
+    :return: block number
+    :rtype: int
+    """
+    metadata = block.metadata.metadata
+    if len(metadata) > protos.BLOCK_METADATA_SIGNATURES:
+        value = protos.Metadata.FromString(metadata[protos.BLOCK_METADATA_SIGNATURES]).value
+        if value:
+            ordered = protos.OrdererBlockMetadata.FromString(value)
+            if ordered.HasField("last_config"):
+                return ordered.last_config.index
+    # orderers before 1.4.2 only fill the deprecated last config slot
+    if len(metadata) > protos.BLOCK_METADATA_LAST_CONFIG:
+        value = protos.Metadata.FromString(metadata[protos.BLOCK_METADATA_LAST_CONFIG]).value
+        if value:
+            return protos.LastConfig.FromString(value).index
+    return block.header.number
+
+
+class GatewayPool:
+    """Process wide pool of grpc channels and signers, keyed by peer and identity."""
+
+    def __init__(self, idle_timeout=PEER_GATEWAY_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._signers = {}
+
+    def _channel(self, address, root_cert, client_cert, client_key):
+        key = (address, root_cert, client_cert)
+        now = time.monotonic()
+        with self._lock:
+            for k, (channel, used) in list(self._channels.items()):
+                if k != key and now - used > self.idle_timeout:
+                    channel.close()
+                    del self._channels[k]
+
+            entry = self._channels.get(key)
+            if entry is None:
+                options = [
+                    ("grpc.keepalive_time_ms", 60000),
+                    ("grpc.keepalive_timeout_ms", 20000),
+                ]
+                if root_cert:
+                    credentials = grpc.ssl_channel_credentials(
+                        root_certificates=_read(root_cert),
+                        private_key=_read(client_key) if client_key else None,
+                        certificate_chain=_read(client_cert) if client_cert else None,
+                    )
+                    channel = grpc.secure_channel(address, credentials, options=options)
+                else:
+                    channel = grpc.insecure_channel(address, options=options)
+                entry = (channel, now)
+            self._channels[key] = (entry[0], now)
+            return entry[0]
+
+    def _signer(self, mspid, msp_path):
+        key = (mspid, msp_path)
+        with self._lock:
+            signer = self._signers.get(key)
+            if signer is None:
+                signer = self._signers[key] = Signer(mspid, msp_path)
+            return signer
+
+    def client(self, env):
+        """
+        Client of the peer and identity described by peer cli environment
+
+        :param env: CORE_PEER_* environment of peer cli
+        :return: client of peer
+        :rtype: PeerClient
+        """
+        tls = env.get("CORE_PEER_TLS_ENABLED") not in (None, "false")
+        channel = self._channel(
+            env["CORE_PEER_ADDRESS"],
+            env.get("CORE_PEER_TLS_ROOTCERT_FILE") if tls else None,
+            env.get("CORE_PEER_TLS_CLIENTCERT_FILE") if tls else None,
+            env.get("CORE_PEER_TLS_CLIENTKEY_FILE") if tls else None,
+        )
+        signer = self._signer(env["CORE_PEER_LOCALMSPID"], env["CORE_PEER_MSPCONFIGPATH"])
+        return PeerClient(channel, signer)
+
+    def orderer(self, env, address):
+        """
+        Client of an orderer, signing as the identity of peer cli environment
+
+        :param env: CORE_PEER_* and ORDERER_CA environment of peer cli
+        :param address: orderer endpoint, host:port
+        :return: client of orderer
+        :rtype: OrdererClient
+        """
+        tls = env.get("CORE_PEER_TLS_ENABLED") not in (None, "false")
+        channel = self._channel(
+            address,
+            env.get("ORDERER_CA") if tls else None,
+            env.get("CORE_PEER_TLS_CLIENTCERT_FILE") if tls else None,
+            env.get("CORE_PEER_TLS_CLIENTKEY_FILE") if tls else None,
+        )
+        return OrdererClient(channel, self.signer(env))
+
+    def signer(self, env):
+        """
+        Signing identity of peer cli environment
+
+        :param env: CORE_PEER_LOCALMSPID and CORE_PEER_MSPCONFIGPATH environment
+        :return: signer
+        :rtype: Signer
+        """
+        return self._signer(env["CORE_PEER_LOCALMSPID"], env["CORE_PEER_MSPCONFIGPATH"])
+
+    def close(self):
+        with self._lock:
+            for channel, _ in self._channels.values():
+                channel.close()
+            self._channels.clear()
+            self._signers.clear()
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+gateway_pool = GatewayPool()
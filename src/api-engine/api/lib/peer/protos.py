@@ -0,0 +1,294 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+"""
+Minimal fabric protobuf messages used by the peer gateway client and the
+in-process configtxlator.
+
+Only the messages and fields those need are declared, with the field
+numbers of fabric-protos, so they are wire compatible with peers and
+orderers without shipping generated code of the whole fabric protos tree.
+"""
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+_F = descriptor_pb2.FieldDescriptorProto
+_TYPES = {
+    "bytes": _F.TYPE_BYTES,
+    "string": _F.TYPE_STRING,
+    "bool": _F.TYPE_BOOL,
+    "int32": _F.TYPE_INT32,
+    "int64": _F.TYPE_INT64,
+    "uint32": _F.TYPE_UINT32,
+    "uint64": _F.TYPE_UINT64,
+}
+_PACKAGE = "cello.fabric"
+
+# message -> [(field, number, type, repeated, oneof)], map fields are ("map", key, value),
+# enum fields are ("enum", name)
+_MESSAGES = {
+    "Timestamp": [("seconds", 1, "int64"), ("nanos", 2, "int32")],
+    # common
+    "Header": [("channel_header", 1, "bytes"), ("signature_header", 2, "bytes")],
+    "ChannelHeader": [
+        ("type", 1, "int32"), ("version", 2, "int32"), ("timestamp", 3, "Timestamp"),
+        ("channel_id", 4, "string"), ("tx_id", 5, "string"), ("epoch", 6, "uint64"),
+        ("extension", 7, "bytes"), ("tls_cert_hash", 8, "bytes"),
+    ],
+    "SignatureHeader": [("creator", 1, "bytes"), ("nonce", 2, "bytes")],
+    "BlockchainInfo": [
+        ("height", 1, "uint64"), ("currentBlockHash", 2, "bytes"),
+        ("previousBlockHash", 3, "bytes"),
+    ],
+    # msp
+    "SerializedIdentity": [("mspid", 1, "string"), ("id_bytes", 2, "bytes")],
+    # peer
+    "ChaincodeID": [("path", 1, "string"), ("name", 2, "string"), ("version", 3, "string")],
+    "ChaincodeHeaderExtension": [("chaincode_id", 2, "ChaincodeID")],
+    "ChaincodeInput": [("args", 1, "bytes", True), ("is_init", 3, "bool")],
+    "ChaincodeSpec": [
+        ("type", 1, "int32"), ("chaincode_id", 2, "ChaincodeID"),
+        ("input", 3, "ChaincodeInput"), ("timeout", 4, "int32"),
+    ],
+    "ChaincodeInvocationSpec": [("chaincode_spec", 1, "ChaincodeSpec")],
+    "ChaincodeProposalPayload": [("input", 1, "bytes")],
+    "Proposal": [("header", 1, "bytes"), ("payload", 2, "bytes"), ("extension", 3, "bytes")],
+    "SignedProposal": [("proposal_bytes", 1, "bytes"), ("signature", 2, "bytes")],
+    "Response": [("status", 1, "int32"), ("message", 2, "string"), ("payload", 3, "bytes")],
+    "ProposalResponse": [
+        ("version", 1, "int32"), ("timestamp", 2, "Timestamp"),
+        ("response", 4, "Response"), ("payload", 5, "bytes"),
+    ],
+    "ChannelInfo": [("channel_id", 1, "string")],
+    "ChannelQueryResponse": [("channels", 1, "ChannelInfo", True)],
+    # peer lifecycle
+    "QueryInstalledChaincodesArgs": [],
+    "ChaincodeRef": [("name", 1, "string"), ("version", 2, "string")],
+    "References": [("chaincodes", 1, "ChaincodeRef", True)],
+    "InstalledChaincode": [
+        ("package_id", 1, "string"), ("label", 2, "string"),
+        ("references", 3, ("map", "string", "References")),
+    ],
+    "QueryInstalledChaincodesResult": [("installed_chaincodes", 1, "InstalledChaincode", True)],
+    "QueryChaincodeDefinitionArgs": [("name", 1, "string")],
+    "QueryChaincodeDefinitionResult": [
+        ("sequence", 1, "int64"), ("version", 2, "string"),
+        ("endorsement_plugin", 3, "string"), ("validation_plugin", 4, "string"),
+        ("validation_parameter", 5, "bytes"), ("collections", 6, "CollectionConfigPackage"),
+        ("init_required", 7, "bool"), ("approvals", 8, ("map", "string", "bool")),
+    ],
+    # peer private data collections and policies
+    "CollectionConfigPackage": [("config", 1, "CollectionConfig", True)],
+    "CollectionConfig": [("static_collection_config", 1, "StaticCollectionConfig", False, "payload")],
+    "StaticCollectionConfig": [
+        ("name", 1, "string"), ("member_orgs_policy", 2, "CollectionPolicyConfig"),
+        ("required_peer_count", 3, "int32"), ("maximum_peer_count", 4, "int32"),
+        ("block_to_live", 5, "uint64"), ("member_only_read", 6, "bool"),
+        ("member_only_write", 7, "bool"), ("endorsement_policy", 8, "ApplicationPolicy"),
+    ],
+    "CollectionPolicyConfig": [("signature_policy", 1, "SignaturePolicyEnvelope", False, "payload")],
+    "ApplicationPolicy": [
+        ("signature_policy", 1, "SignaturePolicyEnvelope", False, "Type"),
+        ("channel_config_policy_reference", 2, "string", False, "Type"),
+    ],
+    # common, blocks and envelopes
+    "BlockHeader": [("number", 1, "uint64"), ("previous_hash", 2, "bytes"), ("data_hash", 3, "bytes")],
+    "BlockData": [("data", 1, "bytes", True)],
+    "BlockMetadata": [("metadata", 1, "bytes", True)],
+    "Block": [("header", 1, "BlockHeader"), ("data", 2, "BlockData"), ("metadata", 3, "BlockMetadata")],
+    "Payload": [("header", 1, "Header"), ("data", 2, "bytes")],
+    "Envelope": [("payload", 1, "bytes"), ("signature", 2, "bytes")],
+    "Metadata": [("value", 1, "bytes"), ("signatures", 2, "MetadataSignature", True)],
+    "MetadataSignature": [
+        ("signature_header", 1, "bytes"), ("signature", 2, "bytes"), ("identifier_header", 3, "bytes"),
+    ],
+    "LastConfig": [("index", 1, "uint64")],
+    "OrdererBlockMetadata": [("last_config", 1, "LastConfig"), ("consenter_metadata", 2, "bytes")],
+    # orderer, deliver and broadcast
+    "SeekNewest": [],
+    "SeekOldest": [],
+    "SeekSpecified": [("number", 1, "uint64")],
+    "SeekPosition": [
+        ("newest", 1, "SeekNewest", False, "Type"), ("oldest", 2, "SeekOldest", False, "Type"),
+        ("specified", 3, "SeekSpecified", False, "Type"),
+    ],
+    "SeekInfo": [
+        ("start", 1, "SeekPosition"), ("stop", 2, "SeekPosition"), ("behavior", 3, "int32"),
+    ],
+    "DeliverResponse": [("status", 1, "int32", False, "Type"), ("block", 2, "Block", False, "Type")],
+    "BroadcastResponse": [("status", 1, "int32"), ("info", 2, "string")],
+    # common, channel config
+    "ConfigEnvelope": [("config", 1, "Config"), ("last_update", 2, "Envelope")],
+    "Config": [("sequence", 1, "uint64"), ("channel_group", 2, "ConfigGroup")],
+    "ConfigUpdateEnvelope": [("config_update", 1, "bytes"), ("signatures", 2, "ConfigSignature", True)],
+    "ConfigUpdate": [
+        ("channel_id", 1, "string"), ("read_set", 2, "ConfigGroup"), ("write_set", 3, "ConfigGroup"),
+        ("isolated_data", 5, ("map", "string", "bytes")),
+    ],
+    "ConfigGroup": [
+        ("version", 1, "uint64"), ("groups", 2, ("map", "string", "ConfigGroup")),
+        ("values", 3, ("map", "string", "ConfigValue")),
+        ("policies", 4, ("map", "string", "ConfigPolicy")), ("mod_policy", 5, "string"),
+    ],
+    "ConfigValue": [("version", 1, "uint64"), ("value", 2, "bytes"), ("mod_policy", 3, "string")],
+    "ConfigPolicy": [("version", 1, "uint64"), ("policy", 2, "Policy"), ("mod_policy", 3, "string")],
+    "ConfigSignature": [("signature_header", 1, "bytes"), ("signature", 2, "bytes")],
+    # common, policies
+    "Policy": [("type", 1, "int32"), ("value", 2, "bytes")],
+    "SignaturePolicyEnvelope": [
+        ("version", 1, "int32"), ("rule", 2, "SignaturePolicy"), ("identities", 3, "MSPPrincipal", True),
+    ],
+    "SignaturePolicy": [
+        ("signed_by", 1, "int32", False, "Type"), ("n_out_of", 2, "NOutOf", False, "Type"),
+    ],
+    "NOutOf": [("n", 1, "int32"), ("rules", 2, "SignaturePolicy", True)],
+    "ImplicitMetaPolicy": [("sub_policy", 1, "string"), ("rule", 2, ("enum", "ImplicitMetaRule"))],
+    # common, config values
+    "HashingAlgorithm": [("name", 1, "string")],
+    "BlockDataHashingStructure": [("width", 1, "uint32")],
+    "OrdererAddresses": [("addresses", 1, "string", True)],
+    "Consortium": [("name", 1, "string")],
+    "Capability": [],
+    "Capabilities": [("capabilities", 1, ("map", "string", "Capability"))],
+    # msp
+    "MSPPrincipal": [
+        ("principal_classification", 1, ("enum", "MSPPrincipalClassification")), ("principal", 2, "bytes"),
+    ],
+    "MSPRole": [("msp_identifier", 1, "string"), ("role", 2, ("enum", "MSPRoleType"))],
+    "MSPConfig": [("type", 1, "int32"), ("config", 2, "bytes")],
+    "FabricMSPConfig": [
+        ("name", 1, "string"), ("root_certs", 2, "bytes", True), ("intermediate_certs", 3, "bytes", True),
+        ("admins", 4, "bytes", True), ("revocation_list", 5, "bytes", True),
+        ("signing_identity", 6, "SigningIdentityInfo"),
+        ("organizational_unit_identifiers", 7, "FabricOUIdentifier", True),
+        ("crypto_config", 8, "FabricCryptoConfig"), ("tls_root_certs", 9, "bytes", True),
+        ("tls_intermediate_certs", 10, "bytes", True), ("fabric_node_ous", 11, "FabricNodeOUs"),
+    ],
+    "KeyInfo": [("key_identifier", 1, "string"), ("key_material", 2, "bytes")],
+    "SigningIdentityInfo": [("public_signer", 1, "bytes"), ("private_signer", 2, "KeyInfo")],
+    "FabricOUIdentifier": [("certificate", 1, "bytes"), ("organizational_unit_identifier", 2, "string")],
+    "FabricCryptoConfig": [
+        ("signature_hash_family", 1, "string"), ("identity_identifier_hash_function", 2, "string"),
+    ],
+    "FabricNodeOUs": [
+        ("enable", 1, "bool"), ("client_ou_identifier", 2, "FabricOUIdentifier"),
+        ("peer_ou_identifier", 3, "FabricOUIdentifier"), ("admin_ou_identifier", 4, "FabricOUIdentifier"),
+        ("orderer_ou_identifier", 5, "FabricOUIdentifier"),
+    ],
+    # orderer config values
+    "ConsensusType": [
+        ("type", 1, "string"), ("metadata", 2, "bytes"), ("state", 3, ("enum", "ConsensusTypeState")),
+    ],
+    "BatchSize": [
+        ("max_message_count", 1, "uint32"), ("absolute_max_bytes", 2, "uint32"),
+        ("preferred_max_bytes", 3, "uint32"),
+    ],
+    "BatchTimeout": [("timeout", 1, "string")],
+    "ChannelRestrictions": [("max_count", 1, "uint64")],
+    "KafkaBrokers": [("brokers", 1, "string", True)],
+    "Consenter": [
+        ("host", 1, "string"), ("port", 2, "uint32"), ("client_tls_cert", 3, "bytes"),
+        ("server_tls_cert", 4, "bytes"),
+    ],
+    "Options": [
+        ("tick_interval", 1, "string"), ("election_tick", 2, "uint32"), ("heartbeat_tick", 3, "uint32"),
+        ("max_inflight_blocks", 4, "uint32"), ("snapshot_interval_size", 5, "uint32"),
+    ],
+    "ConfigMetadata": [("consenters", 1, "Consenter", True), ("options", 2, "Options")],
+    # peer config values
+    "AnchorPeer": [("host", 1, "string"), ("port", 2, "int32")],
+    "AnchorPeers": [("anchor_peers", 1, "AnchorPeer", True)],
+    "APIResource": [("policy_ref", 1, "string")],
+    "ACLs": [("acls", 1, ("map", "string", "APIResource"))],
+}
+
+# enum -> [(name, number)]
+_ENUMS = {
+    "ImplicitMetaRule": [("ANY", 0), ("ALL", 1), ("MAJORITY", 2)],
+    "MSPPrincipalClassification": [
+        ("ROLE", 0), ("ORGANIZATION_UNIT", 1), ("IDENTITY", 2), ("ANONYMITY", 3), ("COMBINED", 4),
+    ],
+    "MSPRoleType": [("MEMBER", 0), ("ADMIN", 1), ("CLIENT", 2), ("PEER", 3), ("ORDERER", 4)],
+    "ConsensusTypeState": [("STATE_NORMAL", 0), ("STATE_MAINTENANCE", 1)],
+}
+
+# common.HeaderType
+CONFIG = 1
+CONFIG_UPDATE = 2
+ENDORSER_TRANSACTION = 3
+DELIVER_SEEK_INFO = 5
+# common.BlockMetadataIndex
+BLOCK_METADATA_SIGNATURES = 0
+BLOCK_METADATA_LAST_CONFIG = 1
+# common.Status
+STATUS_SUCCESS = 200
+# orderer.SeekInfo.SeekBehavior
+FAIL_IF_NOT_READY = 1
+# common.Policy.PolicyType
+SIGNATURE_POLICY = 1
+IMPLICIT_META_POLICY = 3
+# peer.ChaincodeSpec.Type
+GOLANG = 1
+
+
+def _field(message, name, number, type_, repeated=False, oneof=None):
+    field = message.field.add(name=name, number=number)
+    field.label = _F.LABEL_REPEATED if repeated else _F.LABEL_OPTIONAL
+    if oneof is not None:
+        names = [o.name for o in message.oneof_decl]
+        if oneof not in names:
+            message.oneof_decl.add(name=oneof)
+            names.append(oneof)
+        field.oneof_index = names.index(oneof)
+    if isinstance(type_, tuple) and type_[0] == "enum":
+        field.type = _F.TYPE_ENUM
+        field.type_name = ".{}.{}".format(_PACKAGE, type_[1])
+    elif isinstance(type_, tuple):
+        # map<key, value> is a repeated nested entry message
+        _, key, value = type_
+        entry = message.nested_type.add(
+            name="".join(p.capitalize() for p in name.split("_")) + "Entry"
+        )
+        entry.options.map_entry = True
+        _field(entry, "key", 1, key)
+        _field(entry, "value", 2, value)
+        field.label = _F.LABEL_REPEATED
+        field.type = _F.TYPE_MESSAGE
+        field.type_name = ".{}.{}.{}".format(_PACKAGE, message.name, entry.name)
+    elif type_ in _TYPES:
+        field.type = _TYPES[type_]
+    else:
+        field.type = _F.TYPE_MESSAGE
+        field.type_name = ".{}.{}".format(_PACKAGE, type_)
+
+
+def _build():
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name="cello/fabric.proto", package=_PACKAGE, syntax="proto3"
+    )
+    for name, values in _ENUMS.items():
+        enum = file_proto.enum_type.add(name=name)
+        for value, number in values:
+            enum.value.add(name=value, number=number)
+    for name, fields in _MESSAGES.items():
+        message = file_proto.message_type.add(name=name)
+        for field in fields:
+            _field(message, *field)
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    get_class = getattr(message_factory, "GetMessageClass", None)
+    if get_class is None:
+        get_class = message_factory.MessageFactory(pool).GetPrototype
+    return {
+        name: get_class(pool.FindMessageTypeByName("{}.{}".format(_PACKAGE, name)))
+        for name in _MESSAGES
+    }
+
+
+_classes = _build()
+globals().update(_classes)
+__all__ = list(_classes) + [
+    "CONFIG", "CONFIG_UPDATE", "ENDORSER_TRANSACTION", "DELIVER_SEEK_INFO", "GOLANG",
+    "BLOCK_METADATA_SIGNATURES", "BLOCK_METADATA_LAST_CONFIG", "STATUS_SUCCESS", "FAIL_IF_NOT_READY",
+    "SIGNATURE_POLICY", "IMPLICIT_META_POLICY",
+]
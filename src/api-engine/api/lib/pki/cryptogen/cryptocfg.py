@@ -1,7 +1,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-import yaml
+from api.utils.template import load_yaml, dump_yaml
 import os
 from api.config import CELLO_HOME
 
@@ -69,7 +69,7 @@ class CryptoConfig:
             os.system('mkdir -p {}/{}'.format(self.filepath, self.name))
 
             with open('{}/{}/{}'.format(self.filepath, self.name, self.file), 'w', encoding='utf-8') as f:
-                yaml.dump(network, f)
+                dump_yaml(network, f)
         except Exception as e:
             err_msg = "CryptoConfig create failed for {}!".format(e)
             raise Exception(err_msg)
@@ -82,7 +82,7 @@ class CryptoConfig:
         """
         try:
             with open('{}/{}/{}'.format(self.filepath, self.name, self.file), 'r+', encoding='utf-8') as f:
-                network = yaml.load(f, Loader=yaml.FullLoader)
+                network = load_yaml(f)
                 if org_info["type"] == "peer":
                     orgs = network['PeerOrgs']
                 else:
@@ -94,7 +94,7 @@ class CryptoConfig:
                         specs.append(dict(Hostname=host))
 
             with open('{}/{}/{}'.format(self.filepath, self.name, self.file), 'w', encoding='utf-8') as f:
-                yaml.dump(network, f)
+                dump_yaml(network, f)
         except Exception as e:
             err_msg = "CryptoConfig update failed for {}!".format(e)
             raise Exception(err_msg)
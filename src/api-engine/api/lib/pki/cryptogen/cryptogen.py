@@ -1,26 +1,37 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-from subprocess import call
+import os
+from api.lib.runner import run
 from api.config import CELLO_HOME, FABRIC_TOOL
 
+# "binary" runs the fabric cryptogen tool, "native" issues in process
+CRYPTOGEN_BACKEND = os.getenv("CRYPTOGEN_BACKEND", "binary")
+
 
 class CryptoGen:
     """Class represents crypto-config tool."""
 
-    def __init__(self, name, filepath=CELLO_HOME, cryptogen=FABRIC_TOOL, version="2.2.0"):
+    def __init__(self, name, filepath=CELLO_HOME, cryptogen=FABRIC_TOOL, version="2.2.0", backend=CRYPTOGEN_BACKEND):
         """init CryptoGen
                 param:
                     name: organization's name
                     cryptogen: tool path
                     version: version
                     filepath: cello's working directory
+                    backend: binary or native
                 return:
         """
         self.cryptogen = cryptogen + "/cryptogen"
         self.filepath = filepath
         self.version = version
         self.name = name
+        self.backend = backend
+
+    def _native(self):
+        from api.lib.pki.pkigen.pkigen import PkiGen
+
+        return PkiGen(self.name, filepath=self.filepath)
 
     def generate(self, output="crypto-config", config="crypto-config.yaml"):
         """Generate key material
@@ -29,9 +40,13 @@ class CryptoGen:
                     config: The configuration template to use
                 return:
         """
+        if self.backend == "native":
+            return self._native().generate(output, config)
         try:
-            call([self.cryptogen, "generate", "--output={}/{}/{}".format(self.filepath, self.name, output),
-                  "--config={}/{}/{}".format(self.filepath, self.name, config)])
+            res = run([self.cryptogen, "generate", "--output={}/{}/{}".format(self.filepath, self.name, output),
+                       "--config={}/{}/{}".format(self.filepath, self.name, config)])
+            if res.returncode != 0:
+                raise Exception(str(res.stderr, encoding="utf-8"))
         except Exception as e:
             err_msg = "cryptogen generate fail for {}!".format(e)
             raise Exception(err_msg)
@@ -43,10 +58,13 @@ class CryptoGen:
                     config: The configuration template to use
                 return:
         """
+        if self.backend == "native":
+            return self._native().extend(input, config)
         try:
-            call([self.cryptogen, "extend", "--input={}/{}/{}".format(self.filepath, self.name, input),
-                  "--config={}/{}/{}".format(self.filepath, self.name, config)])
+            res = run([self.cryptogen, "extend", "--input={}/{}/{}".format(self.filepath, self.name, input),
+                       "--config={}/{}/{}".format(self.filepath, self.name, config)])
+            if res.returncode != 0:
+                raise Exception(str(res.stderr, encoding="utf-8"))
         except Exception as e:
             err_msg = "cryptogen extend fail for {}!".format(e)
             raise Exception(err_msg)
-
@@ -0,0 +1,396 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import datetime
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+from api.config import CELLO_HOME
+from api.utils.template import load_yaml, dump_yaml
+
+# threads issuing identities of one organization
+PKI_SIGN_WORKERS = int(os.getenv("PKI_SIGN_WORKERS", 8))
+CERT_VALIDITY_DAYS = 3650
+KEY_FILE = "priv_sk"
+
+# loaded CA keys, path of CA cert -> (mtime, Authority)
+_authorities = {}
+_lock = threading.Lock()
+
+
+class Authority:
+    """Key and certificate of a CA which signs identities."""
+
+    def __init__(self, key, cert):
+        self.key = key
+        self.cert = cert
+        self.pem = cert.public_bytes(serialization.Encoding.PEM)
+        self.ski = cert.extensions.get_extension_for_class(
+            x509.SubjectKeyIdentifier
+        ).value
+
+
+def _new_key():
+    return ec.generate_private_key(ec.SECP256R1())
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _write_key(path, key):
+    _write(
+        path,
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ),
+    )
+
+
+def _load_key(path):
+    with open(path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+def _name(ca_spec, cn, org=None, ou=None):
+    attrs = [
+        x509.NameAttribute(NameOID.COUNTRY_NAME, ca_spec.get("Country", "US")),
+        x509.NameAttribute(
+            NameOID.STATE_OR_PROVINCE_NAME, ca_spec.get("Province", "California")
+        ),
+        x509.NameAttribute(
+            NameOID.LOCALITY_NAME, ca_spec.get("Locality", "San Francisco")
+        ),
+    ]
+    if org:
+        attrs.append(x509.NameAttribute(NameOID.ORGANIZATION_NAME, org))
+    if ou:
+        attrs.append(x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, ou))
+    attrs.append(x509.NameAttribute(NameOID.COMMON_NAME, cn))
+    return x509.Name(attrs)
+
+
+def _builder(subject, issuer, public_key):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(issuer)
+        .public_key(public_key)
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=CERT_VALIDITY_DAYS))
+        .add_extension(
+            x509.SubjectKeyIdentifier.from_public_key(public_key),
+            critical=False,
+        )
+    )
+
+
+def _authority(ca_dir, cn, domain, ca_spec):
+    """
+    Load CA of organization, create it when it does not exist yet.
+    Loaded CAs are kept in process until their cert file changes.
+
+    :param ca_dir: directory of CA key and cert
+    :param cn: common name of CA
+    :param domain: domain of organization
+    :param ca_spec: CA section of crypto-config
+    :return: CA
+    :rtype: Authority
+    """
+    cert_path = os.path.join(ca_dir, "{}-cert.pem".format(cn))
+    key_path = os.path.join(ca_dir, KEY_FILE)
+    with _lock:
+        try:
+            mtime = os.stat(cert_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        cached = _authorities.get(cert_path)
+        if mtime is not None and cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        if mtime is not None:
+            key = _load_key(key_path)
+            with open(cert_path, "rb") as f:
+                cert = x509.load_pem_x509_certificate(f.read())
+        else:
+            key = _new_key()
+            subject = _name(ca_spec, cn, org=domain)
+            cert = (
+                _builder(subject, subject, key.public_key())
+                .add_extension(
+                    x509.BasicConstraints(ca=True, path_length=None),
+                    critical=True,
+                )
+                .add_extension(
+                    x509.KeyUsage(
+                        digital_signature=True,
+                        content_commitment=False,
+                        key_encipherment=True,
+                        data_encipherment=False,
+                        key_agreement=False,
+                        key_cert_sign=True,
+                        crl_sign=True,
+                        encipher_only=False,
+                        decipher_only=False,
+                    ),
+                    critical=True,
+                )
+                .add_extension(
+                    x509.ExtendedKeyUsage(
+                        [
+                            ExtendedKeyUsageOID.CLIENT_AUTH,
+                            ExtendedKeyUsageOID.SERVER_AUTH,
+                        ]
+                    ),
+                    critical=False,
+                )
+                .sign(key, hashes.SHA256())
+            )
+            _write_key(key_path, key)
+            _write(cert_path, cert.public_bytes(serialization.Encoding.PEM))
+            mtime = os.stat(cert_path).st_mtime_ns
+
+        authority = Authority(key, cert)
+        _authorities[cert_path] = (mtime, authority)
+        return authority
+
+
+def _sign(authority, subject, public_key, tls=False, sans=None):
+    builder = (
+        _builder(subject, authority.cert.subject, public_key)
+        .add_extension(
+            x509.BasicConstraints(ca=False, path_length=None), critical=True
+        )
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=True,
+                content_commitment=False,
+                key_encipherment=tls,
+                data_encipherment=False,
+                key_agreement=tls,
+                key_cert_sign=False,
+                crl_sign=False,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_subject_key_identifier(
+                authority.ski
+            ),
+            critical=False,
+        )
+    )
+    if tls:
+        builder = builder.add_extension(
+            x509.ExtendedKeyUsage(
+                [ExtendedKeyUsageOID.SERVER_AUTH, ExtendedKeyUsageOID.CLIENT_AUTH]
+            ),
+            critical=False,
+        )
+    if sans:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName([x509.DNSName(san) for san in sans]),
+            critical=False,
+        )
+    return builder.sign(authority.key, hashes.SHA256())
+
+
+class PkiGen:
+    """Class issues crypto material of crypto-config in process."""
+
+    def __init__(self, name, filepath=CELLO_HOME, workers=PKI_SIGN_WORKERS):
+        """init PkiGen
+                param:
+                    name: organization's name
+                    filepath: cello's working directory
+                    workers: threads issuing identities
+                return:
+        """
+        self.filepath = filepath
+        self.name = name
+        self.workers = workers
+
+    def generate(self, output="crypto-config", config="crypto-config.yaml"):
+        """Generate key material
+                param:
+                    output: The output directory in which to place artifacts
+                    config: The configuration template to use
+                return:
+        """
+        try:
+            self._issue(output, config)
+        except Exception as e:
+            err_msg = "pkigen generate fail for {}!".format(e)
+            raise Exception(err_msg)
+
+    def extend(self, input="crypto-config", config="crypto-config.yaml"):
+        """Extend existing network, only identities not on disk are issued
+                param:
+                    input: The input directory in which existing network place
+                    config: The configuration template to use
+                return:
+        """
+        try:
+            self._issue(input, config)
+        except Exception as e:
+            err_msg = "pkigen extend fail for {}!".format(e)
+            raise Exception(err_msg)
+
+    def _issue(self, output, config):
+        base = "{}/{}/{}".format(self.filepath, self.name, output)
+        with open("{}/{}/{}".format(self.filepath, self.name, config), "r", encoding="utf-8") as f:
+            network = load_yaml(f) or {}
+
+        for org in network.get("PeerOrgs") or []:
+            self._org(os.path.join(base, "peerOrganizations"), org, "peer")
+        for org in network.get("OrdererOrgs") or []:
+            self._org(os.path.join(base, "ordererOrganizations"), org, "orderer")
+
+    def _org(self, base, spec, node_type):
+        """
+        Issue missing identities of one organization
+
+        :param base: directory of organizations
+        :param spec: organization spec of crypto-config
+        :param node_type: peer or orderer
+        :return: none
+        :rtype: none
+        """
+        domain = spec["Domain"]
+        ca_spec = spec.get("CA") or {}
+        node_ous = bool(spec.get("EnableNodeOUs"))
+        org_dir = os.path.join(base, domain)
+        ca = _authority(os.path.join(org_dir, "ca"), "ca.{}".format(domain), domain, ca_spec)
+        tlsca = _authority(
+            os.path.join(org_dir, "tlsca"), "tlsca.{}".format(domain), domain, ca_spec
+        )
+
+        admin = "Admin@{}".format(domain)
+        admin_dir = os.path.join(org_dir, "users", admin)
+        if not self._issued(admin_dir):
+            self._identity(
+                admin_dir, admin, ca, tlsca, domain, ca_spec, node_ous,
+                ou="admin" if node_ous else None, client=True, admin_cert=None,
+            )
+        admin_cert = None
+        if not node_ous:
+            # without NodeOUs admins are listed in admincerts of every msp
+            with open(os.path.join(admin_dir, "msp", "signcerts", "{}-cert.pem".format(admin)), "rb") as f:
+                admin_cert = f.read()
+            _write(os.path.join(admin_dir, "msp", "admincerts", "{}-cert.pem".format(admin)), admin_cert)
+        self._msp(os.path.join(org_dir, "msp"), ca, tlsca, domain, node_ous, admin_cert)
+
+        jobs = []
+        for host in self._hosts(spec, node_type):
+            name = "{}.{}".format(host.get("Hostname"), domain)
+            node_dir = os.path.join(org_dir, "{}s".format(node_type), name)
+            if not self._issued(node_dir):
+                sans = [name, host.get("Hostname")] + list(host.get("SANS") or [])
+                jobs.append((node_dir, name, node_type, False, sans))
+        if node_type == "peer":
+            users = (spec.get("Users") or {}).get("Count", 0)
+            for i in range(1, users + 1):
+                name = "User{}@{}".format(i, domain)
+                user_dir = os.path.join(org_dir, "users", name)
+                if not self._issued(user_dir):
+                    jobs.append((user_dir, name, "client", True, None))
+
+        if not jobs:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(jobs)))) as pool:
+            futures = [
+                pool.submit(
+                    self._identity, path, name, ca, tlsca, domain, ca_spec, node_ous,
+                    ou=ou if node_ous else None, client=client, admin_cert=admin_cert,
+                    sans=sans,
+                )
+                for path, name, ou, client, sans in jobs
+            ]
+            for future in futures:
+                future.result()
+
+    @staticmethod
+    def _hosts(spec, node_type):
+        hosts = [dict(host) for host in spec.get("Specs") or []]
+        template = spec.get("Template") or {}
+        start = template.get("Start", 0)
+        for i in range(start, start + template.get("Count", 0)):
+            hosts.append(
+                dict(Hostname="{}{}".format(node_type, i), SANS=template.get("SANS"))
+            )
+        return hosts
+
+    @staticmethod
+    def _issued(path):
+        return os.path.isdir(os.path.join(path, "msp", "signcerts"))
+
+    @staticmethod
+    def _msp(msp_dir, ca, tlsca, domain, node_ous, admin_cert):
+        """
+        Write the verifying msp of organization or node, with the layout of cryptogen
+        """
+        ca_file = "ca.{}-cert.pem".format(domain)
+        _write(os.path.join(msp_dir, "cacerts", ca_file), ca.pem)
+        _write(os.path.join(msp_dir, "tlscacerts", "tlsca.{}-cert.pem".format(domain)), tlsca.pem)
+        os.makedirs(os.path.join(msp_dir, "admincerts"), exist_ok=True)
+        if admin_cert is not None:
+            _write(os.path.join(msp_dir, "admincerts", "Admin@{}-cert.pem".format(domain)), admin_cert)
+        if node_ous:
+            def identifier(ou):
+                return dict(Certificate="cacerts/{}".format(ca_file), OrganizationalUnitIdentifier=ou)
+
+            config = dict(
+                NodeOUs=dict(
+                    Enable=True,
+                    ClientOUIdentifier=identifier("client"),
+                    PeerOUIdentifier=identifier("peer"),
+                    AdminOUIdentifier=identifier("admin"),
+                    OrdererOUIdentifier=identifier("orderer"),
+                )
+            )
+            _write(os.path.join(msp_dir, "config.yaml"), dump_yaml(config).encode())
+
+    def _identity(self, path, name, ca, tlsca, domain, ca_spec, node_ous, ou=None,
+                  client=False, admin_cert=None, sans=None, key=None, tls_key=None):
+        """
+        Issue signing and tls identity of a node or user into its msp and tls
+        directory, keys are generated unless they are given
+        """
+        msp_dir = os.path.join(path, "msp")
+        key = key or _new_key()
+        cert = _sign(ca, _name(ca_spec, name, ou=ou), key.public_key())
+        tls_key = tls_key or _new_key()
+        tls_cert = _sign(
+            tlsca, _name(ca_spec, name), tls_key.public_key(), tls=True,
+            sans=sans or [name],
+        )
+
+        self._msp(msp_dir, ca, tlsca, domain, node_ous, admin_cert)
+        _write_key(os.path.join(msp_dir, "keystore", KEY_FILE), key)
+        _write(os.path.join(path, "tls", "ca.crt"), tlsca.pem)
+        prefix = "client" if client else "server"
+        _write_key(os.path.join(path, "tls", "{}.key".format(prefix)), tls_key)
+        _write(
+            os.path.join(path, "tls", "{}.crt".format(prefix)),
+            tls_cert.public_bytes(serialization.Encoding.PEM),
+        )
+        # signcerts is written last, it marks the identity as issued
+        _write(
+            os.path.join(msp_dir, "signcerts", "{}-cert.pem".format(name)),
+            cert.public_bytes(serialization.Encoding.PEM),
+        )
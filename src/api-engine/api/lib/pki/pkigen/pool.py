@@ -0,0 +1,173 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import fcntl
+import logging
+import os
+import shutil
+from uuid import uuid4
+
+from api.config import CELLO_HOME
+from api.lib.pki.pkigen.pkigen import (
+    KEY_FILE,
+    PkiGen,
+    _authority,
+    _load_key,
+    _new_key,
+    _write,
+    _write_key,
+)
+from api.utils.template import load_yaml
+
+LOG = logging.getLogger(__name__)
+
+# identities kept ready per organization and node type
+IDENTITY_POOL_SIZE = int(os.getenv("IDENTITY_POOL_SIZE", 8))
+# refill is triggered when the pool drops below this
+IDENTITY_POOL_LOW_WATER = int(os.getenv("IDENTITY_POOL_LOW_WATER", 2))
+
+
+class IdentityPool:
+    """
+    Pool of prepared node identities of an organization.
+
+    An entry holds the msp/tls layout of a node with its signing and tls keys
+    already generated. Claiming an entry moves it to the node directory and
+    signs its certificates for the node hostname with the cached org CAs, so
+    node creation needs neither cryptogen nor key generation.
+    """
+
+    def __init__(self, org, node_type, filepath=CELLO_HOME, config="crypto-config.yaml"):
+        """
+        init IdentityPool
+
+        :param org: organization name
+        :param node_type: peer or orderer
+        :param filepath: cello's working directory
+        :param config: crypto-config of organization
+        :return: none
+        :rtype: none
+        """
+        self.org = org
+        self.node_type = node_type
+        with open("{}/{}/{}".format(filepath, org, config), "r", encoding="utf-8") as f:
+            network = load_yaml(f) or {}
+        orgs = network.get("PeerOrgs" if node_type == "peer" else "OrdererOrgs") or [{}]
+        self.spec = orgs[0]
+        self.domain = self.spec.get("Domain")
+        self.ca_spec = self.spec.get("CA") or {}
+        self.node_ous = bool(self.spec.get("EnableNodeOUs"))
+        self.org_dir = "{}/{}/crypto-config/{}Organizations/{}".format(
+            filepath, org, node_type, self.domain
+        )
+        self.pool_dir = os.path.join(self.org_dir, ".pool", node_type)
+
+    def _entries(self):
+        try:
+            return sorted(e for e in os.listdir(self.pool_dir) if not e.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def size(self):
+        """
+        Number of identities ready in pool
+
+        :return: size of pool
+        :rtype: int
+        """
+        return len(self._entries())
+
+    def _authorities(self):
+        ca = _authority(
+            os.path.join(self.org_dir, "ca"), "ca.{}".format(self.domain),
+            self.domain, self.ca_spec,
+        )
+        tlsca = _authority(
+            os.path.join(self.org_dir, "tlsca"), "tlsca.{}".format(self.domain),
+            self.domain, self.ca_spec,
+        )
+        return ca, tlsca
+
+    def _admin_cert(self):
+        if self.node_ous:
+            return None
+        admin = "Admin@{}".format(self.domain)
+        with open(os.path.join(self.org_dir, "users", admin, "msp", "signcerts",
+                               "{}-cert.pem".format(admin)), "rb") as f:
+            return f.read()
+
+    def fill(self, size=IDENTITY_POOL_SIZE):
+        """
+        Prepare identities until the pool holds size of them
+
+        :param size: target size of pool
+        :return: number of prepared identities
+        :rtype: int
+        """
+        # pool is only filled for organizations cryptogen already generated
+        if not self.domain or not os.path.isdir(os.path.join(self.org_dir, "ca")):
+            return 0
+
+        os.makedirs(self.pool_dir, exist_ok=True)
+        with open(os.path.join(self.pool_dir, ".lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # another worker is filling this pool
+                return 0
+
+            ca, tlsca = self._authorities()
+            admin_cert = self._admin_cert()
+            prepared = 0
+            for _ in range(size - self.size()):
+                entry = uuid4().hex
+                tmp = os.path.join(self.pool_dir, ".{}".format(entry))
+                PkiGen._msp(os.path.join(tmp, "msp"), ca, tlsca, self.domain,
+                            self.node_ous, admin_cert)
+                _write_key(os.path.join(tmp, "msp", "keystore", KEY_FILE), _new_key())
+                _write_key(os.path.join(tmp, "tls", "server.key"), _new_key())
+                # publish the entry only once it is complete
+                os.rename(tmp, os.path.join(self.pool_dir, entry))
+                prepared += 1
+
+        return prepared
+
+    def claim(self, name):
+        """
+        Move a prepared identity to node and issue its certificates
+
+        :param name: node name
+        :return: whether node got an identity from pool
+        :rtype: bool
+        """
+        if not self.domain:
+            return False
+        hostname = "{}.{}".format(name, self.domain)
+        node_dir = os.path.join(self.org_dir, "{}s".format(self.node_type), hostname)
+        if os.path.exists(node_dir):
+            return False
+
+        os.makedirs(os.path.dirname(node_dir), exist_ok=True)
+        for entry in self._entries():
+            try:
+                os.rename(os.path.join(self.pool_dir, entry), node_dir)
+            except FileNotFoundError:
+                # claimed by another request
+                continue
+
+            try:
+                ca, tlsca = self._authorities()
+                PkiGen(self.org)._identity(
+                    node_dir, hostname, ca, tlsca, self.domain, self.ca_spec,
+                    self.node_ous, ou=self.node_type if self.node_ous else None,
+                    admin_cert=self._admin_cert(), sans=[hostname, name],
+                    key=_load_key(os.path.join(node_dir, "msp", "keystore", KEY_FILE)),
+                    tls_key=_load_key(os.path.join(node_dir, "tls", "server.key")),
+                )
+            except Exception as e:
+                LOG.error("Claim identity of %s failed: %s", hostname, e)
+                shutil.rmtree(node_dir, ignore_errors=True)
+                return False
+            return True
+
+        return False
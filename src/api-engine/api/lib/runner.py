@@ -0,0 +1,271 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import asyncio
+import bisect
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+LOG = logging.getLogger(__name__)
+
+# deadline of a fabric binary call in seconds
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", 300))
+# bytes kept of stdout and stderr each, the rest is drained and dropped
+COMMAND_MAX_OUTPUT = int(os.getenv("COMMAND_MAX_OUTPUT", 4 * 1024 * 1024))
+# subcommands of the binaries which name an operation, e.g. peer lifecycle
+# chaincode install, other arguments never become part of the name
+OPERATIONS = {
+    "peer": {
+        "channel": dict.fromkeys((
+            "create", "fetch", "getinfo", "join", "joinbysnapshot",
+            "joinbysnapshotstatus", "list", "signconfigtx", "update",
+        )),
+        "chaincode": dict.fromkeys((
+            "install", "instantiate", "invoke", "list", "package", "query",
+            "signpackage", "upgrade",
+        )),
+        "lifecycle": {
+            "chaincode": dict.fromkeys((
+                "approveformyorg", "calculatepackageid", "checkcommitreadiness",
+                "commit", "getinstalledpackage", "install", "package",
+                "queryapproved", "querycommitted", "queryinstalled",
+            )),
+        },
+        "node": dict.fromkeys((
+            "pause", "rebuild-dbs", "reset", "resume", "rollback", "start",
+            "unjoin", "upgrade-dbs",
+        )),
+        "snapshot": dict.fromkeys(("cancelrequest", "listpending", "submitrequest")),
+        "version": None,
+    },
+    "configtxgen": {},
+    "configtxlator": dict.fromkeys((
+        "compute_update", "proto_decode", "proto_encode", "start", "version",
+    )),
+    "cryptogen": dict.fromkeys(("extend", "generate", "showtemplate", "version")),
+    "go": {
+        "mod": dict.fromkeys(("download", "tidy", "vendor")),
+        "build": None,
+        "version": None,
+    },
+}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+READ_CHUNK_SIZE = 64 * 1024
+
+CommandResult = namedtuple(
+    "CommandResult", ["returncode", "stdout", "stderr", "duration", "truncated"]
+)
+
+
+class CommandTimeout(Exception):
+    """Command did not finish before its deadline and was killed."""
+
+
+class LatencyHistogram:
+    """Latency histogram of commands, per binary and subcommand."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, operation, seconds, failed=False):
+        with self._lock:
+            series = self._series.get(operation)
+            if series is None:
+                series = self._series[operation] = {
+                    "buckets": [0] * (len(self.buckets) + 1),
+                    "count": 0,
+                    "sum": 0.0,
+                    "failed": 0,
+                }
+            series["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+            series["failed"] += int(failed)
+
+    def snapshot(self):
+        """
+        Copy of the histogram
+
+        :return: operation -> buckets(upper bound -> count), count, sum, failed
+        :rtype: dict
+        """
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        with self._lock:
+            return {
+                operation: dict(
+                    series,
+                    buckets=dict(zip(bounds, series["buckets"])),
+                )
+                for operation, series in self._series.items()
+            }
+
+
+histogram = LatencyHistogram()
+
+
+def operation_name(args):
+    """
+    Name of the operation an argument vector runs, binary and subcommand
+
+    :param args: argument vector
+    :return: e.g. "peer channel join"
+    :rtype: str
+    """
+    words = [os.path.basename(args[0])]
+    commands = OPERATIONS.get(words[0])
+    for arg in args[1:]:
+        if not commands or arg not in commands:
+            break
+        words.append(arg)
+        commands = commands[arg]
+    return " ".join(words)
+
+
+class _Capture:
+    """Keep the first max_output bytes of a stream, drain the rest."""
+
+    def __init__(self, max_output):
+        self.max_output = max_output
+        self.chunks = []
+        self.size = 0
+        self.truncated = False
+
+    def feed(self, data):
+        room = self.max_output - self.size
+        if room > 0:
+            self.chunks.append(data[:room])
+            self.size += min(room, len(data))
+        if len(data) > room:
+            self.truncated = True
+
+    def value(self):
+        return b"".join(self.chunks)
+
+
+def _drain(stream, capture):
+    try:
+        for data in iter(lambda: stream.read(READ_CHUNK_SIZE), b""):
+            capture.feed(data)
+    finally:
+        stream.close()
+
+
+def _finish(operation, start, returncode, out, err):
+    duration = time.monotonic() - start
+    histogram.observe(operation, duration, failed=returncode != 0)
+    if returncode != 0:
+        LOG.warning(
+            "%s exited %s in %.3fs: %s", operation, returncode, duration,
+            err.value()[-1024:].decode("utf-8", "replace"),
+        )
+    else:
+        LOG.debug("%s finished in %.3fs", operation, duration)
+    return CommandResult(
+        returncode, out.value(), err.value(), duration,
+        out.truncated or err.truncated,
+    )
+
+
+def run(args, timeout=COMMAND_TIMEOUT, env=None, cwd=None, input=None,
+        max_output=COMMAND_MAX_OUTPUT, operation=None):
+    """
+    Run a binary with an argument vector, no shell is involved
+
+    :param args: argument vector, binary first
+    :param timeout: seconds before the command is killed
+    :param env: environment of the command, inherited if None
+    :param cwd: working directory of the command
+    :param input: bytes written to stdin
+    :param max_output: bytes kept of stdout and stderr each
+    :param operation: name in histogram, derived from args if None
+    :return: result of command
+    :rtype: CommandResult
+    """
+    args = [str(arg) for arg in args]
+    operation = operation or operation_name(args)
+    out, err = _Capture(max_output), _Capture(max_output)
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        args, env=env, cwd=cwd,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    readers = [
+        threading.Thread(target=_drain, args=(proc.stdout, out), daemon=True),
+        threading.Thread(target=_drain, args=(proc.stderr, err), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        if input is not None:
+            try:
+                proc.stdin.write(input)
+            except BrokenPipeError:
+                pass
+            finally:
+                proc.stdin.close()
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        histogram.observe(operation, time.monotonic() - start, failed=True)
+        raise CommandTimeout("{} timed out after {}s".format(operation, timeout))
+    finally:
+        for reader in readers:
+            reader.join()
+
+    return _finish(operation, start, proc.returncode, out, err)
+
+
+async def _drain_async(stream, capture):
+    while True:
+        data = await stream.read(READ_CHUNK_SIZE)
+        if not data:
+            break
+        capture.feed(data)
+
+
+async def run_async(args, timeout=COMMAND_TIMEOUT, env=None, cwd=None, input=None,
+                    max_output=COMMAND_MAX_OUTPUT, operation=None):
+    """
+    asyncio variant of run, parameters and result are the same
+    """
+    args = [str(arg) for arg in args]
+    operation = operation or operation_name(args)
+    out, err = _Capture(max_output), _Capture(max_output)
+    start = time.monotonic()
+    proc = await asyncio.create_subprocess_exec(
+        *args, env=env, cwd=cwd,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+
+    async def communicate():
+        if input is not None:
+            try:
+                proc.stdin.write(input)
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                proc.stdin.close()
+        await asyncio.gather(
+            _drain_async(proc.stdout, out), _drain_async(proc.stderr, err)
+        )
+        return await proc.wait()
+
+    try:
+        returncode = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        histogram.observe(operation, time.monotonic() - start, failed=True)
+        raise CommandTimeout("{} timed out after {}s".format(operation, timeout))
+
+    return _finish(operation, start, returncode, out, err)
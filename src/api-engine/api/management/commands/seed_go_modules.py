@@ -0,0 +1,45 @@
+import logging
+import os
+import tempfile
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.lib.gomod import GO_PROXY_MIRROR, GO_PROXY_UPSTREAM, seed
+
+LOG = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Seed go module mirror with dependencies of chaincodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sources", nargs="+",
+            help="Chaincode directories or zip archives as uploaded",
+        )
+        parser.add_argument(
+            "--upstream",
+            help="Proxy to download modules from",
+            default=GO_PROXY_UPSTREAM if GO_PROXY_UPSTREAM != "off" else "https://proxy.golang.org",
+        )
+
+    def _seed(self, path, upstream):
+        modules = [root for root, _, files in os.walk(path)
+                   if "go.mod" in files and "vendor" not in root.split(os.sep)]
+        if not modules:
+            raise CommandError("no go.mod found in {}".format(path))
+        return sum(seed(module, upstream) for module in modules)
+
+    def handle(self, *args, **options):
+        upstream = options.get("upstream")
+        added = 0
+        for source in options.get("sources"):
+            if zipfile.is_zipfile(source):
+                with tempfile.TemporaryDirectory() as path:
+                    with zipfile.ZipFile(source) as archive:
+                        archive.extractall(path)
+                    added += self._seed(path, upstream)
+            else:
+                added += self._seed(source, upstream)
+        self.stdout.write("Added {} files to {}".format(added, GO_PROXY_MIRROR))
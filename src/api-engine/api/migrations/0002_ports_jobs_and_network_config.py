@@ -0,0 +1,158 @@
+# Generated by Django 3.1.13 on 2026-10-18 21:07
+
+import api.utils.common
+import django.contrib.postgres.fields.jsonb
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Artifact',
+            fields=[
+                ('digest', models.CharField(editable=False, help_text='sha256 digest of content', max_length=64, primary_key=True, serialize=False)),
+                ('content', models.BinaryField(help_text='Raw content of artifact')),
+                ('size', models.IntegerField(default=0, help_text='Size of content')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Last time the artifact was stored or reused')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NetworkConfig',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('network', models.CharField(help_text='Name of network', max_length=64, unique=True)),
+                ('defaults', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, help_text='Capabilities, Application, Orderer and Channel sections of template')),
+                ('generation', models.PositiveIntegerField(default=1, help_text='Bumped whenever organizations or consenters change')),
+                ('emitted_generation', models.PositiveIntegerField(default=0, help_text='Generation configtx.yaml of network was rendered from')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NetworkConfigOrganization',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of organization in configtx', max_length=128)),
+                ('msp_id', models.CharField(help_text='MSP ID of organization', max_length=128)),
+                ('type', models.CharField(choices=[('orderer', 'Orderer'), ('peer', 'Peer')], help_text='Type of organization', max_length=32)),
+                ('msp_dir', models.CharField(help_text='MSP directory of organization', max_length=512)),
+                ('policies', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, help_text='Policies of organization')),
+                ('orderer_endpoints', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=list, help_text='Orderer endpoints of organization')),
+                ('config', models.ForeignKey(help_text='Config of organization', on_delete=django.db.models.deletion.CASCADE, related_name='organizations', to='api.networkconfig')),
+            ],
+            options={
+                'ordering': ('id',),
+                'unique_together': {('config', 'msp_id')},
+            },
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='port_bitmap',
+            field=models.BinaryField(help_text='Bitmap of ports allocated on agent', null=True),
+        ),
+        migrations.AddField(
+            model_name='agent',
+            name='port_cursor',
+            field=models.IntegerField(default=0, help_text='Offset where the next free port search starts'),
+        ),
+        migrations.AddField(
+            model_name='chaincode',
+            name='digest',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Key of package in package cache', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='chaincode',
+            name='package_id',
+            field=models.CharField(blank=True, default='', help_text='Package id of chainCode on peers', max_length=256),
+        ),
+        migrations.CreateModel(
+            name='NetworkConfigConsenter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(help_text='Host of consenter', max_length=256)),
+                ('port', models.IntegerField(default=7050, help_text='Port of consenter')),
+                ('client_tls_cert', models.CharField(help_text='Client TLS certificate path', max_length=512)),
+                ('server_tls_cert', models.CharField(help_text='Server TLS certificate path', max_length=512)),
+                ('organization', models.ForeignKey(help_text='Orderer organization of consenter', on_delete=django.db.models.deletion.CASCADE, related_name='consenters', to='api.networkconfigorganization')),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ChainCodeJob',
+            fields=[
+                ('id', models.UUIDField(default=api.utils.common.make_uuid, editable=False, help_text='ID of job', primary_key=True, serialize=False, unique=True)),
+                ('operation', models.CharField(choices=[('package', 'Package'), ('install', 'Install'), ('approve', 'Approve'), ('commit', 'Commit')], help_text='Lifecycle operation of job', max_length=32)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('success', 'Success'), ('failed', 'Failed')], default='pending', help_text='Status of job', max_length=32)),
+                ('parameters', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, help_text='Parameters of operation')),
+                ('stages', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=list, help_text='Stages of job with status and timing')),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(blank=True, help_text='Result of job', null=True)),
+                ('error', models.TextField(blank=True, default='', help_text='Error of failed stage')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chaincode', models.ForeignKey(blank=True, help_text='Chaincode operated by job', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='api.chaincode')),
+                ('organization', models.ForeignKey(help_text='Organization which runs the job', on_delete=django.db.models.deletion.CASCADE, related_name='chaincode_jobs', to='api.organization')),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='PortReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external', models.IntegerField(help_text='Reserved external port', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(65535)])),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='Reservation is released after this time')),
+                ('agent', models.ForeignKey(help_text='Agent of reserved port', on_delete=django.db.models.deletion.CASCADE, related_name='port_reservations', to='api.agent')),
+            ],
+            options={
+                'ordering': ('external',),
+                'unique_together': {('agent', 'external')},
+            },
+        ),
+        migrations.CreateModel(
+            name='NetworkConfigProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of profile', max_length=128)),
+                ('type', models.CharField(choices=[('genesis', 'Genesis'), ('channel', 'Channel')], help_text='Type of profile', max_length=32)),
+                ('consortium', models.CharField(default='SampleConsortium', help_text='Consortium of profile', max_length=128)),
+                ('emitted_generation', models.PositiveIntegerField(default=0, help_text='Generation the configtx.yaml of profile was rendered from')),
+                ('config', models.ForeignKey(help_text='Config of profile', on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='api.networkconfig')),
+                ('organizations', models.ManyToManyField(help_text='Organizations of profile', related_name='profiles', to='api.NetworkConfigOrganization')),
+            ],
+            options={
+                'ordering': ('id',),
+                'unique_together': {('config', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentJob',
+            fields=[
+                ('id', models.UUIDField(default=api.utils.common.make_uuid, editable=False, help_text='ID of job', primary_key=True, serialize=False, unique=True)),
+                ('operation', models.CharField(choices=[('create', 'Create'), ('start', 'Start'), ('stop', 'Stop'), ('query', 'Query'), ('update', 'Update'), ('delete', 'Delete'), ('fabric:ca:register', 'FabricCARegister'), ('new:network', 'NewNetwork')], help_text='Operation of job', max_length=32)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('success', 'Success'), ('failed', 'Failed')], default='pending', help_text='Status of job', max_length=32)),
+                ('error', models.TextField(blank=True, default='', help_text='Error of failed job')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('agent', models.ForeignKey(help_text='Agent which runs the job', on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='api.agent')),
+                ('node', models.ForeignKey(blank=True, help_text='Node operated by job', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='api.node')),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'index_together': {('agent', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,111 @@
+import base64
+import hashlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# model name -> artifact fields
+ARTIFACT_FIELDS = {
+    "network": ("genesisblock",),
+    "node": ("config_file", "msp", "tls"),
+}
+
+
+def _decode(text):
+    """
+    Decode a base64 blob of the text columns, older releases saved the
+    repr of the encoded bytes, e.g. "b'UEsDB...'".
+    """
+    if text.startswith(("b'", 'b"')):
+        text = text[2:-1]
+    return base64.b64decode(text)
+
+
+def _artifact(Artifact, content):
+    digest = hashlib.sha256(content).hexdigest()
+    artifact, _ = Artifact.objects.get_or_create(
+        digest=digest, defaults={"content": content, "size": len(content)}
+    )
+    return artifact
+
+
+def move_to_artifacts(apps, schema_editor):
+    Artifact = apps.get_model("api", "Artifact")
+    for model_name, fields in ARTIFACT_FIELDS.items():
+        model = apps.get_model("api", model_name)
+        for row in model.objects.all().iterator():
+            for field in fields:
+                text = getattr(row, field)
+                if text:
+                    setattr(
+                        row,
+                        "{}_artifact".format(field),
+                        _artifact(Artifact, _decode(text)),
+                    )
+            row.save(
+                update_fields=["{}_artifact".format(field) for field in fields]
+            )
+
+
+def move_from_artifacts(apps, schema_editor):
+    for model_name, fields in ARTIFACT_FIELDS.items():
+        model = apps.get_model("api", model_name)
+        for row in model.objects.all().iterator():
+            for field in fields:
+                artifact = getattr(row, "{}_artifact".format(field))
+                if artifact is not None:
+                    setattr(
+                        row,
+                        field,
+                        base64.b64encode(bytes(artifact.content)).decode(),
+                    )
+            row.save(update_fields=list(fields))
+
+
+def _artifact_field(help_text):
+    return models.ForeignKey(
+        help_text=help_text,
+        null=True,
+        on_delete=django.db.models.deletion.PROTECT,
+        related_name="+",
+        to="api.artifact",
+    )
+
+
+HELP_TEXTS = {
+    ("network", "genesisblock"): "genesis block",
+    ("node", "config_file"): "Config file of node",
+    ("node", "msp"): "msp of node",
+    ("node", "tls"): "tls of node",
+}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_ports_jobs_and_network_config"),
+    ]
+
+    operations = (
+        [
+            migrations.AddField(
+                model_name=model_name,
+                name="{}_artifact".format(field),
+                field=_artifact_field(help_text),
+            )
+            for (model_name, field), help_text in HELP_TEXTS.items()
+        ]
+        + [migrations.RunPython(move_to_artifacts, move_from_artifacts)]
+        + [
+            migrations.RemoveField(model_name=model_name, name=field)
+            for model_name, field in HELP_TEXTS
+        ]
+        + [
+            migrations.RenameField(
+                model_name=model_name,
+                old_name="{}_artifact".format(field),
+                new_name=field,
+            )
+            for model_name, field in HELP_TEXTS
+        ]
+    )
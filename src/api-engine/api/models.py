@@ -1,6 +1,8 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
+import base64
+import hashlib
 import os
 import shutil
 import tarfile
@@ -12,12 +14,15 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.deletion import ProtectedError
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_delete
 from django.contrib.postgres.fields import ArrayField
+from django.utils import timezone
 
 from api.common.enums import (
+    AgentOperation,
     HostStatus,
     LogLevel,
     HostType,
@@ -28,6 +33,10 @@ from api.common.enums import (
     FabricCAServerType,
     FabricCAUserType,
     FabricCAUserStatus,
+    ChainCodeOperation,
+    JobStatus,
+    ConfigTxOrgType,
+    ConfigTxProfileType,
 )
 from api.common.enums import (
     UserRole,
@@ -213,6 +222,15 @@ class Agent(models.Model):
         help_text="Agent free ports.",
         null=True
     )
+    port_bitmap = models.BinaryField(
+        help_text="Bitmap of ports allocated on agent",
+        null=True,
+        editable=False,
+    )
+    port_cursor = models.IntegerField(
+        help_text="Offset where the next free port search starts",
+        default=0,
+    )
 
     def delete(self, using=None, keep_parents=False):
         if self.config_file:
@@ -294,6 +312,112 @@ class KubernetesConfig(models.Model):
     )
 
 
+class Artifact(models.Model):
+    """Content addressed blob, shared by every record with same content."""
+
+    digest = models.CharField(
+        primary_key=True,
+        max_length=64,
+        help_text="sha256 digest of content",
+        editable=False,
+    )
+    content = models.BinaryField(help_text="Raw content of artifact")
+    size = models.IntegerField(help_text="Size of content", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    used_at = models.DateTimeField(
+        help_text="Last time the artifact was stored or reused",
+        default=timezone.now,
+        db_index=True,
+    )
+
+    @classmethod
+    def store(cls, content):
+        """
+        Store content unless an artifact with same digest exists.
+
+        A reused artifact is marked as used, so collect spares it until the
+        record referring to it is saved.
+
+        :param content: raw content
+        :return: artifact of content
+        :rtype: Artifact
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        defaults = {"content": content, "size": len(content)}
+        artifact, created = cls.objects.get_or_create(digest=digest, defaults=defaults)
+        if not created and not cls.objects.filter(digest=digest).update(used_at=timezone.now()):
+            # collected between get and update
+            artifact, _ = cls.objects.get_or_create(digest=digest, defaults=defaults)
+        return artifact
+
+    @classmethod
+    def load_base64(cls, digest):
+        """
+        Load content of artifact base64 encoded, as agents expect it.
+
+        :param digest: digest of artifact
+        :return: encoded content, None if digest is None
+        :rtype: str
+        """
+        if digest is None:
+            return None
+        content = (
+            cls.objects.filter(digest=digest)
+            .values_list("content", flat=True)
+            .get()
+        )
+        return base64.b64encode(bytes(content)).decode("ascii")
+
+    @classmethod
+    def unreferenced(cls, before):
+        """
+        Artifacts no record refers to.
+
+        :param before: only artifacts last used before this time, artifacts
+            stored for a record which is not saved yet are used later
+        :return: unreferenced artifacts
+        :rtype: QuerySet
+        """
+        queryset = cls.objects.filter(used_at__lt=before)
+        for relation in cls._meta.get_fields(include_hidden=True):
+            if not (relation.auto_created and not relation.concrete
+                    and (relation.one_to_many or relation.one_to_one)):
+                continue
+            column = relation.field.attname
+            queryset = queryset.exclude(
+                digest__in=relation.related_model.objects.filter(
+                    **{"{}__isnull".format(column): False}
+                ).values(column)
+            )
+        return queryset
+
+    @classmethod
+    def collect(cls, before):
+        """
+        Delete artifacts no record refers to.
+
+        :param before: only artifacts last used before this time
+        :return: the number of deleted artifacts
+        :rtype: int
+        """
+        digests = list(cls.unreferenced(before).values_list("digest", flat=True))
+        deleted = 0
+        for digest in digests:
+            try:
+                with transaction.atomic():
+                    # store updates used_at of a reused artifact, which waits
+                    # for this lock and sees the artifact is gone
+                    locked = list(cls.objects.select_for_update().filter(
+                        digest=digest, used_at__lt=before
+                    ).values_list("digest", flat=True))
+                    if locked:
+                        deleted += cls.objects.filter(digest=digest).delete()[0]
+            except ProtectedError:
+                # referenced again since it was selected
+                continue
+        return deleted
+
+
 class Network(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -326,9 +450,12 @@ class Network(models.Model):
     consensus = models.CharField(
         help_text="Consensus of network", max_length=128, default="raft",
     )
-    genesisblock = models.TextField(
+    genesisblock = models.ForeignKey(
+        Artifact,
         help_text="genesis block",
         null=True,
+        related_name="+",
+        on_delete=models.PROTECT,
     )
     database = models.CharField(
         help_text="database of network", max_length=128, default="leveldb",
@@ -527,17 +654,26 @@ class Node(models.Model):
         max_length=64,
         default=NodeStatus.Created.name.lower(),
     )
-    config_file = models.TextField(
+    config_file = models.ForeignKey(
+        Artifact,
         help_text="Config file of node",
         null=True,
+        related_name="+",
+        on_delete=models.PROTECT,
     )
-    msp = models.TextField(
+    msp = models.ForeignKey(
+        Artifact,
         help_text="msp of node",
         null=True,
+        related_name="+",
+        on_delete=models.PROTECT,
     )
-    tls = models.TextField(
+    tls = models.ForeignKey(
+        Artifact,
         help_text="tls of node",
         null=True,
+        related_name="+",
+        on_delete=models.PROTECT,
     )
     cid = models.CharField(
         help_text="id used in agent, such as container id",
@@ -635,6 +771,85 @@ class Port(models.Model):
         ordering = ("external",)
 
 
+@receiver(pre_delete, sender=Node)
+def release_node_ports(sender, instance, *args, **kwargs):
+    # also runs for nodes deleted by network, organization or agent cascades
+    if instance.agent_id is None:
+        return
+    from api.utils.port_picker import release_ports
+
+    release_ports(
+        instance.agent_id,
+        list(Port.objects.filter(node=instance).values_list("external", flat=True)),
+    )
+
+
+class PortReservation(models.Model):
+    agent = models.ForeignKey(
+        Agent,
+        help_text="Agent of reserved port",
+        on_delete=models.CASCADE,
+        related_name="port_reservations",
+    )
+    external = models.IntegerField(
+        help_text="Reserved external port",
+        validators=[MinValueValidator(MIN_PORT), MaxValueValidator(MAX_PORT)],
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(
+        help_text="Reservation is released after this time", db_index=True
+    )
+
+    class Meta:
+        ordering = ("external",)
+        unique_together = ("agent", "external")
+
+
+class AgentJob(models.Model):
+    """Operation of an agent on a node, run by the task workers."""
+
+    id = models.UUIDField(
+        primary_key=True,
+        help_text="ID of job",
+        default=make_uuid,
+        editable=False,
+        unique=True
+    )
+    agent = models.ForeignKey(
+        Agent,
+        help_text="Agent which runs the job",
+        on_delete=models.CASCADE,
+        related_name="jobs",
+    )
+    node = models.ForeignKey(
+        Node,
+        help_text="Node operated by job",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    operation = models.CharField(
+        help_text="Operation of job",
+        choices=AgentOperation.to_choices(),
+        max_length=32,
+    )
+    status = models.CharField(
+        help_text="Status of job",
+        choices=JobStatus.to_choices(),
+        default=JobStatus.Pending.value,
+        max_length=32,
+    )
+    error = models.TextField(help_text="Error of failed job", default="", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        index_together = ("agent", "status")
+
+
 def get_file_path(instance, file):
     """
     Get the file path where will be stored in
@@ -811,6 +1026,164 @@ class ChainCode(models.Model):
     md5 = models.CharField(
         help_text="md5 of chainCode", max_length=128
     )
+    digest = models.CharField(
+        help_text="Key of package in package cache", max_length=64,
+        default="", blank=True, db_index=True
+    )
+    package_id = models.CharField(
+        help_text="Package id of chainCode on peers", max_length=256,
+        default="", blank=True
+    )
     create_ts = models.DateTimeField(
         help_text="Create time of chainCode", auto_now_add=True
     )
+
+
+class ChainCodeJob(models.Model):
+    """Asynchronous chaincode lifecycle operation, executed stage by stage."""
+
+    id = models.UUIDField(
+        primary_key=True,
+        help_text="ID of job",
+        default=make_uuid,
+        editable=False,
+        unique=True
+    )
+    operation = models.CharField(
+        help_text="Lifecycle operation of job",
+        choices=ChainCodeOperation.to_choices(),
+        max_length=32,
+    )
+    status = models.CharField(
+        help_text="Status of job",
+        choices=JobStatus.to_choices(),
+        default=JobStatus.Pending.value,
+        max_length=32,
+    )
+    organization = models.ForeignKey(
+        "Organization",
+        help_text="Organization which runs the job",
+        on_delete=models.CASCADE,
+        related_name="chaincode_jobs",
+    )
+    chaincode = models.ForeignKey(
+        "ChainCode",
+        help_text="Chaincode operated by job",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    parameters = JSONField(
+        help_text="Parameters of operation", default=dict, blank=True
+    )
+    stages = JSONField(
+        help_text="Stages of job with status and timing", default=list, blank=True
+    )
+    result = JSONField(
+        help_text="Result of job", null=True, blank=True
+    )
+    error = models.TextField(help_text="Error of failed stage", default="", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+
+    @property
+    def progress(self):
+        if not self.stages:
+            return 0
+        done = len([s for s in self.stages if s["status"] == JobStatus.Success.value])
+        return round(done * 100 / len(self.stages))
+
+
+class NetworkConfig(models.Model):
+    """Structured configtx of a network, configtx.yaml files are rendered from it."""
+
+    network = models.CharField(
+        help_text="Name of network", max_length=64, unique=True
+    )
+    defaults = JSONField(
+        help_text="Capabilities, Application, Orderer and Channel sections of template",
+        default=dict, blank=True
+    )
+    generation = models.PositiveIntegerField(
+        help_text="Bumped whenever organizations or consenters change", default=1
+    )
+    emitted_generation = models.PositiveIntegerField(
+        help_text="Generation configtx.yaml of network was rendered from", default=0
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class NetworkConfigOrganization(models.Model):
+    config = models.ForeignKey(
+        NetworkConfig,
+        help_text="Config of organization",
+        on_delete=models.CASCADE,
+        related_name="organizations",
+    )
+    name = models.CharField(help_text="Name of organization in configtx", max_length=128)
+    msp_id = models.CharField(help_text="MSP ID of organization", max_length=128)
+    type = models.CharField(
+        help_text="Type of organization",
+        choices=ConfigTxOrgType.to_choices(),
+        max_length=32,
+    )
+    msp_dir = models.CharField(help_text="MSP directory of organization", max_length=512)
+    policies = JSONField(help_text="Policies of organization", default=dict, blank=True)
+    orderer_endpoints = JSONField(
+        help_text="Orderer endpoints of organization", default=list, blank=True
+    )
+
+    class Meta:
+        ordering = ("id",)
+        unique_together = ("config", "msp_id")
+
+
+class NetworkConfigConsenter(models.Model):
+    organization = models.ForeignKey(
+        NetworkConfigOrganization,
+        help_text="Orderer organization of consenter",
+        on_delete=models.CASCADE,
+        related_name="consenters",
+    )
+    host = models.CharField(help_text="Host of consenter", max_length=256)
+    port = models.IntegerField(help_text="Port of consenter", default=7050)
+    client_tls_cert = models.CharField(help_text="Client TLS certificate path", max_length=512)
+    server_tls_cert = models.CharField(help_text="Server TLS certificate path", max_length=512)
+
+    class Meta:
+        ordering = ("id",)
+
+
+class NetworkConfigProfile(models.Model):
+    config = models.ForeignKey(
+        NetworkConfig,
+        help_text="Config of profile",
+        on_delete=models.CASCADE,
+        related_name="profiles",
+    )
+    name = models.CharField(help_text="Name of profile", max_length=128)
+    type = models.CharField(
+        help_text="Type of profile",
+        choices=ConfigTxProfileType.to_choices(),
+        max_length=32,
+    )
+    consortium = models.CharField(
+        help_text="Consortium of profile", max_length=128, default="SampleConsortium"
+    )
+    organizations = models.ManyToManyField(
+        NetworkConfigOrganization,
+        help_text="Organizations of profile",
+        related_name="profiles",
+    )
+    emitted_generation = models.PositiveIntegerField(
+        help_text="Generation the configtx.yaml of profile was rendered from", default=0
+    )
+
+    class Meta:
+        ordering = ("id",)
+        unique_together = ("config", "name")
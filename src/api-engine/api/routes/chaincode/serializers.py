@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from api.config import FABRIC_CHAINCODE_STORE
 
-from api.models import ChainCode
+from api.models import ChainCode, ChainCodeJob
 from api.common.serializers import ListResponseSerializer
 import hashlib
 
@@ -35,6 +35,15 @@ class ChainCodePackageBody(serializers.Serializer):
         return md5.hexdigest()
 
 
+class ChainCodeInstallBody(serializers.Serializer):
+    id = serializers.UUIDField(help_text="ID of ChainCode")
+    peers = serializers.ListField(
+        child=serializers.UUIDField(help_text="ID of Peer Node"),
+        required=False,
+        help_text="Peers to install on, every peer of organization if empty",
+    )
+
+
 class ChainCodeNetworkSerializer(serializers.Serializer):
     id = serializers.UUIDField(help_text="Network ID")
     name = serializers.CharField(max_length=128, help_text="name of Network")
@@ -53,7 +62,7 @@ class ChainCodeResponseSerializer(ChainCodeIDSerializer, serializers.ModelSerial
 
     class Meta:
         model = ChainCode
-        fields = ("id", "name", "version", "creator", "language", "create_ts", "md5")
+        fields = ("id", "name", "version", "creator", "language", "create_ts", "md5", "package_id")
 
 
 class ChaincodeListResponse(ListResponseSerializer):
@@ -72,3 +81,33 @@ class ChainCodeApproveForMyOrgBody(serializers.Serializer):
 class ChainCodeCommitBody(ChainCodeApproveForMyOrgBody):
     peer_list = serializers.ListField(allow_empty=False,required=True)
 
+
+class ChainCodeJobIDSerializer(serializers.Serializer):
+    id = serializers.UUIDField(help_text="ID of lifecycle job")
+
+
+class ChainCodePackageResponse(serializers.Serializer):
+    id = serializers.UUIDField(
+        required=False, help_text="ID of package job, absent if package was cached")
+    chaincode_id = serializers.UUIDField(help_text="ID of ChainCode")
+    package_id = serializers.CharField(
+        required=False, help_text="Package id, known once chaincode is packaged")
+
+
+class ChainCodeJobStageSerializer(serializers.Serializer):
+    name = serializers.CharField(help_text="name of stage")
+    status = serializers.CharField(help_text="status of stage")
+    started_at = serializers.FloatField(allow_null=True, help_text="start time of stage")
+    finished_at = serializers.FloatField(allow_null=True, help_text="finish time of stage")
+    duration = serializers.FloatField(allow_null=True, help_text="seconds the stage took")
+    error = serializers.CharField(allow_blank=True, help_text="error of stage")
+
+
+class ChainCodeJobSerializer(serializers.ModelSerializer):
+    stages = ChainCodeJobStageSerializer(many=True)
+    progress = serializers.IntegerField(help_text="percent of finished stages")
+
+    class Meta:
+        model = ChainCodeJob
+        fields = ("id", "operation", "status", "chaincode", "progress", "stages",
+                  "result", "error", "created_at", "updated_at")
@@ -2,17 +2,22 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+import hashlib
 import os
-import zipfile
+import shutil
 
 from drf_yasg.utils import swagger_auto_schema
 from api.config import FABRIC_CHAINCODE_STORE
 from api.config import CELLO_HOME
+from api.common.enums import ChainCodeOperation
 from api.models import (
     Node,
-    ChainCode
+    ChainCode,
+    ChainCodeJob
 )
+from api.tasks import submit_chaincode_job, resume_chaincode_job
 from api.utils.common import make_uuid
+from api.utils.package_cache import cached_package, package_id, package_key
 from django.core.paginator import Paginator
 
 from api.lib.peer.chaincode import ChainCode as PeerChainCode
@@ -25,7 +30,11 @@ from api.routes.chaincode.serializers import (
     ChainCodeIDSerializer,
     ChainCodeCommitBody,
     ChainCodeApproveForMyOrgBody,
-    ChaincodeListResponse
+    ChainCodeInstallBody,
+    ChaincodeListResponse,
+    ChainCodeJobIDSerializer,
+    ChainCodeJobSerializer,
+    ChainCodePackageResponse
 )
 from api.common import ok, err
 
@@ -67,6 +76,7 @@ class ChainCodeViewSet(viewsets.ViewSet):
                         "language": chaincode.language,
                         "create_ts": chaincode.create_ts,
                         "md5": chaincode.md5,
+                        "package_id": chaincode.package_id,
                     }
                     for chaincode in chaincodes_pages
                 ]
@@ -81,7 +91,8 @@ class ChainCodeViewSet(viewsets.ViewSet):
         method="post",
         query_serializer=PageQuerySerializer,
         responses=with_common_response(
-            {status.HTTP_201_CREATED: ChainCodeIDSerializer}
+            {status.HTTP_200_OK: ChainCodePackageResponse,
+             status.HTTP_202_ACCEPTED: ChainCodePackageResponse}
         ),
     )
     @action(detail=False, methods=['post'])
@@ -96,99 +107,90 @@ class ChainCodeViewSet(viewsets.ViewSet):
             id = make_uuid()
 
             try:
+                org = request.user.organization
                 file_path = os.path.join(FABRIC_CHAINCODE_STORE, id)
                 if not os.path.exists(file_path):
                     os.makedirs(file_path)
                 fileziped = os.path.join(file_path, file.name)
+                sha256, md5 = hashlib.sha256(), hashlib.md5()
                 with open(fileziped, 'wb') as f:
                     for chunk in file.chunks():
+                        sha256.update(chunk)
+                        md5.update(chunk)
                         f.write(chunk)
-                    f.close()
-                zipped_file = zipfile.ZipFile(fileziped)
-                for filename in zipped_file.namelist():
-                    zipped_file.extract(filename, file_path)
-
-                # When there is go.mod in the chain code, execute the go mod vendor command to obtain dependencies.
-                chaincode_path = file_path
-                found = False
-                for _, dirs, _ in os.walk(file_path):
-                    if found:
-                        break
-                    elif dirs:
-                        for each in dirs:
-                            chaincode_path += "/"+each
-                            if os.path.exists(chaincode_path+"/go.mod"):
-                                cwd = os.getcwd()
-                                print("cwd:", cwd)
-                                os.chdir(chaincode_path)
-                                os.system("go mod vendor")
-                                found = True
-                                os.chdir(cwd)
-                                break
-                # if can not find go.mod, use the dir after extract zipped_file
-                if not found:
-                    for _, dirs, _ in os.walk(file_path):
-                        chaincode_path = file_path+"/"+dirs[0]
-                        break
-
-                org = request.user.organization
-                peer_node = Node.objects.get(type="peer", organization=org.id)
-                envs = init_env_vars(peer_node, org)
-
-                peer_channel_cli = PeerChainCode("v2.2.0", **envs)
-                res = peer_channel_cli.lifecycle_package(name, version, chaincode_path, language)
-                os.system("rm -rf {}/*".format(file_path))
-                os.system("mv {}.tar.gz {}".format(name, file_path))
-                if res != 0:
-                    return Response(err("package chaincode failed."), status=status.HTTP_400_BAD_REQUEST)
-                chaincode = ChainCode(
-                    id=id,
+                digest = package_key(sha256.hexdigest(), name, version, language)
+
+                # same source was packaged before, by this or another organization
+                packaged = cached_package(digest)
+                if packaged:
+                    shutil.rmtree(file_path, ignore_errors=True)
+                    chaincode = ChainCode.objects.filter(digest=digest, creator=org.name).first()
+                    if chaincode is None:
+                        chaincode = ChainCode.objects.create(
+                            id=id,
+                            name=name,
+                            version=version,
+                            language=language,
+                            creator=org.name,
+                            md5=md5.hexdigest(),
+                            digest=digest,
+                            package_id=package_id("{}_{}".format(name, version), packaged),
+                        )
+                    response = ChainCodePackageResponse(
+                        {"chaincode_id": chaincode.id, "package_id": chaincode.package_id}
+                    )
+                    return Response(
+                        ok(response.data), status=status.HTTP_200_OK
+                    )
+
+                # extract, vendor and package run on the workers
+                job = submit_chaincode_job(
+                    ChainCodeOperation.Package.value,
+                    org,
+                    chaincode_id=id,
+                    archive=fileziped,
                     name=name,
                     version=version,
                     language=language,
-                    creator=org.name,
-                    md5=md5
+                    md5=md5.hexdigest(),
+                    digest=digest,
                 )
-                chaincode.save()
             except Exception as e:
                 return Response(
                     err(e.args), status=status.HTTP_400_BAD_REQUEST
                 )
+            response = ChainCodePackageResponse({"id": job.id, "chaincode_id": id})
             return Response(
-                          ok("success"), status=status.HTTP_200_OK
-                )
+                ok(response.data), status=status.HTTP_202_ACCEPTED
+            )
 
     @swagger_auto_schema(
         method="post",
+        request_body=ChainCodeInstallBody,
         responses=with_common_response(
-            {status.HTTP_201_CREATED: ChainCodeIDSerializer}
+            {status.HTTP_202_ACCEPTED: ChainCodeJobIDSerializer}
         ),
     )
     @action(detail=False, methods=['post'])
     def install(self, request):
-        chaincode_id = request.data.get("id")
-        try:
-            cc_targz = ""
-            file_path = os.path.join(FABRIC_CHAINCODE_STORE, chaincode_id)
-            for _, _, files in os.walk(file_path):
-                cc_targz = os.path.join(file_path + "/" + files[0])
-                break
-
-            org = request.user.organization
-            peer_node = Node.objects.get(type="peer", organization=org.id)
-            envs = init_env_vars(peer_node, org)
-
-            peer_channel_cli = PeerChainCode("v2.2.0", **envs)
-            res = peer_channel_cli.lifecycle_install(cc_targz)
-            if res != 0:
-                return Response(err("install chaincode failed."), status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
+        serializer = ChainCodeInstallBody(data=request.data)
+        if serializer.is_valid(raise_exception=True):
+            try:
+                chaincode = ChainCode.objects.get(id=serializer.validated_data.get("id"))
+                job = submit_chaincode_job(
+                    ChainCodeOperation.Install.value,
+                    request.user.organization,
+                    chaincode=chaincode,
+                    chaincode_id=str(chaincode.id),
+                    peers=[str(peer) for peer in serializer.validated_data.get("peers", [])],
+                )
+            except Exception as e:
+                return Response(
+                    err(e.args), status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
-                err(e.args), status=status.HTTP_400_BAD_REQUEST
+                ok({"id": job.id}), status=status.HTTP_202_ACCEPTED
             )
-        return Response(
-            ok("success"), status=status.HTTP_200_OK
-        )
 
     @swagger_auto_schema(
         method="get",
@@ -246,7 +248,7 @@ class ChainCodeViewSet(viewsets.ViewSet):
     @swagger_auto_schema(
         method="post",
         responses=with_common_response(
-            {status.HTTP_201_CREATED: ChainCodeIDSerializer}
+            {status.HTTP_202_ACCEPTED: ChainCodeJobIDSerializer}
         ),
     )
     @action(detail=False, methods=['post'])
@@ -254,39 +256,17 @@ class ChainCodeViewSet(viewsets.ViewSet):
         serializer = ChainCodeApproveForMyOrgBody(data=request.data)
         if serializer.is_valid(raise_exception=True):
             try:
-                channel_name = serializer.validated_data.get("channel_name")
-                chaincode_name = serializer.validated_data.get("chaincode_name")
-                chaincode_version = serializer.validated_data.get("chaincode_version")
-                policy = serializer.validated_data.get("policy")
-                # Perhaps the orderer's port is best stored in the database
-                orderer_url = serializer.validated_data.get("orderer_url")
-                sequence = serializer.validated_data.get("sequence")
-
-                org = request.user.organization
-                orderer_node = Node.objects.get(type="orderer", organization=org.id)
-
-                orderer_tls_dir = "{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}/msp/tlscacerts" \
-                                  .format(CELLO_HOME, org.name, org.name.split(".", 1)[1], orderer_node.name + "." +
-                                          org.name.split(".", 1)[1])
-                orderer_tls_root_cert = ""
-                for _, _, files in os.walk(orderer_tls_dir):
-                    orderer_tls_root_cert = orderer_tls_dir + "/" + files[0]
-                    break
-
-                peer_node = Node.objects.get(type="peer", organization=org.id)
-                envs = init_env_vars(peer_node, org)
-
-                peer_channel_cli = PeerChainCode("v2.2.0", **envs)
-                code, content = peer_channel_cli.lifecycle_approve_for_my_org(orderer_url, orderer_tls_root_cert, channel_name,
-                                                                    chaincode_name, chaincode_version, policy, sequence)
-                if code != 0:
-                    return Response(err(" lifecycle_approve_for_my_org failed. err: "+content), status=status.HTTP_400_BAD_REQUEST)
+                job = submit_chaincode_job(
+                    ChainCodeOperation.Approve.value,
+                    request.user.organization,
+                    **serializer.validated_data
+                )
             except Exception as e:
                 return Response(
                     err(e.args), status=status.HTTP_400_BAD_REQUEST
                 )
             return Response(
-                ok("success"), status=status.HTTP_200_OK
+                ok({"id": job.id}), status=status.HTTP_202_ACCEPTED
             )
 
     @swagger_auto_schema(
@@ -369,7 +349,7 @@ class ChainCodeViewSet(viewsets.ViewSet):
     @swagger_auto_schema(
         method="post",
         responses=with_common_response(
-            {status.HTTP_201_CREATED: ChainCodeIDSerializer}
+            {status.HTTP_202_ACCEPTED: ChainCodeJobIDSerializer}
         ),
     )
     @action(detail=False, methods=['post'])
@@ -377,54 +357,19 @@ class ChainCodeViewSet(viewsets.ViewSet):
         serializer = ChainCodeCommitBody(data=request.data)
         if serializer.is_valid(raise_exception=True):
             try:
-                channel_name = serializer.validated_data.get("channel_name")
-                chaincode_name = serializer.validated_data.get("chaincode_name")
-                chaincode_version = serializer.validated_data.get("chaincode_version")
-                policy = serializer.validated_data.get("policy")
-                # Perhaps the orderer's port is best stored in the database
-                orderer_url = serializer.validated_data.get("orderer_url")
-                sequence = serializer.validated_data.get("sequence")
-                peer_list = serializer.validated_data.get("peer_list")
-                org = request.user.organization
-                orderer_node = Node.objects.get(type="orderer", organization=org.id)
-
-                orderer_tls_dir = "{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}/msp/tlscacerts" \
-                    .format(CELLO_HOME, org.name, org.name.split(".", 1)[1], orderer_node.name + "." +
-                            org.name.split(".", 1)[1])
-                orderer_tls_root_cert = ""
-                for _, _, files in os.walk(orderer_tls_dir):
-                    orderer_tls_root_cert = orderer_tls_dir + "/" + files[0]
-                    break
-
-                peer_node = Node.objects.get(type="peer", organization=org.id)
-                envs = init_env_vars(peer_node, org)
-
-                peer_root_certs = []
-                peer_address_list = []
-                for each in peer_list:
-                    peer_node = Node.objects.get(id=each)
-                    peer_tls_cert = "{}/{}/crypto-config/peerOrganizations/{}/peers/{}/tls/ca.crt" \
-                                    .format(CELLO_HOME, org.name, org.name, peer_node.name + "." + org.name)
-                    print(peer_node.port)
-                    port = peer_node.port.all()[0].internal
-                    # port = ports[0].internal
-                    peer_address = peer_node.name + "." + org.name+":"+str(7051)
-                    peer_address_list.append(peer_address)
-                    peer_root_certs.append(peer_tls_cert)
-
-                peer_channel_cli = PeerChainCode("v2.2.0", **envs)
-                code = peer_channel_cli.lifecycle_commit(orderer_url, orderer_tls_root_cert, channel_name,
-                                                                  chaincode_name, chaincode_version, policy,
-                                                                  peer_address_list, peer_root_certs, sequence)
-                if code != 0:
-                    return Response(err("commit failed."), status=status.HTTP_400_BAD_REQUEST)
-
+                parameters = dict(serializer.validated_data)
+                parameters["peer_list"] = [str(peer) for peer in parameters["peer_list"]]
+                job = submit_chaincode_job(
+                    ChainCodeOperation.Commit.value,
+                    request.user.organization,
+                    **parameters
+                )
             except Exception as e:
                 return Response(
                     err(e.args), status=status.HTTP_400_BAD_REQUEST
                 )
             return Response(
-                ok("commit success."), status=status.HTTP_200_OK
+                ok({"id": job.id}), status=status.HTTP_202_ACCEPTED
             )
 
     @swagger_auto_schema(
@@ -454,6 +399,59 @@ class ChainCodeViewSet(viewsets.ViewSet):
                 ok(chaincodes_commited), status=status.HTTP_200_OK
             )
 
+    @swagger_auto_schema(
+        method="get",
+        responses=with_common_response(
+            {status.HTTP_200_OK: ChainCodeJobSerializer}
+        ),
+    )
+    @action(detail=False, methods=['get'], url_path=r"jobs/(?P<job_id>[^/.]+)")
+    def job(self, request, job_id=None):
+        """
+        Status of a lifecycle job with its stages
+        :param request: request
+        :param job_id: job id
+        :return: job
+        :rtype: dict
+        """
+        try:
+            job = ChainCodeJob.objects.get(id=job_id, organization=request.user.organization)
+            response = ChainCodeJobSerializer(instance=job)
+        except Exception as e:
+            return Response(
+                err(e.args), status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            ok(response.data), status=status.HTTP_200_OK
+        )
+
+    @swagger_auto_schema(
+        method="post",
+        responses=with_common_response(
+            {status.HTTP_202_ACCEPTED: ChainCodeJobIDSerializer}
+        ),
+    )
+    @action(detail=False, methods=['post'], url_path=r"jobs/(?P<job_id>[^/.]+)/resume")
+    def resume_job(self, request, job_id=None):
+        """
+        Run a failed lifecycle job again from its failed stage
+        :param request: request
+        :param job_id: job id
+        :return: job id
+        :rtype: dict
+        """
+        try:
+            job = ChainCodeJob.objects.get(id=job_id, organization=request.user.organization)
+            if not resume_chaincode_job(job):
+                return Response(err("job {} is {}.".format(job.id, job.status)),
+                                status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                err(e.args), status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            ok({"id": job.id}), status=status.HTTP_202_ACCEPTED
+        )
 
 
 def init_env_vars(node, org):
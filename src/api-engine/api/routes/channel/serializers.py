@@ -27,6 +27,40 @@ class ChannelIDSerializer(serializers.Serializer):
     id = serializers.UUIDField(help_text="Channel ID")
 
 
+class ChannelJoinResultSerializer(serializers.Serializer):
+    id = serializers.UUIDField(help_text="ID of Peer Node")
+    name = serializers.CharField(max_length=128, help_text="name of Peer Node")
+    joined = serializers.BooleanField(help_text="whether peer joined channel")
+    error = serializers.CharField(
+        allow_blank=True, required=False, help_text="reason of failed join")
+    duration = serializers.FloatField(help_text="seconds the join took")
+
+
+class ChannelCreateResponse(ChannelIDSerializer):
+    peers = ChannelJoinResultSerializer(
+        many=True, help_text="join result per peer")
+
+
+class ChannelAnchorPeersBody(serializers.Serializer):
+    peers = serializers.ListField(
+        child=serializers.UUIDField(help_text="ID of Peer Nodes"),
+        help_text="anchor peers, replacing those of their organizations",
+    )
+
+    def validate(self, attrs):
+        if len(attrs["peers"]) < 1:
+            raise serializers.ValidationError("Invalid peers")
+
+        return super().validate(attrs)
+
+
+class ChannelAnchorPeersResponse(ChannelIDSerializer):
+    organizations = serializers.ListField(
+        child=serializers.CharField(help_text="MSP ID of Organization"),
+        help_text="organizations whose anchor peers were updated",
+    )
+
+
 class ChannelUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Channel
@@ -1,10 +1,15 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_jwt.authentication import JSONWebTokenAuthentication
 
 from drf_yasg.utils import swagger_auto_schema
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.core.paginator import Paginator
 
 from api.config import CELLO_HOME
@@ -14,6 +19,7 @@ from api.auth import TokenAuth
 from api.lib.configtxgen import ConfigTX, ConfigTxGen
 from api.lib.peer.channel import Channel as PeerChannel
 from api.lib.configtxlator.configtxlator import ConfigTxLator
+from api.lib.channelconfig import ChannelConfig
 from api.exceptions import (
     ResourceNotFound,
 )
@@ -23,7 +29,10 @@ from api.models import (
     Port
 )
 from api.routes.channel.serializers import (
+    ChannelAnchorPeersBody,
+    ChannelAnchorPeersResponse,
     ChannelCreateBody,
+    ChannelCreateResponse,
     ChannelIDSerializer,
     ChannelListResponse,
     ChannelResponseSerializer,
@@ -34,6 +43,16 @@ from api.common import ok, err
 import logging
 LOG = logging.getLogger(__name__)
 
+# peers joined to a new channel at the same time
+CHANNEL_JOIN_WORKERS = int(os.getenv("CHANNEL_JOIN_WORKERS", 8))
+# "any": channel is created when at least one peer joined,
+# "all": channel creation fails when any peer failed to join
+CHANNEL_JOIN_POLICY = os.getenv("CHANNEL_JOIN_POLICY", "any")
+if CHANNEL_JOIN_POLICY not in ("any", "all"):
+    raise ImproperlyConfigured(
+        "CHANNEL_JOIN_POLICY must be any or all, got {!r}".format(CHANNEL_JOIN_POLICY))
+
+
 class ChannelViewSet(viewsets.ViewSet):
     """Class represents Channel related operations."""
     authentication_classes = (JSONWebTokenAuthentication, TokenAuth)
@@ -82,7 +101,7 @@ class ChannelViewSet(viewsets.ViewSet):
     @swagger_auto_schema(
         request_body=ChannelCreateBody,
         responses=with_common_response(
-            {status.HTTP_201_CREATED: ChannelIDSerializer}
+            {status.HTTP_201_CREATED: ChannelCreateResponse}
         ),
     )
     def create(self, request):
@@ -106,21 +125,22 @@ class ChannelViewSet(viewsets.ViewSet):
                 tx_path = "{}/{}/channel-artifacts/{}.tx".format(CELLO_HOME, org.network.name, name)
                 block_path = "{}/{}/channel-artifacts/{}.block".format(CELLO_HOME, org.network.name, name)
                 ordering_node = Node.objects.get(id=orderers[0])
-                peer_node = Node.objects.get(id=peers[0])
+                peer_nodes = Node.objects.in_bulk(peers)
+                peer_node = peer_nodes[peers[0]]
                 envs = init_env_vars(peer_node,org)
                 peer_channel_cli = PeerChannel("v2.2.0", **envs)
                 peer_channel_cli.create(
                     channel=name,
-                    orderer_url= "{}.{}:{}".format(ordering_node.name,org.name.split(".", 1)[1], str(7050)),
+                    orderer_url="{}:{}".format(*node_address(ordering_node)),
                     channel_tx=tx_path,
                     output_block=block_path
                 )
-                for i in range(len(peers)):
-                    peer_node =  Node.objects.get(id=peers[i])
-                    envs = init_env_vars(peer_node,org)
-                    #envs["CORE_PEER_LOCALMSPID"] = '{}MSP'.format(peer_node.name.split(".")[0].capitalize()) #Org1MSP
-                    join_peers(envs,block_path)
-                
+                results = join_peers(
+                    [(peer_nodes[peer], init_env_vars(peer_nodes[peer], org)) for peer in peers],
+                    block_path
+                )
+                check_joined(name, results)
+
                 channel = Channel(
                     name=name,
                     network=org.network
@@ -128,7 +148,7 @@ class ChannelViewSet(viewsets.ViewSet):
                 channel.save()
                 channel.organizations.add(org)
                 channel.orderers.add(ordering_node)
-                response = ChannelIDSerializer(data=channel.__dict__)
+                response = ChannelCreateResponse(data={"id": channel.id, "peers": results})
                 if response.is_valid(raise_exception=True):
                     return Response(
                         ok(response.validated_data), status=status.HTTP_201_CREATED
@@ -191,6 +211,80 @@ class ChannelViewSet(viewsets.ViewSet):
             except ObjectDoesNotExist:
                 raise ResourceNotFound
 
+    @swagger_auto_schema(
+        method="post",
+        request_body=ChannelAnchorPeersBody,
+        responses=with_common_response(
+            {status.HTTP_200_OK: ChannelAnchorPeersResponse}
+        ),
+    )
+    @action(detail=True, methods=['post'])
+    def anchors(self, request, pk=None):
+        """
+        Set anchor peers of every organization of the given peers, in one config update
+        :param request: anchor peers
+        :param pk: primary key
+        :return: organizations updated
+        :rtype: rest_framework.status
+        """
+        serializer = ChannelAnchorPeersBody(data=request.data)
+        if serializer.is_valid(raise_exception=True):
+            peers = serializer.validated_data.get("peers")
+            try:
+                channel = Channel.objects.get(id=pk)
+            except ObjectDoesNotExist:
+                raise ResourceNotFound
+            try:
+                org = request.user.organization
+                ordering_node = channel.orderers.first()
+                if ordering_node is None:
+                    raise Exception("channel {} has no orderer".format(channel.name))
+                envs, anchor_peers = {}, {}
+                for node in Node.objects.filter(id__in=peers).select_related("organization"):
+                    node_org = node.organization
+                    if node_org.id not in envs:
+                        envs[node_org.id] = init_env_vars(node, node_org)
+                    mspid = envs[node_org.id]["CORE_PEER_LOCALMSPID"]
+                    anchor_peers.setdefault(mspid, []).append(node_address(node))
+                if not envs:
+                    raise Exception("no peer found for anchor peers")
+                submitter = envs.get(org.id) or next(iter(envs.values()))
+
+                config = ChannelConfig(
+                    channel.name, "{}:{}".format(*node_address(ordering_node)), submitter,
+                ).fetch()
+                config.set_all_anchor_peers(anchor_peers)
+                # admins of every touched organization sign the one update
+                config.sign(*envs.values()).submit()
+                response = ChannelAnchorPeersResponse(
+                    data={"id": channel.id, "organizations": sorted(anchor_peers)})
+                if response.is_valid(raise_exception=True):
+                    return Response(
+                        ok(response.validated_data), status=status.HTTP_200_OK
+                    )
+            except Exception as e:
+                return Response(
+                    err(e.args), status=status.HTTP_400_BAD_REQUEST
+                )
+
+
+def node_address(node):
+    """
+    Address other nodes reach a node at, the hostname cryptogen issued its
+    tls certificate for and the port it listens on.
+    :param node: Node object
+    :return: host, port
+    :rtype: tuple
+    """
+    org_name = node.organization.name
+    # orderers are issued under the domain of their organization
+    domain = org_name if node.type == "peer" else org_name.split(".", 1)[1]
+    # the listen port is mapped first, chaincode and operations ports follow
+    port = Port.objects.filter(node=node).order_by("internal").first()
+    if port is None:
+        raise Exception("node {} has no port mapped".format(node.name))
+    return "{}.{}".format(node.name, domain), port.internal
+
 
 def init_env_vars(node, org):
     """
@@ -219,14 +313,59 @@ def init_env_vars(node, org):
     return envs
 
 
-def join_peers(envs, block_path):
+def join_peer(node, envs, block_path):
     """
-    Join peer nodes to the channel.
+    Join one peer node to the channel.
+    :param node: peer Node object
     :param envs: environments variables for peer CLI.
     :param block_path: Path to file containing genesis block
+    :return: join result of peer
+    :rtype: dict
+    """
+    start = time.monotonic()
+    result = {"id": node.id, "name": node.name, "joined": False, "error": ""}
+    try:
+        peer_channel_cli = PeerChannel("v2.2.0", **envs)
+        returncode = peer_channel_cli.join(block_file=block_path)
+        result["joined"] = returncode == 0
+        if returncode != 0:
+            result["error"] = "peer channel join exited {}".format(returncode)
+    except Exception as e:
+        result["error"] = str(e)
+    result["duration"] = round(time.monotonic() - start, 3)
+    if not result["joined"]:
+        LOG.warning("Peer %s failed to join channel: %s", node.name, result["error"])
+    return result
+
+
+def check_joined(channel, results, policy=CHANNEL_JOIN_POLICY):
+    """
+    Fail channel creation when peers failed to join against the join policy.
+    :param channel: channel name
+    :param results: join result per peer, as join_peers returns them
+    :param policy: "any" or "all", as CHANNEL_JOIN_POLICY
+    :return: none
+    :rtype: none
+    """
+    failed = [r for r in results if not r["joined"]]
+    if len(failed) == len(results) or (failed and policy == "all"):
+        raise Exception("join channel {} failed: {}".format(
+            channel, ", ".join("{}: {}".format(r["name"], r["error"]) for r in failed)))
+
+
+def join_peers(targets, block_path, workers=CHANNEL_JOIN_WORKERS):
+    """
+    Join peer nodes to the channel concurrently.
+    :param targets: list of (peer Node object, environments variables for peer CLI)
+    :param block_path: Path to file containing genesis block
+    :param workers: peers joined at the same time
+    :return: join result per peer, in order of targets
+    :rtype: list
     """
-    # Join the peers to the channel.
-    peer_channel_cli = PeerChannel("v2.2.0", **envs)
-    peer_channel_cli.join(
-        block_file=block_path
-    )
\ No newline at end of file
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(len(targets), workers))) as executor:
+        return list(executor.map(
+            lambda target: join_peer(target[0], target[1], block_path),
+            targets
+        ))
@@ -2,7 +2,6 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import logging
-import base64
 
 from rest_framework import viewsets, status
 from django.core.exceptions import ObjectDoesNotExist
@@ -16,7 +15,7 @@ from api.routes.general.serializers import (
     LoginBody,
 )
 from api.lib.pki import CryptoGen, CryptoConfig
-from api.utils import zip_dir, zip_file
+from api.utils import pack_dir
 from api.common import ok, err
 from api.config import CELLO_HOME
 from api.utils.jwt import jwt_response_payload_handler
@@ -91,13 +90,8 @@ class RegisterViewSet(viewsets.ViewSet):
             dir_org = "{}/{}/crypto-config/peerOrganizations/{}/" \
                 .format(CELLO_HOME, name, name)
 
-            zip_dir("{}msp".format(dir_org), "{}msp.zip".format(dir_org))
-            with open("{}msp.zip".format(dir_org), "rb") as f_msp:
-                msp = base64.b64encode(f_msp.read())
-
-            zip_dir("{}tlsca".format(dir_org), "{}tls.zip".format(dir_org))
-            with open("{}tls.zip".format(dir_org), "rb") as f_tls:
-                tls = base64.b64encode(f_tls.read())
+            msp = pack_dir("{}msp".format(dir_org))
+            tls = pack_dir("{}tlsca".format(dir_org))
         except Exception as e:
             raise e
 
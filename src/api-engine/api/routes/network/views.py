@@ -2,7 +2,6 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import logging
-import base64
 import shutil
 import os
 
@@ -26,15 +25,15 @@ from api.routes.network.serializers import (
     NetworkIDSerializer,
 )
 from api.utils.common import with_common_response
-from api.common.enums import NodeStatus
+from api.common.enums import NodeStatus, AgentOperation
 from api.lib.configtxgen import ConfigTX, ConfigTxGen
-from api.models import Network, Node, Port
+from api.models import Artifact, Network, Node, Port
 from api.config import CELLO_HOME
-from api.utils import zip_dir, zip_file
+from api.utils import pack_file
 from api.auth import TokenAuth
 from api.lib.agent import AgentHandler
+from api.tasks import submit_agent_job
 from api.common import ok, err
-import threading
 
 LOG = logging.getLogger(__name__)
 
@@ -43,21 +42,17 @@ class NetworkViewSet(viewsets.ViewSet):
 
     authentication_classes = (JSONWebTokenAuthentication, TokenAuth)
 
-    def _genesis2base64(self, network):
+    def _genesis2artifact(self, network):
         """
-        convert genesis.block to Base64
+        store zipped genesis.block as artifact
         :param network: network id
         :return: genesis block
-        :rtype: bytearray
+        :rtype: Artifact
         """
         try:
             dir_node = "{}/{}/".format(CELLO_HOME, network)
             name = "genesis.block"
-            zname = "block.zip"
-            zip_file("{}{}".format(dir_node, name), "{}{}".format(dir_node, zname))
-            with open("{}{}".format(dir_node, zname), "rb") as f_block:
-                block = base64.b64encode(f_block.read())
-            return block
+            return Artifact.store(pack_file("{}{}".format(dir_node, name), encode=False))
         except Exception as e:
             raise e
 
@@ -133,12 +128,13 @@ class NetworkViewSet(viewsets.ViewSet):
             org_name = org.name if node.type == "peer" else org.name.split(".", 1)[1]
             # get info of node, e.g, tls, msp, config.
             info["status"] = node.status
-            info["msp"] = node.msp
-            info["tls"] = node.tls
-            info["config_file"] = node.config_file
+            # digests of artifacts, agent loads content when it needs it
+            info["msp"] = node.msp_id
+            info["tls"] = node.tls_id
+            info["config_file"] = node.config_file_id
             info["type"] = node.type
             info["name"] = "{}.{}".format(node.name, org_name)
-            info["bootstrap_block"] = network.genesisblock
+            info["bootstrap_block"] = network.genesisblock_id
             info["urls"] = agent.urls
             info["network_name"] = network.name
             info["network_type"] = network.type
@@ -210,17 +206,19 @@ class NetworkViewSet(viewsets.ViewSet):
                 ConfigTX(name).create(consensus=consensus, orderers=orderers, peers=peers)
                 ConfigTxGen(name).genesis()
 
-                block = self._genesis2base64(name)
+                block = self._genesis2artifact(name)
                 network = Network(name=name, consensus=consensus, genesisblock=block)
                 network.save()
                 org.network = network
                 org.save()
                 nodes = Node.objects.filter(organization=org)
+                agent = org.agent.first()
                 for node in nodes:
-                    try:
-                        threading.Thread(target=self._start_node, args=(node.id,)).start()
-                    except Exception as e:
-                        raise e
+                    submit_agent_job(
+                        agent.id if agent else node.agent_id,
+                        AgentOperation.Create.value,
+                        node.id,
+                    )
 
                 response = NetworkIDSerializer(data=network.__dict__)
                 if response.is_valid(raise_exception=True):
@@ -14,6 +14,7 @@ from api.common.enums import (
 )
 from api.common.serializers import PageQuerySerializer
 from api.models import (
+    AgentJob,
     Node,
     Port,
     FabricCA,
@@ -210,6 +211,25 @@ class NodeListSerializer(serializers.Serializer):
     )
 
 
+class NodeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AgentJob
+        fields = (
+            "id",
+            "agent_id",
+            "operation",
+            "status",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+
+
+class NodeJobListSerializer(serializers.Serializer):
+    data = NodeJobSerializer(many=True, help_text="Jobs of node")
+
+
 class NodeUrlSerializer(serializers.Serializer):
     internal_port = serializers.IntegerField(
         min_value=1,
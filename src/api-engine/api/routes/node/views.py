@@ -2,10 +2,9 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import logging
-import base64
 import shutil
 import os
-import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.exceptions import PermissionDenied
@@ -25,6 +24,8 @@ from api.exceptions import CustomError, NoResource, ResourceExists, ResourceInUs
 from api.exceptions import ResourceNotFound
 from api.models import (
     Agent,
+    AgentJob,
+    Artifact,
     Node,
     Organization,
     Port,
@@ -51,12 +52,14 @@ from api.routes.node.serializers import (
     NodeUserPatchSerializer,
     NodeUserQuerySerializer,
     NodeUserListSerializer,
+    NodeJobListSerializer,
 )
-from api.tasks import operate_node
+from api.tasks import operate_node, refill_identity_pool, submit_agent_job
 from api.utils.common import with_common_response
 from api.auth import CustomAuthenticate, TokenAuth
 from api.lib.pki import CryptoGen, CryptoConfig
-from api.utils import zip_dir, zip_file
+from api.lib.pki.pkigen.pool import IdentityPool, IDENTITY_POOL_LOW_WATER
+from api.utils import pack_dir, pack_file
 from api.config import (
     CELLO_HOME,
     FABRIC_NODE,
@@ -69,6 +72,17 @@ from api.common import ok, err
 
 LOG = logging.getLogger(__name__)
 
+# columns of joined rows which node list never shows
+LIST_DEFERRED_FIELDS = (
+    "organization__msp",
+    "organization__tls",
+    "agent__free_ports",
+    "agent__port_bitmap",
+)
+
+# workers rendering config and packing msp/tls of new nodes
+NODE_BUILD_WORKERS = int(os.getenv("NODE_BUILD_WORKERS", 8))
+
 
 class NodeViewSet(viewsets.ViewSet):
     authentication_classes = (JSONWebTokenAuthentication, TokenAuth)
@@ -126,7 +140,7 @@ class NodeViewSet(viewsets.ViewSet):
                 #     query_filter.update({"user": request.user})
                 if agent_id:
                     query_filter.update({"agent__id": agent_id})
-                nodes = Node.objects.filter(**query_filter)
+                nodes = self._list_queryset(query_filter)
                 p = Paginator(nodes, per_page)
                 nodes = p.page(page)
                 nodes = [
@@ -136,7 +150,7 @@ class NodeViewSet(viewsets.ViewSet):
                         "type": node.type,
                         "organization": node.organization,
                         "urls": node.urls,
-                        "network": str(node.organization.network.id) if node.organization.network else None,
+                        "network": str(node.organization.network_id) if node.organization.network_id else None,
                         "agents": node.agent if node.agent else None,
                         #"channel": str(node.organization.channel.id) if node.organization.channel else None,
                         "ports": node.port,
@@ -153,6 +167,23 @@ class NodeViewSet(viewsets.ViewSet):
                 err(e.args), status=status.HTTP_400_BAD_REQUEST
             )
 
+    def _list_queryset(self, query_filter):
+        """
+        Nodes for list page, organization and agent are joined, ports are
+        fetched in one extra query and blob columns are never loaded, so a
+        page costs the same number of queries whatever its size.
+
+        :param query_filter: filter of nodes
+        :return: nodes
+        :rtype: QuerySet
+        """
+        return (
+            Node.objects.filter(**query_filter)
+            .select_related("organization", "agent")
+            .prefetch_related("port")
+            .defer(*LIST_DEFERRED_FIELDS)
+        )
+
     def _save_fabric_ca(self, request, ca=None):
         if ca is None:
             return None
@@ -306,38 +337,36 @@ class NodeViewSet(viewsets.ViewSet):
                         raise ResourceExists
                 else:
                     raise NoResource
-                for n in range(num):
-
-                    name = node_name+str(n)
-
+                names = [node_name + str(n) for n in range(num)]
+                nodes = {
+                    "type": node_type,
+                    "Specs": names
+                }
+                CryptoConfig(organization.name).update(nodes)
+                self._issue_identities(organization.name, node_type, names)
+                with ThreadPoolExecutor(max_workers=max(1, min(num, NODE_BUILD_WORKERS))) as executor:
+                    artifacts = list(executor.map(
+                        lambda name: self._build_node_artifacts(node_type, organization.name, name),
+                        names
+                    ))
+
+                for name, (msp, tls, cfg) in zip(names, artifacts):
                     urls = "{}.{}".format(name, organization.name)
-                    nodes = {
-                        "type": node_type,
-                        "Specs": [name]
-                    }
-                    CryptoConfig(organization.name).update(nodes)
-                    CryptoGen(organization.name).extend()
-                    self._generate_config(node_type, organization.name, name)
-                    msp, tls, cfg = self._conversion_msp_tls_cfg(node_type, organization.name, name)
-
                     node = Node(
                         name=name,
                         organization=organization,
                         urls=urls,
                         type=node_type,
-                        msp=msp,
-                        tls=tls,
+                        msp=Artifact.store(msp),
+                        tls=Artifact.store(tls),
                         agent=agent,
-                        config_file=cfg
+                        config_file=Artifact.store(cfg)
                     )
                     node.save()
 
                     self._set_port(node_type, node, agent)
                     if node.organization.network:
-                        try:
-                            threading.Thread(target=self._start_node, args=(node.id,)).start()
-                        except Exception as e:
-                            raise e
+                        submit_agent_job(agent.id, AgentOperation.Create.value, node.id)
 
                 response = NodeIDSerializer(data=node.__dict__)
                 if response.is_valid(raise_exception=True):
@@ -351,6 +380,26 @@ class NodeViewSet(viewsets.ViewSet):
                 err(e.args), status=status.HTTP_400_BAD_REQUEST
             )
 
+    @staticmethod
+    def _issue_identities(org, type, names):
+        """
+        issue identities of nodes, prepared identities of pool are taken
+        first and cryptogen only issues the rest
+
+        :param org: organization name
+        :param type: node type
+        :param names: node names
+        :return: names of nodes which got an identity from pool
+        :rtype: list
+        """
+        pool = IdentityPool(org, type)
+        claimed = [name for name in names if pool.claim(name)]
+        if len(claimed) < len(names):
+            CryptoGen(org).extend()
+        if pool.size() < IDENTITY_POOL_LOW_WATER:
+            refill_identity_pool.delay(org, type)
+        return claimed
+
     def _set_port(self, type, node, agent):
         """
         get free port from agent,
@@ -373,9 +422,22 @@ class NodeViewSet(viewsets.ViewSet):
             ports = find_available_ports(ip, node.id, agent.id, 1)
             set_ports_mapping(node.id, [{"internal": 7050, "external": ports[0]}], True)
 
+    def _build_node_artifacts(self, type, org, node):
+        """
+        generate config of node and pack its msp, tls and config
+
+        :param type: node type
+        :param org: organization name
+        :param node: node name
+        :return: msp, tls, cfg
+        :rtype: bytes
+        """
+        self._generate_config(type, org, node)
+        return self._conversion_msp_tls_cfg(type, org, node)
+
     def _conversion_msp_tls_cfg(self, type, org, node):
         """
-        msp and tls , cfg from zip file to byte
+        msp and tls , cfg zipped in memory
 
         :param org: organization name
         :param type: node type
@@ -388,24 +450,14 @@ class NodeViewSet(viewsets.ViewSet):
                 dir_node = "{}/{}/crypto-config/peerOrganizations/{}/peers/{}/" \
                     .format(CELLO_HOME, org, org, node + "." + org)
                 name = "core.yaml"
-                cname = "peer_config.zip"
             else:
                 dir_node = "{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}/" \
                     .format(CELLO_HOME, org, org.split(".", 1)[1], node + "." + org.split(".", 1)[1])
                 name = "orderer.yaml"
-                cname = "orderer_config.zip"
-
-            zip_dir("{}msp".format(dir_node), "{}msp.zip".format(dir_node))
-            with open("{}msp.zip".format(dir_node), "rb") as f_msp:
-                msp = base64.b64encode(f_msp.read())
 
-            zip_dir("{}tls".format(dir_node), "{}tls.zip".format(dir_node))
-            with open("{}tls.zip".format(dir_node), "rb") as f_tls:
-                tls = base64.b64encode(f_tls.read())
-
-            zip_file("{}{}".format(dir_node, name), "{}{}".format(dir_node, cname))
-            with open("{}{}".format(dir_node, cname), "rb") as f_cfg:
-                cfg = base64.b64encode(f_cfg.read())
+            msp = pack_dir("{}msp".format(dir_node), encode=False)
+            tls = pack_dir("{}tls".format(dir_node), encode=False)
+            cfg = pack_file("{}{}".format(dir_node, name), encode=False)
         except Exception as e:
             raise e
 
@@ -471,12 +523,13 @@ class NodeViewSet(viewsets.ViewSet):
             # get info of node, e.g, tls, msp, config.
             info["id"] = node.id
             info["status"] = node.status
-            info["msp"] = node.msp
-            info["tls"] = node.tls
-            info["config_file"] = node.config_file
+            # digests of artifacts, agent loads content when it needs it
+            info["msp"] = node.msp_id
+            info["tls"] = node.tls_id
+            info["config_file"] = node.config_file_id
             info["type"] = node.type
             info["name"] = "{}.{}".format(node.name, org_name)
-            info["bootstrap_block"] = network.genesisblock
+            info["bootstrap_block"] = network.genesisblock_id
             info["urls"] = agent.urls
             info["network_name"] = network.name
             info["network_type"] = network.type
@@ -550,6 +603,22 @@ class NodeViewSet(viewsets.ViewSet):
                 err(e.args), status=status.HTTP_400_BAD_REQUEST
             )
 
+    @swagger_auto_schema(
+        methods=["get"],
+        responses=with_common_response(
+            {status.HTTP_200_OK: NodeJobListSerializer}
+        ),
+    )
+    @action(methods=["get"], detail=True, url_path="jobs")
+    def jobs(self, request, pk=None):
+        """
+        List node jobs
+
+        List agent operations queued or run for node
+        """
+        response = NodeJobListSerializer({"data": AgentJob.objects.filter(node_id=pk)})
+        return Response(ok(response.data), status=status.HTTP_200_OK)
+
     @swagger_auto_schema(
         responses=with_common_response(
             {status.HTTP_204_NO_CONTENT: "No Content"}
@@ -581,6 +650,7 @@ class NodeViewSet(viewsets.ViewSet):
                     if os.path.exists(fabric_path): shutil.rmtree(fabric_path, True)
                     prod_path = "{}/{}".format(PRODUCTION_NODE, infos["container_name"])
                     if os.path.exists(prod_path): shutil.rmtree(prod_path, True)
+                    # ports go back to the agent bitmap in the pre_delete signal of node
                     node.delete()
                     #node.status = "exited"
                     #node.save()
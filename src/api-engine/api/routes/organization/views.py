@@ -2,7 +2,6 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 import logging
-import base64
 import shutil
 import os
 
@@ -20,6 +19,7 @@ from api.utils.common import with_common_response
 from api.exceptions import ResourceExists, ResourceNotFound, ResourceInUse
 from api.models import (
     Agent,
+    Artifact,
     Node,
     Organization,
     Port,
@@ -43,7 +43,7 @@ from api.routes.user.serializers import UserIDSerializer
 from api.models import UserProfile, Organization, Network
 from api.routes.user.serializers import UserListSerializer, UserQuerySerializer
 from api.lib.pki import CryptoGen, CryptoConfig
-from api.utils import zip_dir, zip_file
+from api.utils import pack_dir, pack_file
 from api.config import CELLO_HOME
 from api.auth import TokenAuth
 from api.utils.node_config import NodeConfig
@@ -166,16 +166,16 @@ class OrganizationViewSet(viewsets.ViewSet):
                 organization=org,
                 urls=urls,
                 type=nodeType,
-                msp=msp,
-                tls=tls,
+                msp=Artifact.store(msp),
+                tls=Artifact.store(tls),
                 agent=None,
-                config_file=cfg
+                config_file=Artifact.store(cfg)
             )
             node.save()
 
     def _conversion_msp_tls_cfg(self, type, org, node):
         """
-        msp and tls , cfg from zip file to byte
+        msp and tls , cfg zipped in memory
 
         :param org: organization name
         :param type: node type
@@ -188,24 +188,14 @@ class OrganizationViewSet(viewsets.ViewSet):
                 dir_node = "{}/{}/crypto-config/peerOrganizations/{}/peers/{}/" \
                     .format(CELLO_HOME, org, org, node + "." + org)
                 name = "core.yaml"
-                cname = "peer_config.zip"
             else:
                 dir_node = "{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}/" \
                     .format(CELLO_HOME, org, org.split(".", 1)[1], node + "." + org.split(".", 1)[1])
                 name = "orderer.yaml"
-                cname = "orderer_config.zip"
 
-            zip_dir("{}msp".format(dir_node), "{}msp.zip".format(dir_node))
-            with open("{}msp.zip".format(dir_node), "rb") as f_msp:
-                msp = base64.b64encode(f_msp.read())
-
-            zip_dir("{}tls".format(dir_node), "{}tls.zip".format(dir_node))
-            with open("{}tls.zip".format(dir_node), "rb") as f_tls:
-                tls = base64.b64encode(f_tls.read())
-
-            zip_file("{}{}".format(dir_node, name), "{}{}".format(dir_node, cname))
-            with open("{}{}".format(dir_node, cname), "rb") as f_cfg:
-                cfg = base64.b64encode(f_cfg.read())
+            msp = pack_dir("{}msp".format(dir_node), encode=False)
+            tls = pack_dir("{}tls".format(dir_node), encode=False)
+            cfg = pack_file("{}{}".format(dir_node, name), encode=False)
         except Exception as e:
             raise e
 
@@ -254,13 +244,8 @@ class OrganizationViewSet(viewsets.ViewSet):
             dir_org = "{}/{}/crypto-config/peerOrganizations/{}/" \
                 .format(CELLO_HOME, name, name)
 
-            zip_dir("{}msp".format(dir_org), "{}msp.zip".format(dir_org))
-            with open("{}msp.zip".format(dir_org), "rb") as f_msp:
-                msp = base64.b64encode(f_msp.read())
-
-            zip_dir("{}tlsca".format(dir_org), "{}tls.zip".format(dir_org))
-            with open("{}tls.zip".format(dir_org), "rb") as f_tls:
-                tls = base64.b64encode(f_tls.read())
+            msp = pack_dir("{}msp".format(dir_org))
+            tls = pack_dir("{}tlsca".format(dir_org))
         except Exception as e:
             raise e
 
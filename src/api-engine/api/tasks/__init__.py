@@ -1 +1,5 @@
-from .agent import operate_node
+from .agent import operate_node, run_agent_job, submit_agent_job
+from .port import sweep_port_reservations
+from .artifact import collect_artifacts
+from .pki import refill_identity_pool, refill_identity_pools
+from .chaincode import run_chaincode_job, submit_chaincode_job, resume_chaincode_job
@@ -6,15 +6,25 @@ from __future__ import absolute_import, unicode_literals
 import json
 import logging
 import os
+from datetime import timedelta
 
 import docker
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
 
-from api.models import Node, Port
+from api.common.enums import AgentOperation, JobStatus
+from api.models import Agent, AgentJob, Node, Port
 from api_engine.celery import app
 
 LOG = logging.getLogger(__name__)
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# operations running at once on one agent, across every worker
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", 4))
+# hard limit of one agent job in seconds, running jobs older than this are dead
+AGENT_JOB_TIME_LIMIT = int(os.getenv("AGENT_JOB_TIME_LIMIT", 600))
+# seconds a job waits for a free slot of its agent before trying again
+AGENT_JOB_RETRY_DELAY = int(os.getenv("AGENT_JOB_RETRY_DELAY", 5))
 
 
 class NodeHandler(object):
@@ -121,3 +131,85 @@ def operate_node(self, node_id=None, action=None, **kwargs):
         node_handler.run()
     except Exception as e:
         self.retry(exc=e)
+
+
+def _start_node(node_id):
+    # views import the tasks, so the node view is imported at call time
+    from api.routes.node.views import NodeViewSet
+
+    NodeViewSet()._start_node(node_id)
+
+
+# operation -> callable taking the node id
+AGENT_OPERATIONS = {
+    AgentOperation.Create.value: _start_node,
+}
+
+
+def submit_agent_job(agent_id, operation, node_id):
+    """
+    Record an agent operation on a node and queue it on the workers
+
+    :param agent_id: agent running the operation
+    :param operation: AgentOperation value
+    :param node_id: node operated
+    :return: job
+    :rtype: AgentJob
+    """
+    job = AgentJob.objects.create(agent_id=agent_id, operation=operation, node_id=node_id)
+    run_agent_job.delay(str(job.id))
+    return job
+
+
+def _take_slot(job_id):
+    """
+    Mark a pending job running if its agent has a free slot
+
+    The agent row is locked while running jobs are counted, so the limit
+    holds for every worker process.
+
+    :param job_id: job id
+    :return: running job or None, whether the agent is busy
+    :rtype: tuple
+    """
+    agent_id = AgentJob.objects.filter(
+        id=job_id, status=JobStatus.Pending.value
+    ).values_list("agent_id", flat=True).first()
+    if agent_id is None:
+        return None, False
+    with transaction.atomic():
+        list(Agent.objects.select_for_update().filter(id=agent_id).values_list("id", flat=True))
+        stale = timezone.now() - timedelta(seconds=AGENT_JOB_TIME_LIMIT)
+        running = AgentJob.objects.filter(
+            agent_id=agent_id, status=JobStatus.Running.value, started_at__gt=stale
+        ).count()
+        if running >= AGENT_MAX_CONCURRENCY:
+            return None, True
+        started = AgentJob.objects.filter(
+            id=job_id, status=JobStatus.Pending.value
+        ).update(status=JobStatus.Running.value, started_at=timezone.now())
+    if not started:
+        return None, False
+    return AgentJob.objects.get(id=job_id), False
+
+
+@app.task(bind=True, max_retries=None, time_limit=AGENT_JOB_TIME_LIMIT)
+def run_agent_job(self, job_id):
+    job, busy = _take_slot(job_id)
+    if busy:
+        # wait for a slot without holding the worker
+        raise self.retry(countdown=AGENT_JOB_RETRY_DELAY)
+    if job is None:
+        return False
+
+    try:
+        AGENT_OPERATIONS[job.operation](str(job.node_id))
+    except Exception as e:
+        LOG.exception("Agent %s %s %s failed", job.agent_id, job.operation, job.node_id)
+        job.status = JobStatus.Failed.value
+        job.error = str(e)
+    else:
+        job.status = JobStatus.Success.value
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+    return job.status == JobStatus.Success.value
@@ -0,0 +1,27 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import os
+from datetime import timedelta
+
+from django.utils import timezone
+
+from api.models import Artifact
+from api_engine.celery import app
+
+LOG = logging.getLogger(__name__)
+
+# seconds an unreferenced artifact is kept, covers records being created
+ARTIFACT_GC_GRACE = int(os.getenv("ARTIFACT_GC_GRACE", 3600))
+
+
+@app.task(time_limit=600)
+def collect_artifacts():
+    deleted = Artifact.collect(timezone.now() - timedelta(seconds=ARTIFACT_GC_GRACE))
+    if deleted:
+        LOG.info("Deleted %s unreferenced artifacts", deleted)
+
+    return deleted
@@ -0,0 +1,332 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import absolute_import, unicode_literals
+
+import glob
+import logging
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from api.common.enums import ChainCodeOperation, JobStatus
+from api.config import CELLO_HOME, FABRIC_CHAINCODE_STORE
+from api.lib.peer.chaincode import ChainCode as PeerChainCode
+from api.lib.gomod import vendor
+from api.models import ChainCode, ChainCodeJob, Node
+from api.utils.package_cache import (
+    CHAINCODE_PACKAGE_CACHE,
+    cache_path,
+    cached_package,
+    package_id,
+)
+from api_engine.celery import app
+
+LOG = logging.getLogger(__name__)
+
+# hard limit of one lifecycle job in seconds, go mod vendor can be slow
+CHAINCODE_JOB_TIME_LIMIT = int(os.getenv("CHAINCODE_JOB_TIME_LIMIT", 1800))
+# peers a chaincode is installed on at the same time
+CHAINCODE_INSTALL_WORKERS = int(os.getenv("CHAINCODE_INSTALL_WORKERS", 8))
+
+
+def package_path(chaincode):
+    """
+    Path of the packaged chaincode
+
+    :param chaincode: ChainCode object
+    :return: path of tar.gz package, None if chaincode is not packaged
+    :rtype: str
+    """
+    if chaincode.digest:
+        return cached_package(chaincode.digest)
+    # packaged before the package cache existed
+    packages = glob.glob(os.path.join(FABRIC_CHAINCODE_STORE, str(chaincode.id), "*.tar.gz"))
+    return packages[0] if packages else None
+
+
+def _peer_cli(org, node):
+    # views import this module, so the env helper is imported at call time
+    from api.routes.chaincode.views import init_env_vars
+
+    return PeerChainCode("v2.2.0", **init_env_vars(node, org))
+
+
+def _org_node(org, node_type):
+    # organizations may run several nodes of a type, the first by name is used
+    node = Node.objects.filter(type=node_type, organization=org.id).order_by("name").first()
+    if node is None:
+        raise Exception("organization {} has no {} node.".format(org.name, node_type))
+    return node
+
+
+def _orderer_tls_root_cert(org):
+    orderer_node = _org_node(org, "orderer")
+    domain = org.name.split(".", 1)[1]
+    orderer_tls_dir = "{}/{}/crypto-config/ordererOrganizations/{}/orderers/{}/msp/tlscacerts".format(
+        CELLO_HOME, org.name, domain, orderer_node.name + "." + domain)
+    for _, _, files in os.walk(orderer_tls_dir):
+        return orderer_tls_dir + "/" + files[0]
+    return ""
+
+
+def _extract(job, org, params):
+    if cached_package(params["digest"]):
+        # same source was packaged by another job meanwhile
+        return None
+    file_path = os.path.join(FABRIC_CHAINCODE_STORE, params["chaincode_id"])
+    src = os.path.join(file_path, "src")
+    shutil.rmtree(src, ignore_errors=True)
+    with zipfile.ZipFile(params["archive"]) as zipped_file:
+        zipped_file.extractall(src)
+
+    # the first directory holding go.mod is the chaincode, the top directory otherwise
+    chaincode_path = None
+    for root, dirs, files in os.walk(src):
+        dirs.sort()
+        if "go.mod" in files:
+            chaincode_path = root
+            break
+    if chaincode_path is None:
+        dirs = sorted(d for d in os.listdir(src) if os.path.isdir(os.path.join(src, d)))
+        chaincode_path = os.path.join(src, dirs[0]) if dirs else src
+    return {"chaincode_path": chaincode_path}
+
+
+def _vendor(job, org, params):
+    chaincode_path = params.get("chaincode_path")
+    if cached_package(params["digest"]) or not os.path.exists(os.path.join(chaincode_path, "go.mod")):
+        return None
+    vendor(chaincode_path)
+    return None
+
+
+def _package(job, org, params):
+    if cached_package(params["digest"]):
+        return None
+    os.makedirs(CHAINCODE_PACKAGE_CACHE, exist_ok=True)
+    tmp = os.path.join(CHAINCODE_PACKAGE_CACHE, ".{}.tmp".format(job.id))
+    peer_node = _org_node(org, "peer")
+    res = _peer_cli(org, peer_node).lifecycle_package(
+        params["name"], params["version"], params["chaincode_path"], params["language"], output=tmp
+    )
+    if res != 0:
+        raise Exception("package chaincode failed.")
+    # publish the package only once it is complete
+    os.rename(tmp, cache_path(params["digest"]))
+    return None
+
+
+def _store(job, org, params):
+    # the package lives in the package cache, the upload is not needed anymore
+    shutil.rmtree(os.path.join(FABRIC_CHAINCODE_STORE, params["chaincode_id"]), ignore_errors=True)
+    chaincode, _ = ChainCode.objects.get_or_create(
+        id=params["chaincode_id"],
+        defaults={
+            "name": params["name"],
+            "version": params["version"],
+            "language": params["language"],
+            "creator": org.name,
+            "md5": params["md5"],
+            "digest": params["digest"],
+            "package_id": package_id(
+                "{}_{}".format(params["name"], params["version"]),
+                cache_path(params["digest"]),
+            ),
+        },
+    )
+    job.chaincode = chaincode
+    job.save(update_fields=["chaincode", "updated_at"])
+    return None
+
+
+def _install_peer(org, peer, cc_targz, package):
+    start = time.monotonic()
+    result = {"id": str(peer.id), "name": peer.name, "installed": False, "skipped": False, "error": ""}
+    try:
+        peer_cli = _peer_cli(org, peer)
+        # skipping on a stale result would leave the peer without the package
+        code, installed = peer_cli.lifecycle_query_installed("5s", cached=False)
+        if code == 0 and any(
+            cc.get("package_id") == package for cc in installed.get("installed_chaincodes", [])
+        ):
+            result.update(installed=True, skipped=True)
+        elif peer_cli.lifecycle_install(cc_targz) == 0:
+            result["installed"] = True
+        else:
+            result["error"] = "install chaincode failed."
+    except Exception as e:
+        result["error"] = str(e)
+    result["duration"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def _install(job, org, params):
+    chaincode = ChainCode.objects.get(id=params["chaincode_id"])
+    cc_targz = package_path(chaincode)
+    if cc_targz is None:
+        raise Exception("chaincode {} is not packaged.".format(params["chaincode_id"]))
+    package = chaincode.package_id or package_id(
+        "{}_{}".format(chaincode.name, chaincode.version), cc_targz
+    )
+
+    peers = Node.objects.filter(type="peer", organization=org.id)
+    if params.get("peers"):
+        peers = peers.filter(id__in=params["peers"])
+    peers = list(peers.order_by("name"))
+    if not peers:
+        raise Exception("no peer to install chaincode on.")
+
+    # peers which report the package already are skipped, so a resumed job
+    # only installs where the previous attempt failed
+    with ThreadPoolExecutor(max_workers=max(1, min(len(peers), CHAINCODE_INSTALL_WORKERS))) as executor:
+        results = list(executor.map(
+            lambda peer: _install_peer(org, peer, cc_targz, package), peers
+        ))
+    job.result = {"package_id": package, "peers": results}
+
+    failed = [r for r in results if not r["installed"]]
+    if failed:
+        raise Exception("install chaincode failed on {}.".format(
+            ", ".join("{}: {}".format(r["name"], r["error"]) for r in failed)))
+    return None
+
+
+def _approve(job, org, params):
+    peer_node = _org_node(org, "peer")
+    code, content = _peer_cli(org, peer_node).lifecycle_approve_for_my_org(
+        params["orderer_url"], _orderer_tls_root_cert(org), params["channel_name"],
+        params["chaincode_name"], params["chaincode_version"], params["policy"], params["sequence"]
+    )
+    if code != 0:
+        raise Exception("lifecycle_approve_for_my_org failed. err: " + content)
+    return None
+
+
+def _commit(job, org, params):
+    peer_node = _org_node(org, "peer")
+    peer_root_certs = []
+    peer_address_list = []
+    for peer in Node.objects.filter(id__in=params["peer_list"]):
+        peer_root_certs.append("{}/{}/crypto-config/peerOrganizations/{}/peers/{}/tls/ca.crt".format(
+            CELLO_HOME, org.name, org.name, peer.name + "." + org.name))
+        peer_address_list.append(peer.name + "." + org.name + ":" + str(7051))
+
+    code = _peer_cli(org, peer_node).lifecycle_commit(
+        params["orderer_url"], _orderer_tls_root_cert(org), params["channel_name"],
+        params["chaincode_name"], params["chaincode_version"], params["policy"],
+        peer_address_list, peer_root_certs, params["sequence"]
+    )
+    if code != 0:
+        raise Exception("commit failed.")
+    return None
+
+
+# operation -> ordered stages, a stage may return parameters for later stages
+STAGES = {
+    ChainCodeOperation.Package.value: (
+        ("extract", _extract),
+        ("vendor", _vendor),
+        ("package", _package),
+        ("store", _store),
+    ),
+    ChainCodeOperation.Install.value: (("install", _install),),
+    ChainCodeOperation.Approve.value: (("approve", _approve),),
+    ChainCodeOperation.Commit.value: (("commit", _commit),),
+}
+
+
+def submit_chaincode_job(operation, organization, chaincode=None, **parameters):
+    """
+    Record a lifecycle job and queue it on the workers
+
+    :param operation: ChainCodeOperation value
+    :param organization: organization running the job
+    :param chaincode: chaincode operated, if it exists already
+    :param parameters: parameters of operation
+    :return: job
+    :rtype: ChainCodeJob
+    """
+    job = ChainCodeJob.objects.create(
+        operation=operation,
+        organization=organization,
+        chaincode=chaincode,
+        parameters=parameters,
+        stages=[
+            {
+                "name": name,
+                "status": JobStatus.Pending.value,
+                "started_at": None,
+                "finished_at": None,
+                "duration": None,
+                "error": "",
+            }
+            for name, _ in STAGES[operation]
+        ],
+    )
+    run_chaincode_job.delay(str(job.id))
+    return job
+
+
+def resume_chaincode_job(job):
+    """
+    Queue a failed job again, stages which succeeded are not run again
+
+    :param job: failed job, or running job whose worker died
+    :return: whether job was queued
+    :rtype: bool
+    """
+    stale = timezone.now() - timedelta(seconds=CHAINCODE_JOB_TIME_LIMIT)
+    queued = ChainCodeJob.objects.filter(
+        Q(status=JobStatus.Failed.value)
+        | Q(status=JobStatus.Running.value, updated_at__lt=stale),
+        id=job.id,
+    ).update(status=JobStatus.Pending.value, error="", updated_at=timezone.now())
+    if queued:
+        run_chaincode_job.delay(str(job.id))
+    return bool(queued)
+
+
+@app.task(time_limit=CHAINCODE_JOB_TIME_LIMIT)
+def run_chaincode_job(job_id):
+    # only one worker may take a pending job
+    if not ChainCodeJob.objects.filter(
+        id=job_id, status=JobStatus.Pending.value
+    ).update(status=JobStatus.Running.value, updated_at=timezone.now()):
+        return False
+
+    job = ChainCodeJob.objects.select_related("organization").get(id=job_id)
+    org = job.organization
+    stages = dict(STAGES[job.operation])
+    for stage in job.stages:
+        if stage["status"] == JobStatus.Success.value:
+            continue
+
+        stage.update(status=JobStatus.Running.value, started_at=time.time(), error="")
+        job.save(update_fields=["stages", "updated_at"])
+        try:
+            output = stages[stage["name"]](job, org, job.parameters)
+        except Exception as e:
+            LOG.error("Chaincode job %s failed at %s: %s", job_id, stage["name"], e)
+            stage.update(status=JobStatus.Failed.value, error=str(e))
+            job.status = JobStatus.Failed.value
+            job.error = str(e)
+        else:
+            if output:
+                job.parameters.update(output)
+            stage["status"] = JobStatus.Success.value
+        stage["finished_at"] = time.time()
+        stage["duration"] = round(stage["finished_at"] - stage["started_at"], 3)
+        job.save(update_fields=["stages", "parameters", "result", "status", "error", "updated_at"])
+        if job.status == JobStatus.Failed.value:
+            return False
+
+    job.status = JobStatus.Success.value
+    job.save(update_fields=["status", "updated_at"])
+    return True
@@ -0,0 +1,28 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import absolute_import, unicode_literals
+
+import logging
+
+from api.lib.pki.pkigen.pool import IdentityPool
+from api.models import Organization
+from api_engine.celery import app
+
+LOG = logging.getLogger(__name__)
+
+
+@app.task(time_limit=600)
+def refill_identity_pool(org, node_type):
+    prepared = IdentityPool(org, node_type).fill()
+    if prepared:
+        LOG.info("Prepared %s %s identities for %s", prepared, node_type, org)
+
+    return prepared
+
+
+@app.task(time_limit=60)
+def refill_identity_pools():
+    for org in Organization.objects.values_list("name", flat=True):
+        for node_type in ("peer", "orderer"):
+            refill_identity_pool.delay(org, node_type)
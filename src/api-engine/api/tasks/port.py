@@ -0,0 +1,20 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import absolute_import, unicode_literals
+
+import logging
+
+from api.utils.port_picker import sweep_reservations
+from api_engine.celery import app
+
+LOG = logging.getLogger(__name__)
+
+
+@app.task(time_limit=60)
+def sweep_port_reservations():
+    released = sweep_reservations()
+    if released:
+        LOG.info("Released %s expired port reservations", released)
+
+    return released
@@ -1,6 +1,1517 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
-from django.test import TestCase
+import asyncio
+import base64
+import fcntl
+import hashlib
+import importlib
+import os
+import tempfile
+import threading
+import time
+from concurrent import futures
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import grpc
+from celery.exceptions import Retry
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.lib import runner
+from api.lib.channelconfig import ChannelConfig
+from api.lib.configtxgen import configtx
+from api.lib.configtxgen.configtx import ConfigTX, config_path
+from api.lib.configtxlator import protolator
+from api.lib.peer import protos
+from api.lib.peer.cache import LifecycleCache
+from api.lib.peer.gateway import GatewayError, GatewayPool
+from api.lib.pki.pkigen.pkigen import PkiGen
+from api.lib.pki.pkigen.pool import IdentityPool
+from api.models import (
+    Agent, AgentJob, Artifact, ChainCode, ChainCodeJob, Channel, Network, NetworkConfig, Node, Organization, Port, PortReservation, UserProfile,
+)
+from api.routes.chaincode import views as chaincode_views
+from api.routes.channel import views as channel_views
+from api.routes.node import views as node_views
+from api.routes.node.views import NodeViewSet
+from api.common.enums import AgentOperation, ChainCodeOperation, ConfigTxOrgType, JobStatus
+from api.tasks import agent as agent_tasks
+from api.tasks import chaincode as chaincode_tasks
+from api.tasks.chaincode import _org_node
+from api.utils import artifact_cache, package_cache, port_picker
+from api.utils.port_picker import PortBitmap
+from api.utils.template import dump_yaml, load_yaml
+
+
+class PortBitmapTest(SimpleTestCase):
+    def bitmap(self, **kwargs):
+        return PortBitmap(start=100, end=110, **kwargs)
+
+    def test_allocate_next_fit(self):
+        bitmap = self.bitmap()
+        self.assertEqual(bitmap.allocate(2), [100, 101])
+        bitmap.release([100])
+        # next fit continues after the last allocation
+        self.assertEqual(bitmap.allocate(1), [102])
+        self.assertFalse(bitmap.is_used(100))
+        self.assertTrue(bitmap.is_used(101))
+
+    def test_allocate_wraps_around(self):
+        bitmap = self.bitmap()
+        self.assertEqual(len(bitmap.allocate(8)), 8)
+        bitmap.release([100, 101])
+        self.assertEqual(bitmap.allocate(3), [108, 109, 100])
+        self.assertEqual(bitmap.allocate(1), [101])
+
+    def test_allocate_exhausted(self):
+        bitmap = self.bitmap()
+        bitmap.allocate(9)
+        self.assertEqual(bitmap.allocate(2), [])
+        # a failed allocation marks nothing
+        self.assertEqual(bitmap.allocate(1), [109])
+
+    def test_allocate_skips_used_and_excluded(self):
+        bitmap = PortBitmap(start=100, end=132)
+        bitmap.mark(range(100, 116))
+        self.assertEqual(bitmap.allocate(2, exclude=[116]), [117, 118])
+
+    def test_ports_outside_range(self):
+        bitmap = self.bitmap()
+        bitmap.mark([99, 110])
+        self.assertTrue(bitmap.is_used(99))
+        self.assertEqual(bitmap.allocate(10), list(range(100, 110)))
+
+    def test_persisted_state(self):
+        bitmap = self.bitmap()
+        bitmap.allocate(3)
+        restored = self.bitmap(data=bitmap.to_bytes(), cursor=bitmap.cursor)
+        self.assertEqual(restored.allocate(1), [103])
+        self.assertTrue(restored.is_used(102))
+
+
+class PortPickerTest(SimpleTestCase):
+    def setUp(self):
+        self.free = [7050, 7051, 7052, 7053]
+        patcher = mock.patch.object(
+            port_picker, "get_available_ports",
+            side_effect=lambda agent_id, count: [self.free.pop(0) for _ in range(min(count, len(self.free)))],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(port_picker, "release_ports")
+        self.release_ports = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_excluded_ports_are_released(self):
+        ports = port_picker.port_picker("agent", 2, exclude_ports=[7050, 7052])
+        self.assertEqual(ports, [7051, 7053])
+        self.release_ports.assert_called_once_with("agent", [7050, 7052])
+
+    def test_shortage_releases_everything(self):
+        ports = port_picker.port_picker("agent", 4, exclude_ports=[7051])
+        self.assertEqual(ports, [])
+        released = self.release_ports.call_args[0][1]
+        self.assertEqual(sorted(released), [7050, 7051, 7052, 7053])
+
+
+class LifecycleCacheTest(SimpleTestCase):
+    def shared_cache(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        return {"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": location.name,
+        }}
+
+    def test_invalidate(self):
+        with override_settings(CACHES=self.shared_cache()):
+            cache = LifecycleCache()
+            cache.set("peer0", "committed", (0, {}), channel="ch1")
+            cache.set("peer1", "committed", (0, {}), channel="ch2")
+            self.assertEqual(cache.get("peer0", "committed", channel="ch1"), (0, {}))
+            cache.invalidate(channel="ch1")
+            self.assertIsNone(cache.get("peer0", "committed", channel="ch1"))
+            self.assertEqual(cache.get("peer1", "committed", channel="ch2"), (0, {}))
+            cache.invalidate(peer="peer1")
+            self.assertIsNone(cache.get("peer1", "committed", channel="ch2"))
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }})
+    def test_disabled_with_local_backend(self):
+        cache = LifecycleCache()
+        with self.assertLogs("api.lib.peer.cache", "WARNING"):
+            cache.set("peer0", "installed", (0, {}))
+        self.assertFalse(cache.enabled())
+        self.assertIsNone(cache.get("peer0", "installed"))
+
+
+class ConfigFixture:
+    """Channel config of two application organizations."""
+
+    def org(self, mspid, anchor_peers=None):
+        group = protos.ConfigGroup(version=0, mod_policy="Admins")
+        group.values["MSP"].CopyFrom(protos.ConfigValue(
+            version=0, mod_policy="Admins",
+            value=protos.MSPConfig(
+                type=protolator.FABRIC_MSP,
+                config=protos.FabricMSPConfig(name=mspid).SerializeToString(),
+            ).SerializeToString(),
+        ))
+        group.policies["Admins"].CopyFrom(protos.ConfigPolicy(
+            version=0, mod_policy="Admins", policy=protos.Policy(type=protos.IMPLICIT_META_POLICY),
+        ))
+        if anchor_peers:
+            group.values["AnchorPeers"].CopyFrom(self.anchor_peers(anchor_peers))
+        return group
+
+    @staticmethod
+    def anchor_peers(peers, version=0):
+        return protos.ConfigValue(
+            version=version, mod_policy="Admins",
+            value=protos.AnchorPeers(anchor_peers=[
+                protos.AnchorPeer(host=host, port=port) for host, port in peers
+            ]).SerializeToString(),
+        )
+
+    def config(self, org1_anchor_peers=None):
+        config = protos.Config(sequence=3)
+        channel = config.channel_group
+        channel.mod_policy = "Admins"
+        channel.values["HashingAlgorithm"].CopyFrom(protos.ConfigValue(
+            mod_policy="Admins", value=protos.HashingAlgorithm(name="SHA256").SerializeToString(),
+        ))
+        application = channel.groups["Application"]
+        application.version = 1
+        application.mod_policy = "Admins"
+        application.groups["Org1MSP"].CopyFrom(self.org("Org1MSP", org1_anchor_peers))
+        application.groups["Org2MSP"].CopyFrom(self.org("Org2MSP"))
+        return config
+
+    def config_block(self, config=None):
+        envelope = protos.Envelope(payload=protos.Payload(
+            header=protos.Header(channel_header=protos.ChannelHeader(
+                type=protos.CONFIG, channel_id="mychannel",
+            ).SerializeToString()),
+            data=protos.ConfigEnvelope(config=config or self.config()).SerializeToString(),
+        ).SerializeToString())
+        return protos.Block(data=protos.BlockData(data=[envelope.SerializeToString()]))
+
+
+class ComputeUpdateTest(ConfigFixture, SimpleTestCase):
+    """Config updates as configtxlator compute_update writes them."""
+
+    def test_add_anchor_peer(self):
+        update = protolator.compute_update(
+            self.config(), self.config([("peer0.org1.cello.com", 7051)]), "mychannel"
+        )
+        # the org gains a value: unchanged members are read, the org version is bumped
+        read_org = protos.ConfigGroup(version=0)
+        read_org.values["MSP"].version = 0
+        read_org.policies["Admins"].version = 0
+        write_org = protos.ConfigGroup(version=1, mod_policy="Admins")
+        write_org.values["MSP"].version = 0
+        write_org.values["AnchorPeers"].CopyFrom(
+            self.anchor_peers([("peer0.org1.cello.com", 7051)])
+        )
+        write_org.policies["Admins"].version = 0
+        expected = protos.ConfigUpdate(channel_id="mychannel")
+        expected.read_set.groups["Application"].version = 1
+        expected.read_set.groups["Application"].groups["Org1MSP"].CopyFrom(read_org)
+        expected.write_set.groups["Application"].version = 1
+        expected.write_set.groups["Application"].groups["Org1MSP"].CopyFrom(write_org)
+        self.assertEqual(update, expected)
+
+    def test_modify_anchor_peer(self):
+        update = protolator.compute_update(
+            self.config([("peer0.org1.cello.com", 7051)]),
+            self.config([("peer1.org1.cello.com", 7051)]),
+            "mychannel",
+        )
+        read_org = update.read_set.groups["Application"].groups["Org1MSP"]
+        write_org = update.write_set.groups["Application"].groups["Org1MSP"]
+        # a modified value is written with a bumped version, its group is untouched
+        self.assertEqual(read_org, protos.ConfigGroup(version=0))
+        self.assertEqual(write_org.version, 0)
+        self.assertEqual(list(write_org.values), ["AnchorPeers"])
+        self.assertEqual(
+            write_org.values["AnchorPeers"],
+            self.anchor_peers([("peer1.org1.cello.com", 7051)], version=1),
+        )
+
+    def test_unchanged_config(self):
+        with self.assertRaises(ValueError):
+            protolator.compute_update(self.config(), self.config(), "mychannel")
+
+    def test_channel_config_round_trip(self):
+        block = self.config_block()
+        channel_config = ChannelConfig("mychannel", "orderer:7050", {}).load(block.SerializeToString())
+        channel_config.set_anchor_peers("Org1MSP", [("peer0.org1.cello.com", 7051)])
+        # decoding and encoding the config again touches nothing but the anchor peers
+        self.assertEqual(
+            protos.ConfigUpdate.FromString(channel_config.compute()),
+            protolator.compute_update(
+                self.config(), self.config([("peer0.org1.cello.com", 7051)]), "mychannel"
+            ),
+        )
+
+
+class PortReservationTest(TestCase):
+    def setUp(self):
+        self.agent = Agent.objects.create(name="agent")
+
+    def reserved(self):
+        return list(PortReservation.objects.filter(agent=self.agent).values_list("external", flat=True))
+
+    def test_reserve_available_ports(self):
+        ports = port_picker.get_available_ports(self.agent.id, 3)
+        self.assertEqual(ports, [7050, 7051, 7052])
+        self.assertEqual(self.reserved(), ports)
+        reservation = PortReservation.objects.get(agent=self.agent, external=7050)
+        self.assertAlmostEqual(
+            (reservation.expires_at - timezone.now()).total_seconds(),
+            port_picker.PORT_RESERVATION_TTL, delta=5,
+        )
+        self.agent.refresh_from_db()
+        self.assertEqual(len(self.agent.free_ports), port_picker.FREE_PORTS_BATCH - 3)
+        self.assertEqual(port_picker.get_available_ports(self.agent.id, 2), [7053, 7054])
+
+    def test_take_free_ports_in_one_statement(self):
+        Agent.objects.filter(id=self.agent.id).update(free_ports=list(range(7100, 7110)))
+        with self.assertNumQueries(1):
+            self.assertEqual(port_picker._take_free_ports(self.agent.id, 2), ([7100, 7101], 8))
+        self.assertEqual(self.reserved(), [7100, 7101])
+        # a shortage takes nothing
+        with self.assertNumQueries(1):
+            self.assertEqual(port_picker._take_free_ports(self.agent.id, 9), (None, 0))
+        self.agent.refresh_from_db()
+        self.assertEqual(self.agent.free_ports, list(range(7102, 7110)))
+
+    def test_unique_port_per_agent(self):
+        expires_at = timezone.now()
+        PortReservation.objects.create(agent=self.agent, external=7050, expires_at=expires_at)
+        PortReservation.objects.create(
+            agent=Agent.objects.create(name="other"), external=7050, expires_at=expires_at
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PortReservation.objects.create(agent=self.agent, external=7050, expires_at=expires_at)
+
+    def test_sweep_expired_reservations(self):
+        ports = port_picker.update_port_bitmap(self.agent.id, allocate=3)
+        node = Node.objects.create(name="peer0", type="peer", agent=self.agent)
+        # the first port got mapped to a node before its reservation expired
+        Port.objects.create(node=node, external=ports[0], internal=7051)
+        self.assertEqual(port_picker.sweep_reservations(), 0)
+
+        PortReservation.objects.filter(agent=self.agent).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(port_picker.sweep_reservations(), 2)
+        self.assertEqual(self.reserved(), [])
+        self.agent.refresh_from_db()
+        bitmap = port_picker._load_port_bitmap(self.agent)
+        self.assertEqual([bitmap.is_used(port) for port in ports], [True, False, False])
+
+    def test_expired_reservations_are_reused(self):
+        ports = port_picker.update_port_bitmap(self.agent.id, allocate=2)
+        PortReservation.objects.filter(agent=self.agent).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.agent.refresh_from_db()
+        self.agent.port_cursor = 0
+        self.agent.save(update_fields=["port_cursor"])
+        self.assertEqual(port_picker.update_port_bitmap(self.agent.id, allocate=2), ports)
+
+
+class PortAllocationConcurrencyTest(TransactionTestCase):
+    THREADS = 4
+    PORTS = 10
+
+    def test_concurrent_allocations_do_not_overlap(self):
+        agent = Agent.objects.create(name="agent")
+        results, errors = [], []
+        barrier = threading.Barrier(self.THREADS)
+
+        def allocate():
+            try:
+                barrier.wait()
+                results.append(port_picker.get_available_ports(agent.id, self.PORTS))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        ports = [port for result in results for port in result]
+        self.assertEqual(len(ports), self.THREADS * self.PORTS)
+        self.assertEqual(len(set(ports)), len(ports))
+        self.assertEqual(PortReservation.objects.filter(agent=agent).count(), len(ports))
+
+
+class StubSigner:
+    def __init__(self, env):
+        self.creator = env["CORE_PEER_LOCALMSPID"].encode()
+
+    def sign(self, data):
+        return hashlib.sha256(self.creator + data).digest()
+
+
+class StubOrderer:
+    def __init__(self, block):
+        self.block = block
+        self.broadcasts = []
+
+    def config_block(self, channel_id):
+        return self.block
+
+    def envelope(self, header_type, channel_id, data):
+        return protos.Envelope(payload=data, signature=b"submitter")
+
+    def broadcast(self, envelope):
+        self.broadcasts.append(envelope)
+
+
+class StubPool:
+    def __init__(self, block):
+        self.orderers = StubOrderer(block)
+
+    def orderer(self, env, address):
+        return self.orderers
+
+    def signer(self, env):
+        return StubSigner(env)
+
+
+class ChannelConfigTest(ConfigFixture, SimpleTestCase):
+    ORG1 = {"CORE_PEER_LOCALMSPID": "Org1MSP"}
+    ORG2 = {"CORE_PEER_LOCALMSPID": "Org2MSP"}
+
+    def setUp(self):
+        self.pool = StubPool(self.config_block())
+        self.channel_config = ChannelConfig("mychannel", "orderer:7050", self.ORG1, pool=self.pool).fetch()
+
+    def signers(self):
+        return [creator for creator, _ in self.channel_config._signatures]
+
+    def test_batched_mutations(self):
+        self.channel_config.set_all_anchor_peers({
+            "Org1MSP": [("peer0.org1.cello.com", 7051)],
+            "Org2MSP": [("peer0.org2.cello.com", 7051)],
+        })
+        with mock.patch.object(protolator, "compute_update", wraps=protolator.compute_update) as compute_update:
+            update = protos.ConfigUpdate.FromString(self.channel_config.compute())
+        compute_update.assert_called_once()
+        self.assertEqual(
+            sorted(update.write_set.groups["Application"].groups), ["Org1MSP", "Org2MSP"]
+        )
+        self.channel_config.sign(self.ORG2).submit()
+        # one transaction carries every mutation
+        self.assertEqual(len(self.pool.orderers.broadcasts), 1)
+        self.assertIsNone(self.channel_config.config)
+
+    def test_signatures_reset_on_change(self):
+        self.channel_config.set_anchor_peers("Org1MSP", [("peer0.org1.cello.com", 7051)])
+        self.channel_config.sign(self.ORG1, self.ORG2)
+        self.assertEqual(self.signers(), [b"Org1MSP", b"Org2MSP"])
+        # signatures are kept while the update is unchanged
+        self.channel_config.compute()
+        self.assertEqual(len(self.signers()), 2)
+        self.channel_config.set_anchor_peers("Org2MSP", [("peer0.org2.cello.com", 7051)])
+        self.channel_config.compute()
+        self.assertEqual(self.signers(), [])
+
+    def test_signers_deduplicated(self):
+        self.channel_config.set_anchor_peers("Org1MSP", [("peer0.org1.cello.com", 7051)])
+        self.channel_config.sign(self.ORG1, self.ORG1, self.ORG2)
+        self.channel_config.sign(self.ORG2)
+        self.assertEqual(self.signers(), [b"Org1MSP", b"Org2MSP"])
+
+    def test_envelope(self):
+        self.channel_config.set_anchor_peers("Org1MSP", [("peer0.org1.cello.com", 7051)])
+        update = self.channel_config.compute()
+        self.channel_config.sign(self.ORG2)
+        envelope = protos.Envelope.FromString(self.channel_config.envelope())
+        config_update_envelope = protos.ConfigUpdateEnvelope.FromString(envelope.payload)
+        self.assertEqual(config_update_envelope.config_update, update)
+        # the submitter signs as well, after the other organizations
+        creators = []
+        for signature in config_update_envelope.signatures:
+            header = protos.SignatureHeader.FromString(signature.signature_header)
+            creators.append(header.creator)
+            self.assertEqual(
+                signature.signature,
+                StubSigner({"CORE_PEER_LOCALMSPID": header.creator.decode()}).sign(
+                    signature.signature_header + update
+                ),
+            )
+        self.assertEqual(creators, [b"Org2MSP", b"Org1MSP"])
+
+    def test_errors(self):
+        channel_config = ChannelConfig("mychannel", "orderer:7050", self.ORG1, pool=self.pool)
+        with self.assertRaisesMessage(ValueError, "is not loaded"):
+            channel_config.set_anchor_peers("Org1MSP", [])
+        with self.assertRaisesMessage(ValueError, "is not a member"):
+            self.channel_config.set_anchor_peers("Org3MSP", [])
+
+
+class ArtifactCacheTest(SimpleTestCase):
+    CONFIGTX = """
+Profiles:
+  OrgsChannel:
+    Application:
+      Organizations:
+        - Name: Org1
+          MSPDir: {msp}
+  Other:
+    Application:
+      Organizations: []
+"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.msp = os.path.join(self.tmp, "msp")
+        self.write(os.path.join(self.msp, "signcerts", "cert.pem"), "cert")
+        self.write(os.path.join(self.tmp, "configtx.yaml"), self.CONFIGTX.format(msp=self.msp))
+        self.cache = os.path.join(self.tmp, "cache")
+        patcher = mock.patch.object(artifact_cache, "CONFIGTX_ARTIFACT_CACHE", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def write(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(data)
+
+    def key(self, profile="OrgsChannel", channel_id="mychannel"):
+        return artifact_cache.artifact_key("channeltx", self.tmp, profile, channel_id)
+
+    def test_key(self):
+        key = self.key()
+        self.assertEqual(self.key(), key)
+        self.assertNotEqual(self.key(channel_id="other"), key)
+        self.assertNotEqual(self.key(profile="Other"), key)
+        self.assertIsNone(self.key(profile="Missing"))
+        # content of referenced msp directories is part of the key
+        self.write(os.path.join(self.msp, "signcerts", "cert.pem"), "renewed")
+        self.assertNotEqual(self.key(), key)
+
+    def test_evict_least_recently_used(self):
+        output = os.path.join(self.tmp, "out", "channel.tx")
+        for i, key in enumerate(["a", "b", "c"]):
+            self.write(output, key)
+            artifact_cache.store(key, output)
+            os.utime(artifact_cache.cache_path(key), (1000 + i, 1000 + i))
+        # fetching a marks it as recently used
+        self.assertTrue(artifact_cache.fetch("a", output))
+        self.assertEqual(artifact_cache.evict(entries=2), 1)
+        self.assertEqual(sorted(os.listdir(self.cache)), ["a", "c"])
+        self.assertFalse(artifact_cache.fetch("b", output))
+        self.assertEqual(artifact_cache.evict(entries=2), 0)
+
+
+class ArtifactCollectTest(TestCase):
+    def test_collect_unreferenced(self):
+        genesis = Artifact.store(b"genesis")
+        msp = Artifact.store(b"msp")
+        orphan = Artifact.store(b"orphan")
+        Network.objects.create(name="net", genesisblock=genesis)
+        Node.objects.create(name="peer0", type="peer", msp=msp)
+
+        self.assertEqual(Artifact.collect(timezone.now() - timedelta(hours=1)), 0)
+        self.assertEqual(Artifact.collect(timezone.now() + timedelta(seconds=1)), 1)
+        self.assertEqual(
+            set(Artifact.objects.values_list("digest", flat=True)),
+            {genesis.digest, msp.digest},
+        )
+        self.assertFalse(Artifact.objects.filter(digest=orphan.digest).exists())
+
+    def test_reuse_spares_artifact(self):
+        artifact = Artifact.store(b"reused")
+        Artifact.objects.filter(digest=artifact.digest).update(
+            used_at=timezone.now() - timedelta(hours=2)
+        )
+        # stored again for a record which is not saved yet
+        self.assertEqual(Artifact.store(b"reused").digest, artifact.digest)
+        self.assertEqual(Artifact.collect(timezone.now() - timedelta(hours=1)), 0)
+        self.assertTrue(Artifact.objects.filter(digest=artifact.digest).exists())
+
+    def test_store_after_collect(self):
+        artifact = Artifact.store(b"collected")
+        Artifact.objects.filter(digest=artifact.digest).delete()
+        get_or_create = Artifact.objects.get_or_create
+        stale = [(artifact, False)]
+
+        def collected_after_get(**kwargs):
+            # the first lookup still sees the collected artifact
+            return stale.pop() if stale else get_or_create(**kwargs)
+
+        with mock.patch.object(Artifact.objects, "get_or_create", side_effect=collected_after_get):
+            Artifact.store(b"collected")
+        self.assertTrue(Artifact.objects.filter(digest=artifact.digest).exists())
+
+
+class ArtifactMigrationTest(TransactionTestCase):
+    migrate_from = [("api", "0002_ports_jobs_and_network_config")]
+    migrate_to = [("api", "0003_artifact_references")]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        if not executor.loader.migrated_apps.issuperset({"api"}):
+            self.skipTest("migrations of api are disabled")
+        executor.migrate(self.migrate_from)
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(
+            executor.loader.graph.leaf_nodes()
+        ))
+        apps = executor.loader.project_state(self.migrate_from).apps
+        Network = apps.get_model("api", "Network")
+        Node = apps.get_model("api", "Node")
+        block = base64.b64encode(b"genesis")
+        # older releases saved the repr of the encoded bytes
+        Network.objects.create(name="net", genesisblock=str(block))
+        Node.objects.create(
+            name="peer0", type="peer", msp=block.decode(), tls=block.decode(), config_file=None
+        )
+
+    def test_move_to_artifacts(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        digest = hashlib.sha256(b"genesis").hexdigest()
+        network = apps.get_model("api", "Network").objects.get(name="net")
+        node = apps.get_model("api", "Node").objects.get(name="peer0")
+        self.assertEqual(network.genesisblock_id, digest)
+        self.assertEqual(node.msp_id, digest)
+        self.assertEqual(node.tls_id, digest)
+        self.assertIsNone(node.config_file_id)
+        artifacts = apps.get_model("api", "Artifact").objects.all()
+        self.assertEqual([(a.digest, bytes(a.content)) for a in artifacts], [(digest, b"genesis")])
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        node = apps.get_model("api", "Node").objects.get(name="peer0")
+        self.assertEqual(base64.b64decode(node.msp), b"genesis")
+
+
+class ChaincodeJobNodeTest(TestCase):
+    def test_first_node_by_name(self):
+        org = Organization.objects.create(name="org1.cello.com")
+        Node.objects.create(name="peer1", type="peer", organization=org)
+        Node.objects.create(name="peer0", type="peer", organization=org)
+        self.assertEqual(_org_node(org, "peer").name, "peer0")
+        with self.assertRaisesMessage(Exception, "has no orderer node"):
+            _org_node(org, "orderer")
+
+
+class AgentJobTest(TestCase):
+    CREATE = AgentOperation.Create.value
+
+    def setUp(self):
+        org = Organization.objects.create(name="org1.cello.com")
+        self.user = UserProfile.objects.create(username="org1", role="admin", organization=org)
+        self.agent = Agent.objects.create(name="agent", organization=org)
+        self.node = Node.objects.create(name="peer0", type="peer", organization=org, agent=self.agent)
+        self.started = []
+        patcher = mock.patch.object(agent_tasks.run_agent_job, "delay")
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(agent_tasks.AGENT_OPERATIONS, {self.CREATE: self.start_node})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(agent_tasks, "AGENT_MAX_CONCURRENCY", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_node(self, node_id):
+        self.started.append(node_id)
+        if node_id == "fail":
+            raise Exception("agent unreachable")
+
+    def submit(self, agent=None, node=None):
+        job = agent_tasks.submit_agent_job((agent or self.agent).id, self.CREATE, (node or self.node).id)
+        self.delay.assert_called_with(str(job.id))
+        return job
+
+    def run_job(self, job):
+        result = agent_tasks.run_agent_job(str(job.id))
+        job.refresh_from_db()
+        return result
+
+    def test_run_job(self):
+        job = self.submit()
+        self.assertEqual(job.status, JobStatus.Pending.value)
+        self.assertTrue(self.run_job(job))
+        self.assertEqual(job.status, JobStatus.Success.value)
+        self.assertEqual(self.started, [str(self.node.id)])
+        self.assertLessEqual(job.started_at, job.finished_at)
+        # a job runs only once
+        self.assertFalse(self.run_job(job))
+        self.assertEqual(len(self.started), 1)
+
+    def test_failed_job(self):
+        job = self.submit()
+        with mock.patch.dict(agent_tasks.AGENT_OPERATIONS, {self.CREATE: lambda node_id: self.start_node("fail")}):
+            with self.assertLogs("api.tasks.agent", "ERROR"):
+                self.assertFalse(self.run_job(job))
+        self.assertEqual(job.status, JobStatus.Failed.value)
+        self.assertEqual(job.error, "agent unreachable")
+
+    def test_per_agent_limit(self):
+        running = self.submit()
+        AgentJob.objects.filter(id=running.id).update(
+            status=JobStatus.Running.value, started_at=timezone.now()
+        )
+        job = self.submit()
+        with self.assertRaises(Retry):
+            self.run_job(job)
+        self.assertEqual(job.status, JobStatus.Pending.value)
+
+        # other agents have their own slots
+        other = Agent.objects.create(name="other")
+        other_job = self.submit(other, Node.objects.create(name="peer1", type="peer", agent=other))
+        self.assertTrue(self.run_job(other_job))
+
+        # the worker of a job running past the time limit died
+        AgentJob.objects.filter(id=running.id).update(
+            started_at=timezone.now() - timedelta(seconds=agent_tasks.AGENT_JOB_TIME_LIMIT + 1)
+        )
+        self.assertTrue(self.run_job(job))
+
+    def test_jobs_of_node(self):
+        jobs = [self.submit() for _ in range(2)]
+        Node.objects.create(name="peer1", type="peer", agent=self.agent)
+        self.run_job(jobs[0])
+        request = APIRequestFactory().get("/nodes/{}/jobs".format(self.node.id))
+        force_authenticate(request, user=self.user)
+        response = NodeViewSet.as_view({"get": "jobs"})(request, pk=str(self.node.id))
+        self.assertEqual(response.status_code, 200)
+        data = response.data["data"]["data"]
+        self.assertEqual(
+            {(job["id"], job["status"]) for job in data},
+            {(str(jobs[0].id), JobStatus.Success.value), (str(jobs[1].id), JobStatus.Pending.value)},
+        )
+
+
+class ChaincodeJobTest(TestCase):
+    OPERATION = ChainCodeOperation.Install.value
+
+    def setUp(self):
+        self.org = Organization.objects.create(name="org1.cello.com")
+        self.calls = []
+        self.fail = {"second"}
+        patcher = mock.patch.object(chaincode_tasks.run_chaincode_job, "delay")
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(chaincode_tasks.STAGES, {self.OPERATION: (
+            ("first", lambda job, org, params: self.stage("first", params)),
+            ("second", lambda job, org, params: self.stage("second", params)),
+        )})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stage(self, name, params):
+        self.calls.append(name)
+        if name in self.fail:
+            raise Exception("{} failed.".format(name))
+        # a stage passes parameters on to later stages
+        return {"first_done": True} if name == "first" else None
+
+    def submit(self):
+        job = chaincode_tasks.submit_chaincode_job(self.OPERATION, self.org, chaincode_id="cc")
+        self.delay.assert_called_with(str(job.id))
+        self.assertEqual([stage["status"] for stage in job.stages], [JobStatus.Pending.value] * 2)
+        return job
+
+    def run_job(self, job):
+        result = chaincode_tasks.run_chaincode_job(str(job.id))
+        job.refresh_from_db()
+        return result
+
+    def test_stages_are_recorded(self):
+        self.fail = set()
+        job = self.submit()
+        self.assertTrue(self.run_job(job))
+        self.assertEqual(job.status, JobStatus.Success.value)
+        self.assertEqual(self.calls, ["first", "second"])
+        self.assertTrue(job.parameters["first_done"])
+        for stage in job.stages:
+            self.assertEqual(stage["status"], JobStatus.Success.value)
+            self.assertGreaterEqual(stage["duration"], 0)
+        # a job runs only once
+        self.assertFalse(self.run_job(job))
+
+    def test_failed_stage_and_resume(self):
+        job = self.submit()
+        with self.assertLogs("api.tasks.chaincode", "ERROR"):
+            self.assertFalse(self.run_job(job))
+        self.assertEqual(job.status, JobStatus.Failed.value)
+        self.assertEqual(job.error, "second failed.")
+        self.assertEqual(
+            [(stage["status"], stage["error"]) for stage in job.stages],
+            [(JobStatus.Success.value, ""), (JobStatus.Failed.value, "second failed.")],
+        )
+
+        self.fail = set()
+        self.assertTrue(chaincode_tasks.resume_chaincode_job(job))
+        self.assertTrue(self.run_job(job))
+        # stages which succeeded before are not run again
+        self.assertEqual(self.calls, ["first", "second", "second"])
+        self.assertEqual(job.status, JobStatus.Success.value)
+        self.assertEqual(job.stages[1]["error"], "")
+
+    def test_resume_running_job(self):
+        job = self.submit()
+        ChainCodeJob.objects.filter(id=job.id).update(status=JobStatus.Running.value)
+        self.assertFalse(chaincode_tasks.resume_chaincode_job(job))
+        # the worker of a job running past the time limit died
+        ChainCodeJob.objects.filter(id=job.id).update(
+            updated_at=timezone.now() - timedelta(seconds=chaincode_tasks.CHAINCODE_JOB_TIME_LIMIT + 1)
+        )
+        self.assertTrue(chaincode_tasks.resume_chaincode_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.Pending.value)
+        self.assertFalse(chaincode_tasks.resume_chaincode_job(job))
+
+
+class ChaincodeInstallTest(TestCase):
+    PACKAGE_ID = "mycc_1.0:abc"
+
+    def setUp(self):
+        self.org = Organization.objects.create(name="org1.cello.com")
+        for name in ("peer2", "peer0", "peer1"):
+            Node.objects.create(name=name, type="peer", organization=self.org)
+        self.chaincode = ChainCode.objects.create(
+            name="mycc", version="1.0", creator=self.org.name, language="golang",
+            md5="", digest="d1", package_id=self.PACKAGE_ID,
+        )
+        self.job = ChainCodeJob(operation=ChainCodeOperation.Install.value, organization=self.org)
+        self.installs = []
+        for target, value in (("PeerChainCode", self.peer_cli), ("package_path", lambda cc: "/tmp/mycc.tar.gz")):
+            patcher = mock.patch.object(chaincode_tasks, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def peer_cli(self, version, **envs):
+        peer = envs["CORE_PEER_ADDRESS"].split(".", 1)[0]
+        cli = mock.Mock()
+        # peer0 has the package already, peer2 fails to install it
+        installed = [{"package_id": self.PACKAGE_ID}] if peer == "peer0" else [{"package_id": "other:1"}]
+        cli.lifecycle_query_installed.return_value = (0, {"installed_chaincodes": installed})
+
+        def install(cc_targz):
+            self.installs.append((peer, cc_targz))
+            return 1 if peer == "peer2" else 0
+
+        cli.lifecycle_install.side_effect = install
+        return cli
+
+    def install(self, **params):
+        chaincode_tasks._install(self.job, self.org, dict(chaincode_id=str(self.chaincode.id), **params))
+        return self.job.result
+
+    def test_fan_out(self):
+        with self.assertRaisesMessage(Exception, "install chaincode failed on peer2: install chaincode failed."):
+            self.install()
+        result = self.job.result
+        self.assertEqual(result["package_id"], self.PACKAGE_ID)
+        # results are ordered by peer name, each with its own timing
+        self.assertEqual(
+            [(r["name"], r["installed"], r["skipped"]) for r in result["peers"]],
+            [("peer0", True, True), ("peer1", True, False), ("peer2", False, False)],
+        )
+        for r in result["peers"]:
+            self.assertGreaterEqual(r["duration"], 0)
+        self.assertEqual(sorted(self.installs), [("peer1", "/tmp/mycc.tar.gz"), ("peer2", "/tmp/mycc.tar.gz")])
+
+    def test_selected_peers(self):
+        peers = Node.objects.filter(name__in=["peer0", "peer1"]).values_list("id", flat=True)
+        result = self.install(peers=[str(peer) for peer in peers])
+        self.assertEqual([r["name"] for r in result["peers"]], ["peer0", "peer1"])
+        self.assertEqual(self.installs, [("peer1", "/tmp/mycc.tar.gz")])
+
+    def test_not_packaged(self):
+        with mock.patch.object(chaincode_tasks, "package_path", return_value=None):
+            with self.assertRaisesMessage(Exception, "is not packaged"):
+                self.install()
+
+
+class ChaincodePackageCacheTest(TestCase):
+    ARCHIVE = b"PK\x05\x06" + b"\0" * 18
+
+    def setUp(self):
+        org = Organization.objects.create(name="org1.cello.com")
+        self.user = UserProfile.objects.create(username="org1", role="admin", organization=org)
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        for patcher in (
+            mock.patch.object(chaincode_views, "FABRIC_CHAINCODE_STORE", store.name),
+            mock.patch.object(package_cache, "CHAINCODE_PACKAGE_CACHE", os.path.join(store.name, "packages")),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(chaincode_views, "submit_chaincode_job")
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self):
+        request = APIRequestFactory().post("/chaincodes/package", {
+            "name": "mycc", "version": "1.0", "language": "golang",
+            "md5": hashlib.md5(self.ARCHIVE).hexdigest(),
+            "file": SimpleUploadedFile("mycc.zip", self.ARCHIVE),
+        }, format="multipart")
+        force_authenticate(request, user=self.user)
+        return chaincode_views.ChainCodeViewSet.as_view({"post": "package"})(request)
+
+    def test_repeat_upload_is_served_from_cache(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        params = self.submit.call_args[1]
+        # the package stage of the worker publishes the package
+        os.makedirs(package_cache.CHAINCODE_PACKAGE_CACHE)
+        with open(package_cache.cache_path(params["digest"]), "wb") as f:
+            f.write(b"package")
+        expected = package_cache.package_id("mycc_1.0", package_cache.cache_path(params["digest"]))
+
+        chaincode_ids = set()
+        for _ in range(2):
+            response = self.upload()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["data"]["package_id"], expected)
+            chaincode_ids.add(str(response.data["data"]["chaincode_id"]))
+        self.assertEqual(len(chaincode_ids), 1)
+        self.assertEqual(self.submit.call_count, 1)
+
+
+class NodeListQueryTest(TestCase):
+    # count, page of nodes, ports of page
+    LIST_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        network = Network.objects.create(name="net")
+        cls.organization = Organization.objects.create(name="org1.cello.com", network=network)
+        cls.user = UserProfile.objects.create(
+            username="admin", role="admin", organization=cls.organization
+        )
+        agents = [
+            Agent.objects.create(name="agent{}".format(i), organization=cls.organization)
+            for i in range(3)
+        ]
+        nodes = Node.objects.bulk_create([
+            Node(name="peer{}".format(i), type="peer", organization=cls.organization,
+                 agent=agents[i % len(agents)])
+            for i in range(100)
+        ])
+        Port.objects.bulk_create([
+            Port(node=node, external=7100 + 2 * i + j, internal=7051 + j)
+            for i, node in enumerate(nodes) for j in range(2)
+        ])
+
+    def list_nodes(self, per_page):
+        request = APIRequestFactory().get("/nodes", {"page": 1, "per_page": per_page})
+        force_authenticate(request, user=self.user)
+        response = NodeViewSet.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"]["data"]
+
+    def test_queries_per_page_are_constant(self):
+        with self.assertNumQueries(self.LIST_QUERIES):
+            nodes = self.list_nodes(10)
+        self.assertEqual(len(nodes), 10)
+        with self.assertNumQueries(self.LIST_QUERIES):
+            nodes = self.list_nodes(100)
+        self.assertEqual(len(nodes), 100)
+        self.assertEqual(len(nodes[0]["ports"]), 2)
+
+
+class GatewayStubServerTest(SimpleTestCase):
+    """Pooled clients against a local grpc server standing in for peer and orderer."""
+
+    CHAIN_HEIGHT = 5
+    CONFIG_BLOCK = 2
+
+    def setUp(self):
+        msp = tempfile.TemporaryDirectory()
+        self.addCleanup(msp.cleanup)
+        key = ec.generate_private_key(ec.SECP256R1(), default_backend())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Admin@org1.cello.com")])
+        cert = x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(
+            key.public_key()
+        ).serial_number(1).not_valid_before(datetime.utcnow()).not_valid_after(
+            datetime.utcnow() + timedelta(days=1)
+        ).sign(key, hashes.SHA256(), default_backend())
+        for sub, data in (
+            ("signcerts", cert.public_bytes(serialization.Encoding.PEM)),
+            ("keystore", key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )),
+        ):
+            os.makedirs(os.path.join(msp.name, sub))
+            with open(os.path.join(msp.name, sub, "cert.pem"), "wb") as f:
+                f.write(data)
+        self.public_key = key.public_key()
+
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+        self.server.add_generic_rpc_handlers((
+            grpc.method_handlers_generic_handler("protos.Endorser", {
+                "ProcessProposal": grpc.unary_unary_rpc_method_handler(
+                    self.process_proposal,
+                    request_deserializer=protos.SignedProposal.FromString,
+                    response_serializer=protos.ProposalResponse.SerializeToString,
+                ),
+            }),
+            grpc.method_handlers_generic_handler("orderer.AtomicBroadcast", {
+                "Deliver": grpc.stream_stream_rpc_method_handler(
+                    self.deliver,
+                    request_deserializer=protos.Envelope.FromString,
+                    response_serializer=protos.DeliverResponse.SerializeToString,
+                ),
+            }),
+        ))
+        port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+        self.addCleanup(self.server.stop, None)
+
+        self.pool = GatewayPool()
+        self.addCleanup(self.pool.close)
+        self.address = "127.0.0.1:{}".format(port)
+        self.env = {
+            "CORE_PEER_ADDRESS": self.address,
+            "CORE_PEER_TLS_ENABLED": "false",
+            "CORE_PEER_LOCALMSPID": "Org1MSP",
+            "CORE_PEER_MSPCONFIGPATH": msp.name,
+        }
+
+    def process_proposal(self, signed, context):
+        # raises on a bad signature, which fails the call
+        self.public_key.verify(
+            signed.signature, signed.proposal_bytes, ec.ECDSA(hashes.SHA256())
+        )
+        proposal = protos.Proposal.FromString(signed.proposal_bytes)
+        spec = protos.ChaincodeInvocationSpec.FromString(
+            protos.ChaincodeProposalPayload.FromString(proposal.payload).input
+        ).chaincode_spec
+        args = list(spec.input.args)
+        if args[0] == b"GetChainInfo":
+            payload = protos.BlockchainInfo(
+                height=self.CHAIN_HEIGHT, currentBlockHash=b"current",
+            )
+        elif args[0] == b"QueryChaincodeDefinition":
+            payload = protos.QueryChaincodeDefinitionResult(
+                sequence=3, version="1.0", approvals={"Org1MSP": True},
+                collections=protos.CollectionConfigPackage(config=[protos.CollectionConfig(
+                    static_collection_config=protos.StaticCollectionConfig(
+                        name="private", required_peer_count=1, maximum_peer_count=2, block_to_live=100,
+                        member_orgs_policy=protos.CollectionPolicyConfig(
+                            signature_policy=protos.SignaturePolicyEnvelope(
+                                rule=protos.SignaturePolicy(signed_by=0),
+                            ),
+                        ),
+                        endorsement_policy=protos.ApplicationPolicy(
+                            channel_config_policy_reference="/Channel/Application/Endorsement",
+                        ),
+                    ),
+                )]),
+            )
+        else:
+            return protos.ProposalResponse(
+                response=protos.Response(status=500, message="unknown function")
+            )
+        return protos.ProposalResponse(
+            response=protos.Response(status=200, payload=payload.SerializeToString())
+        )
+
+    def block(self, number):
+        metadata = [b""] * 3
+        metadata[protos.BLOCK_METADATA_SIGNATURES] = protos.Metadata(
+            value=protos.OrdererBlockMetadata(
+                last_config=protos.LastConfig(index=self.CONFIG_BLOCK)
+            ).SerializeToString()
+        ).SerializeToString()
+        return protos.Block(
+            header=protos.BlockHeader(number=number),
+            metadata=protos.BlockMetadata(metadata=metadata),
+        )
+
+    def deliver(self, envelopes, context):
+        for envelope in envelopes:
+            payload = protos.Payload.FromString(envelope.payload)
+            start = protos.SeekInfo.FromString(payload.data).start
+            if start.WhichOneof("Type") == "newest":
+                number = self.CHAIN_HEIGHT - 1
+            else:
+                number = start.specified.number
+            yield protos.DeliverResponse(block=self.block(number))
+            yield protos.DeliverResponse(status=protos.STATUS_SUCCESS)
+
+    def test_chain_info(self):
+        info = self.pool.client(self.env).chain_info("mychannel")
+        self.assertEqual(info, {
+            "height": self.CHAIN_HEIGHT,
+            "currentBlockHash": "Y3VycmVudA==",
+            "previousBlockHash": "",
+        })
+
+    def test_query_committed(self):
+        definition = self.pool.client(self.env).query_committed("mychannel", "mycc")
+        self.assertEqual(definition["sequence"], 3)
+        self.assertEqual(definition["version"], "1.0")
+        self.assertEqual(definition["approvals"], {"Org1MSP": True})
+        self.assertIs(definition["init_required"], False)
+        collection = definition["collections"]["config"][0]["static_collection_config"]
+        self.assertEqual(collection["name"], "private")
+        self.assertEqual(collection["block_to_live"], 100)
+        self.assertEqual(
+            collection["endorsement_policy"],
+            {"channel_config_policy_reference": "/Channel/Application/Endorsement"},
+        )
+
+    def test_error_status(self):
+        with self.assertRaisesMessage(GatewayError, "unknown function"):
+            self.pool.client(self.env).evaluate("mychannel", "mycc", ["invoke"])
+
+    def test_channel_is_pooled(self):
+        for _ in range(3):
+            self.pool.client(self.env).chain_info("mychannel")
+        self.assertEqual(len(self.pool._channels), 1)
+
+    def test_config_block(self):
+        orderer = self.pool.orderer(self.env, self.address)
+        self.assertEqual(orderer.block("mychannel").header.number, self.CHAIN_HEIGHT - 1)
+        self.assertEqual(orderer.config_block("mychannel").header.number, self.CONFIG_BLOCK)
+
+
+class IdentityPoolTest(SimpleTestCase):
+    ORG = "org1.cello.com"
+    CRYPTO_CONFIG = """
+PeerOrgs:
+  - Name: org1
+    Domain: org1.cello.com
+    EnableNodeOUs: true
+    Specs:
+      - Hostname: peer0
+"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.home = tmp.name
+        os.makedirs(os.path.join(self.home, self.ORG))
+        with open(os.path.join(self.home, self.ORG, "crypto-config.yaml"), "w") as f:
+            f.write(self.CRYPTO_CONFIG)
+
+    def pool(self):
+        return IdentityPool(self.ORG, "peer", filepath=self.home)
+
+    def generate(self):
+        PkiGen(self.ORG, filepath=self.home).generate()
+
+    def test_fill_after_generate(self):
+        # no CA of organization yet
+        self.assertEqual(self.pool().fill(size=2), 0)
+        self.generate()
+        pool = self.pool()
+        self.assertEqual(pool.fill(size=2), 2)
+        self.assertEqual(pool.size(), 2)
+        self.assertEqual(pool.fill(size=2), 0)
+
+    def test_fill_in_progress(self):
+        self.generate()
+        pool = self.pool()
+        os.makedirs(pool.pool_dir)
+        with open(os.path.join(pool.pool_dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.assertEqual(pool.fill(size=2), 0)
+        self.assertEqual(pool.size(), 0)
+
+    def test_claim(self):
+        self.generate()
+        pool = self.pool()
+        pool.fill(size=1)
+        self.assertFalse(pool.claim("peer0"))
+        self.assertTrue(pool.claim("peer1"))
+        self.assertEqual(pool.size(), 0)
+        self.assertFalse(pool.claim("peer2"))
+
+        node_dir = os.path.join(pool.org_dir, "peers", "peer1.{}".format(self.ORG))
+        with open(os.path.join(node_dir, "msp", "signcerts", "peer1.{}-cert.pem".format(self.ORG)), "rb") as f:
+            cert = x509.load_pem_x509_certificate(f.read(), default_backend())
+        with open(os.path.join(pool.org_dir, "ca", "ca.{}-cert.pem".format(self.ORG)), "rb") as f:
+            ca = x509.load_pem_x509_certificate(f.read(), default_backend())
+        self.assertEqual(cert.issuer, ca.subject)
+        # certificate is issued for the key prepared in pool
+        with open(os.path.join(node_dir, "msp", "keystore", "priv_sk"), "rb") as f:
+            key = serialization.load_pem_private_key(f.read(), None, default_backend())
+        self.assertEqual(
+            cert.public_key().public_numbers(), key.public_key().public_numbers()
+        )
+        with open(os.path.join(node_dir, "tls", "server.crt"), "rb") as f:
+            tls = x509.load_pem_x509_certificate(f.read(), default_backend())
+        sans = tls.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        self.assertIn("peer1.{}".format(self.ORG), sans.get_values_for_type(x509.DNSName))
+
+    def test_concurrent_claims(self):
+        self.generate()
+        self.pool().fill(size=3)
+        names = ["peer{}".format(i) for i in range(1, 7)]
+        barrier = threading.Barrier(len(names))
+
+        def claim(name):
+            pool = self.pool()
+            barrier.wait()
+            return pool.claim(name)
+
+        with futures.ThreadPoolExecutor(max_workers=len(names)) as executor:
+            claimed = list(executor.map(claim, names))
+        # each prepared identity goes to exactly one node
+        self.assertEqual(claimed.count(True), 3)
+        self.assertEqual(self.pool().size(), 0)
+        peers = os.listdir(os.path.join(self.pool().org_dir, "peers"))
+        self.assertEqual(len(peers), 1 + 3)
+
+    def test_low_water_triggers_refill(self):
+        self.generate()
+        self.pool().fill(size=3)
+        with mock.patch.object(node_views, "IdentityPool", lambda org, type: IdentityPool(org, type, filepath=self.home)), \
+                mock.patch.object(node_views, "CryptoGen") as crypto_gen, \
+                mock.patch.object(node_views.refill_identity_pool, "delay") as delay, \
+                mock.patch.object(node_views, "IDENTITY_POOL_LOW_WATER", 2):
+            self.assertEqual(NodeViewSet._issue_identities(self.ORG, "peer", ["peer1"]), ["peer1"])
+            delay.assert_not_called()
+            crypto_gen.assert_not_called()
+
+            # pool runs dry, cryptogen issues the rest
+            self.assertEqual(NodeViewSet._issue_identities(self.ORG, "peer", ["peer2", "peer3", "peer4"]), ["peer2", "peer3"])
+            crypto_gen.return_value.extend.assert_called_once_with()
+            delay.assert_called_once_with(self.ORG, "peer")
+
+
+class RunnerTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(runner, "histogram", runner.LatencyHistogram(buckets=(1, 10)))
+        self.histogram = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_operation_name(self):
+        self.assertEqual(
+            runner.operation_name(["/usr/bin/peer", "lifecycle", "chaincode", "install", "mycc.tar.gz"]),
+            "peer lifecycle chaincode install",
+        )
+        # values in place of subcommands are not part of the name
+        self.assertEqual(runner.operation_name(["peer", "channel", "mychannel", "join"]), "peer channel")
+        self.assertEqual(runner.operation_name(["peer", "version", "extra"]), "peer version")
+        self.assertEqual(runner.operation_name(["configtxgen", "-profile", "OrgsChannel"]), "configtxgen")
+        self.assertEqual(runner.operation_name(["configtxlator", "proto_decode", "--type", "common.Block"]), "configtxlator proto_decode")
+        self.assertEqual(runner.operation_name(["sh", "-c", "exit 1"]), "sh")
+
+    def test_run(self):
+        with self.assertLogs("api.lib.runner", "WARNING"):
+            result = runner.run(["sh", "-c", "cat; echo err >&2; exit 3"], input=b"out")
+        self.assertEqual((result.returncode, result.stdout, result.stderr), (3, b"out", b"err\n"))
+        self.assertFalse(result.truncated)
+        series = self.histogram.snapshot()["sh"]
+        self.assertEqual((series["count"], series["failed"]), (1, 1))
+        self.assertEqual(series["buckets"], {"1": 1, "10": 0, "+Inf": 0})
+
+    def test_output_cap(self):
+        result = runner.run(["sh", "-c", "head -c 100000 /dev/zero"], max_output=1000)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, b"\0" * 1000)
+        self.assertTrue(result.truncated)
+
+    def test_deadline_kill(self):
+        start = time.monotonic()
+        with self.assertRaisesMessage(runner.CommandTimeout, "sleep timed out after 0.2s"):
+            runner.run(["sleep", "30"], timeout=0.2)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(self.histogram.snapshot()["sleep"]["failed"], 1)
+
+    def test_run_async(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        result = loop.run_until_complete(runner.run_async(
+            ["sh", "-c", "cat; head -c 5000 /dev/zero"], input=b"in", max_output=10,
+            operation="zeros",
+        ))
+        self.assertEqual((result.returncode, result.stdout), (0, b"in" + b"\0" * 8))
+        self.assertTrue(result.truncated)
+        with self.assertRaises(runner.CommandTimeout):
+            loop.run_until_complete(runner.run_async(["sleep", "30"], timeout=0.2))
+        snapshot = self.histogram.snapshot()
+        self.assertEqual(snapshot["zeros"]["count"], 1)
+        self.assertEqual(snapshot["sleep"]["failed"], 1)
+
+
+class ChannelAnchorsTest(TestCase):
+    def setUp(self):
+        network = Network.objects.create(name="net")
+        self.org1 = Organization.objects.create(name="org1.cello.com", network=network)
+        self.org2 = Organization.objects.create(name="org2.cello.com", network=network)
+        self.user = UserProfile.objects.create(username="org1", role="admin", organization=self.org1)
+        self.orderer = Node.objects.create(name="orderer0", type="orderer", organization=self.org2)
+        self.peers = [
+            Node.objects.create(name="peer0", type="peer", organization=org) for org in (self.org1, self.org2)
+        ]
+        Port.objects.bulk_create(
+            [Port(node=self.orderer, internal=7050, external=7300)]
+            + [Port(node=peer, internal=7053, external=7201 + 2 * i) for i, peer in enumerate(self.peers)]
+            + [Port(node=peer, internal=7051, external=7200 + 2 * i) for i, peer in enumerate(self.peers)]
+        )
+        self.channel = Channel.objects.create(name="mychannel", network=network)
+        self.channel.orderers.add(self.orderer)
+
+    def test_node_address(self):
+        self.assertEqual(channel_views.node_address(self.peers[1]), ("peer0.org2.cello.com", 7051))
+        # orderers are issued under the domain of their organization
+        self.assertEqual(channel_views.node_address(self.orderer), ("orderer0.cello.com", 7050))
+        unmapped = Node.objects.create(name="peer1", type="peer", organization=self.org1)
+        with self.assertRaisesMessage(Exception, "node peer1 has no port mapped"):
+            channel_views.node_address(unmapped)
+
+    def test_anchors(self):
+        request = APIRequestFactory().post(
+            "/channels/{}/anchors".format(self.channel.id),
+            {"peers": [str(peer.id) for peer in self.peers]}, format="json",
+        )
+        # as authentication loads it, ids of organization are uuids
+        force_authenticate(request, user=UserProfile.objects.get(pk=self.user.pk))
+        with mock.patch.object(channel_views, "ChannelConfig") as channel_config:
+            response = channel_views.ChannelViewSet.as_view({"post": "anchors"})(request, pk=self.channel.id)
+        self.assertEqual(response.status_code, 200, response.data)
+        channel_id, orderer_url, env = channel_config.call_args[0]
+        self.assertEqual((channel_id, orderer_url), ("mychannel", "orderer0.cello.com:7050"))
+        self.assertEqual(env["CORE_PEER_LOCALMSPID"], "Org1.cello.comMSP")
+        channel_config.return_value.fetch.return_value.set_all_anchor_peers.assert_called_once_with({
+            "Org1.cello.comMSP": [("peer0.org1.cello.com", 7051)],
+            "Org2.cello.comMSP": [("peer0.org2.cello.com", 7051)],
+        })
+
+
+class ConfigTXFixture:
+    TEMPLATE = {
+        "Capabilities": {"Channel": {"V2_0": True}, "Orderer": {"V2_0": True}, "Application": {"V2_0": True}},
+        "Application": {"Policies": {}},
+        "Orderer": {"OrdererType": "etcdraft", "BatchTimeout": "2s"},
+        "Channel": {"Policies": {}},
+    }
+    ORDERERS = [{"name": "org0.cello.com", "hosts": [{"name": "orderer0"}]}]
+    PEERS = [{"name": "org1.cello.com"}, {"name": "org2.cello.com"}]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.home = tmp.name
+        self.template = os.path.join(self.home, "template.yaml")
+        with open(self.template, "w") as f:
+            dump_yaml(self.TEMPLATE, f)
+
+    def configtx(self, network="net"):
+        return ConfigTX(network, filepath=self.home, template_path=self.template)
+
+    def create(self, network="net", peers=None):
+        self.configtx(network).create(consensus="etcdraft", orderers=self.ORDERERS, peers=peers or self.PEERS)
+
+    def read(self, *names):
+        with open(os.path.join(self.home, *names)) as f:
+            return load_yaml(f)
+
+
+class ConfigTXTest(ConfigTXFixture, TestCase):
+    def test_create(self):
+        self.create()
+        config = NetworkConfig.objects.get(network="net")
+        self.assertEqual(config.emitted_generation, config.generation)
+        self.assertEqual(
+            sorted(config.organizations.values_list("msp_id", "type")),
+            [("Org0.cello.comOrdererMSP", "orderer"), ("Org1.cello.comMSP", "peer"), ("Org2.cello.comMSP", "peer")],
+        )
+        configtx = self.read("net", "configtx.yaml")
+        self.assertEqual(configtx["Orderer"]["Addresses"], ["orderer0.cello.com:7050"])
+        self.assertEqual(
+            [c["Host"] for c in configtx["Orderer"]["EtcdRaft"]["Consenters"]], ["orderer0.cello.com"]
+        )
+        genesis = configtx["Profiles"]["TwoOrgsOrdererGenesis"]
+        self.assertEqual([o["ID"] for o in genesis["Orderer"]["Organizations"]], ["Org0.cello.comOrdererMSP"])
+        self.assertEqual(
+            [o["ID"] for o in genesis["Consortiums"]["SampleConsortium"]["Organizations"]],
+            ["Org1.cello.comMSP", "Org2.cello.comMSP"],
+        )
+
+        # organizations left out of a new create are removed
+        self.create(peers=self.PEERS[:1])
+        self.assertFalse(config.organizations.filter(msp_id="Org2.cello.comMSP").exists())
+
+    def test_create_channel(self):
+        self.create()
+        self.configtx().createChannel("mychannel", ["org1.cello.com"])
+        path = config_path("net", "mychannel", filepath=self.home)
+        self.assertEqual(path, os.path.join(self.home, "net", "profiles", "mychannel") + "/")
+        channel = self.read(path, "configtx.yaml")
+        self.assertEqual([o["ID"] for o in channel["Organizations"]], ["Org1.cello.comMSP"])
+        self.assertEqual(
+            [o["ID"] for o in channel["Profiles"]["mychannel"]["Application"]["Organizations"]],
+            ["Org1.cello.comMSP"],
+        )
+        self.assertEqual(config_path("net", "missing", filepath=self.home), os.path.join(self.home, "net") + "/")
+        with self.assertRaisesMessage(Exception, "can't find organnization"):
+            self.configtx().createChannel("other", ["org3.cello.com"])
+
+    def test_emit_by_generation(self):
+        self.create()
+        self.configtx().createChannel("mychannel", ["org1.cello.com"])
+        with mock.patch.object(configtx, "_write", wraps=configtx._write) as write:
+            # only the file of the new profile is written
+            self.configtx().createChannel("other", ["org2.cello.com"])
+            self.assertEqual([c[0][0] for c in write.call_args_list], [
+                os.path.join(self.home, "net", "profiles", "other", "configtx.yaml"),
+            ])
+            write.reset_mock()
+            # organizations changed, every file is stale
+            self.create()
+            self.assertEqual(sorted(c[0][0] for c in write.call_args_list), [
+                os.path.join(self.home, "net", "configtx.yaml"),
+                os.path.join(self.home, "net", "profiles", "mychannel", "configtx.yaml"),
+                os.path.join(self.home, "net", "profiles", "other", "configtx.yaml"),
+            ])
+
+    def test_import_legacy(self):
+        os.makedirs(os.path.join(self.home, "net"))
+        legacy = dict(
+            Organizations=[
+                dict(Name="Org0Orderer", ID="Org0MSP", MSPDir="/msp0", OrdererEndpoints=["orderer0.cello.com:7050"]),
+                dict(Name="Org1", ID="Org1MSP", MSPDir="/msp1", Policies={"Readers": {}}),
+            ],
+            Orderer=dict(self.TEMPLATE["Orderer"], EtcdRaft={"Consenters": [
+                dict(Host="orderer0.cello.com", Port=7050, ClientTLSCert="/tls", ServerTLSCert="/tls"),
+            ]}),
+            **{k: self.TEMPLATE[k] for k in ("Capabilities", "Application", "Channel")},
+            Profiles={
+                "TwoOrgsOrdererGenesis": {
+                    "Orderer": {"Organizations": [{"ID": "Org0MSP"}]},
+                    "Consortiums": {"SampleConsortium": {"Organizations": [{"ID": "Org1MSP"}]}},
+                },
+                "oldchannel": {"Consortium": "SampleConsortium", "Application": {"Organizations": [{"ID": "Org1MSP"}]}},
+            },
+        )
+        with open(os.path.join(self.home, "net", "configtx.yaml"), "w") as f:
+            dump_yaml(legacy, f)
+
+        with mock.patch.object(configtx, "_write", wraps=configtx._write) as write:
+            self.configtx().createChannel("mychannel", ["Org1"])
+        # the imported configtx.yaml is current, only the new profile is written
+        self.assertEqual(write.call_count, 1)
+        config = NetworkConfig.objects.get(network="net")
+        orderer = config.organizations.get(msp_id="Org0MSP")
+        self.assertEqual(orderer.type, ConfigTxOrgType.Orderer.value)
+        self.assertEqual(list(orderer.consenters.values_list("host", "port")), [("orderer0.cello.com", 7050)])
+        self.assertEqual(config.organizations.get(msp_id="Org1MSP").policies, {"Readers": {}})
+        self.assertEqual(
+            dict(config.profiles.values_list("name", "type")),
+            {"TwoOrgsOrdererGenesis": "genesis", "oldchannel": "channel", "mychannel": "channel"},
+        )
+        self.assertEqual(
+            list(config.profiles.get(name="TwoOrgsOrdererGenesis").organizations.order_by("msp_id").values_list("msp_id", flat=True)),
+            ["Org0MSP", "Org1MSP"],
+        )
+
+
+class ConfigTXLockTest(ConfigTXFixture, TransactionTestCase):
+    def test_concurrent_create(self):
+        workers = 4
+        barrier = threading.Barrier(workers)
+
+        def create(_):
+            try:
+                barrier.wait()
+                self.create()
+            finally:
+                connection.close()
+
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(create, range(workers)))
+        # creates of one network are serialized, none is lost
+        config = NetworkConfig.objects.get(network="net")
+        self.assertEqual(config.generation, 1 + workers)
+        self.assertEqual(config.emitted_generation, config.generation)
+        self.assertEqual(config.organizations.count(), 3)
+
+
+class JoinPeersTest(SimpleTestCase):
+    def setUp(self):
+        self.peers = [mock.Mock(id=i, spec=["id", "name"]) for i in range(4)]
+        for peer in self.peers:
+            peer.name = "peer{}".format(peer.id)
+        patcher = mock.patch.object(channel_views, "PeerChannel", self.peer_channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def peer_channel(version, **envs):
+        cli = mock.Mock()
+
+        def join(block_file):
+            # later peers finish first
+            time.sleep(0.01 * (4 - envs["index"]))
+            if envs["index"] == 1:
+                raise Exception("connection refused")
+            return envs["returncode"]
+
+        cli.join.side_effect = join
+        return cli
+
+    def join(self, returncodes):
+        targets = [
+            (peer, {"index": peer.id, "returncode": code}) for peer, code in zip(self.peers, returncodes)
+        ]
+        with self.assertLogs("api.routes.channel.views", "WARNING"):
+            return channel_views.join_peers(targets, "/tmp/mychannel.block", workers=4)
+
+    def test_partial_failure(self):
+        results = self.join([0, 0, 1, 0])
+        # results keep the order of peers, not of completion
+        self.assertEqual([r["name"] for r in results], ["peer0", "peer1", "peer2", "peer3"])
+        self.assertEqual([r["joined"] for r in results], [True, False, False, True])
+        self.assertEqual(results[1]["error"], "connection refused")
+        self.assertEqual(results[2]["error"], "peer channel join exited 1")
+        self.assertTrue(all(r["duration"] >= 0 for r in results))
+
+        channel_views.check_joined("mychannel", results, policy="any")
+        with self.assertRaisesMessage(Exception, "join channel mychannel failed: peer1: connection refused, peer2:"):
+            channel_views.check_joined("mychannel", results, policy="all")
+
+    def test_all_failed(self):
+        results = self.join([2, 0, 2, 2])
+        self.assertFalse(any(r["joined"] for r in results))
+        with self.assertRaisesMessage(Exception, "join channel mychannel failed"):
+            channel_views.check_joined("mychannel", results, policy="any")
+
+    def test_no_peers(self):
+        self.assertEqual(channel_views.join_peers([], "/tmp/mychannel.block"), [])
+
+    def test_invalid_policy(self):
+        self.addCleanup(importlib.reload, channel_views)
+        with mock.patch.dict(os.environ, {"CHANNEL_JOIN_POLICY": "most"}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "CHANNEL_JOIN_POLICY must be any or all, got 'most'"):
+                importlib.reload(channel_views)
@@ -8,7 +8,7 @@ from rest_framework.exceptions import ValidationError, ParseError
 from api.common.enums import ErrorCode
 from rest_framework import status
 from rest_framework.exceptions import ErrorDetail
-from .common import zip_dir, zip_file
+from .common import zip_dir, zip_file, pack_dir, pack_file
 from api.common import ok, err
 
 LOG = logging.getLogger(__name__)
@@ -0,0 +1,167 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from api.config import CELLO_HOME
+from api.utils.template import load_yaml
+
+LOG = logging.getLogger(__name__)
+
+# genesis blocks and channel txs shared by every network, one file per key
+CONFIGTX_ARTIFACT_CACHE = os.getenv(
+    "CONFIGTX_ARTIFACT_CACHE", os.path.join(CELLO_HOME, ".artifact-cache")
+)
+# artifacts kept on disk, least recently used are evicted first, 0 disables the cache
+CONFIGTX_ARTIFACT_CACHE_ENTRIES = int(os.getenv("CONFIGTX_ARTIFACT_CACHE_ENTRIES", 256))
+READ_CHUNK_SIZE = 1024 * 1024
+# profile fields naming files or directories whose content ends up in artifacts
+FILE_FIELDS = ("MSPDir", "ClientTLSCert", "ServerTLSCert")
+
+
+def _referenced_paths(obj, paths):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k in FILE_FIELDS and isinstance(v, str):
+                paths.add(v)
+            else:
+                _referenced_paths(v, paths)
+    elif isinstance(obj, list):
+        for v in obj:
+            _referenced_paths(v, paths)
+    return paths
+
+
+def _hash_file(digest, path):
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            digest.update(data)
+
+
+def _hash_path(digest, path):
+    digest.update(path.encode("utf-8") + b"\0")
+    if os.path.isfile(path):
+        _hash_file(digest, path)
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode("utf-8") + b"\0")
+            _hash_file(digest, file_path)
+
+
+def artifact_key(kind, configtx_path, profile, channel_id, version=""):
+    """
+    Key of an artifact, artifacts with the same key are identical
+
+    The key covers the profile as configtxgen reads it, the content of every
+    msp directory and tls certificate it references, and the channel id.
+
+    :param kind: artifact kind, e.g. genesis or channeltx
+    :param configtx_path: directory holding configtx.yaml
+    :param profile: profile name
+    :param channel_id: channel id
+    :param version: configtxgen version
+    :return: hex digest, None if the profile does not exist
+    :rtype: str
+    """
+    with open(os.path.join(configtx_path, "configtx.yaml"), "r", encoding="utf-8") as f:
+        configtx = load_yaml(f)
+    profile_config = (configtx.get("Profiles") or {}).get(profile)
+    if profile_config is None:
+        return None
+    digest = hashlib.sha256()
+    digest.update("\0".join([kind, version, profile, channel_id]).encode("utf-8") + b"\0")
+    digest.update(json.dumps(profile_config, sort_keys=True, default=str).encode("utf-8"))
+    for path in sorted(_referenced_paths(profile_config, set())):
+        if os.path.exists(path):
+            _hash_path(digest, path)
+    return digest.hexdigest()
+
+
+def cache_path(key):
+    """
+    Path of the artifact with key in cache
+
+    :param key: artifact key
+    :return: path of artifact
+    :rtype: str
+    """
+    return os.path.join(CONFIGTX_ARTIFACT_CACHE, key)
+
+
+def fetch(key, output):
+    """
+    Copy a cached artifact to output and mark it as recently used
+
+    :param key: artifact key
+    :param output: path to write the artifact to
+    :return: whether the artifact was cached
+    :rtype: bool
+    """
+    if not key or CONFIGTX_ARTIFACT_CACHE_ENTRIES <= 0:
+        return False
+    path = cache_path(key)
+    try:
+        os.utime(path)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        shutil.copyfile(path, output)
+    except FileNotFoundError:
+        return False
+    LOG.info("Reused configtx artifact %s for %s", key, output)
+    return True
+
+
+def store(key, output):
+    """
+    Store an artifact in cache, evicting least recently used ones
+
+    :param key: artifact key
+    :param output: path of generated artifact
+    :return: none
+    :rtype: none
+    """
+    if not key or CONFIGTX_ARTIFACT_CACHE_ENTRIES <= 0:
+        return
+    try:
+        os.makedirs(CONFIGTX_ARTIFACT_CACHE, exist_ok=True)
+        tmp = "{}.{}.tmp".format(cache_path(key), os.getpid())
+        shutil.copyfile(output, tmp)
+        os.rename(tmp, cache_path(key))
+        evict()
+    except OSError as e:
+        LOG.warning("store configtx artifact %s failed: %s", key, e)
+
+
+def evict(entries=None):
+    """
+    Remove least recently used artifacts beyond the cache size
+
+    :param entries: artifacts to keep, CONFIGTX_ARTIFACT_CACHE_ENTRIES by default
+    :return: number of removed artifacts
+    :rtype: int
+    """
+    entries = CONFIGTX_ARTIFACT_CACHE_ENTRIES if entries is None else entries
+    artifacts = []
+    for entry in os.scandir(CONFIGTX_ARTIFACT_CACHE):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            try:
+                artifacts.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    if len(artifacts) <= entries:
+        return 0
+    artifacts.sort()
+    removed = 0
+    for _, path in artifacts[:len(artifacts) - entries]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
@@ -1,6 +1,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
+import base64
 import hashlib
 import os
 
@@ -11,8 +12,14 @@ from rest_framework.permissions import BasePermission
 from functools import reduce, partial
 from api.common.serializers import BadResponseSerializer
 import uuid
+from tempfile import SpooledTemporaryFile
 from zipfile import ZipFile
 
+# artifacts larger than this are spooled to a temporary file
+ARTIFACT_SPOOL_SIZE = 8 * 1024 * 1024
+# multiple of 3 bytes so encoded chunks concatenate without padding
+B64_CHUNK_SIZE = 3 * 64 * 1024
+
 
 def make_uuid():
     return str(uuid.uuid4())
@@ -103,6 +110,14 @@ def hash_file(file, block_size=65536):
     return hash_func.hexdigest()
 
 
+def _zip_dir_entries(zfile, dirpath):
+    dir_dst = "/" + dirpath.rsplit("/", 1)[1]
+    for path, dirnames, filenames in os.walk(dirpath):
+        fpath = dir_dst + path.replace(dirpath, '')
+        for filename in filenames:
+            zfile.write(os.path.join(path, filename), os.path.join(fpath, filename))
+
+
 def zip_dir(dirpath, outFullName):
     """
     Compress the specified folder
@@ -110,12 +125,8 @@ def zip_dir(dirpath, outFullName):
     :param outFullName: Save path+xxxx.zip
     :return: null
     """
-    dir_dst = "/" + dirpath.rsplit("/", 1)[1]
     zdir = ZipFile(outFullName, "w")
-    for path, dirnames, filenames in os.walk(dirpath):
-        fpath = dir_dst + path.replace(dirpath, '')
-        for filename in filenames:
-            zdir.write(os.path.join(path, filename), os.path.join(fpath, filename))
+    _zip_dir_entries(zdir, dirpath)
     zdir.close()
 
 
@@ -129,3 +140,53 @@ def zip_file(dirpath, outFullName):
     zfile = ZipFile(outFullName, "w")
     zfile.write(dirpath, dirpath.rsplit("/", 1)[1])
     zfile.close()
+
+
+def b64encode_stream(fileobj, chunk_size=B64_CHUNK_SIZE):
+    """
+    Base64 encode a file object chunk by chunk
+    :param fileobj: file object opened in binary mode
+    :param chunk_size: bytes read at a time, multiple of 3
+    :return: encoded content
+    :rtype: bytes
+    """
+    fileobj.seek(0)
+    return b"".join(
+        base64.b64encode(buf)
+        for buf in iter(partial(fileobj.read, chunk_size), b"")
+    )
+
+
+def _read_packed(buf, encode):
+    if encode:
+        return b64encode_stream(buf)
+    buf.seek(0)
+    return buf.read()
+
+
+def pack_dir(dirpath, encode=True):
+    """
+    Compress the specified folder in memory, same layout as zip_dir
+    :param dirpath: specified folder
+    :param encode: base64 encode the zip
+    :return: zip content
+    :rtype: bytes
+    """
+    with SpooledTemporaryFile(max_size=ARTIFACT_SPOOL_SIZE) as buf:
+        with ZipFile(buf, "w") as zfile:
+            _zip_dir_entries(zfile, dirpath)
+        return _read_packed(buf, encode)
+
+
+def pack_file(dirpath, encode=True):
+    """
+    Compress the specified file in memory, same layout as zip_file
+    :param dirpath: specified folder of file
+    :param encode: base64 encode the zip
+    :return: zip content
+    :rtype: bytes
+    """
+    with SpooledTemporaryFile(max_size=ARTIFACT_SPOOL_SIZE) as buf:
+        with ZipFile(buf, "w") as zfile:
+            zfile.write(dirpath, dirpath.rsplit("/", 1)[1])
+        return _read_packed(buf, encode)
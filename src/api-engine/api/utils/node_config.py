@@ -3,8 +3,8 @@
 #
 from string import Template
 import os
-import yaml
 from api.config import CELLO_HOME
+from api.utils.template import load_template, dump_yaml
 
 class NodeConfig:
     """Class represents crypto-config yaml."""
@@ -40,8 +40,7 @@ class NodeConfig:
         :rtype: none
         """
         try:
-            with open(src, 'r+') as f:
-                cfg = yaml.load(f, Loader=yaml.FullLoader)
+            cfg = load_template(src)
 
             for key, value in kw.items():
                 keys = key.split("_")
@@ -60,7 +59,7 @@ class NodeConfig:
                     cfg[keys[0]][keys[1]][keys[2]][keys[3]][keys[4]] = value
 
             with open(dst, 'w+') as f:
-                yaml.dump(cfg, f)
+                dump_yaml(cfg, f)
         except Exception as e:
             raise e
 
@@ -0,0 +1,69 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import hashlib
+import os
+
+from api.config import FABRIC_CHAINCODE_STORE
+
+# chaincode packages shared by every organization, one file per source key,
+# on the chaincode store which api and task workers mount alike
+CHAINCODE_PACKAGE_CACHE = os.getenv(
+    "CHAINCODE_PACKAGE_CACHE", os.path.join(FABRIC_CHAINCODE_STORE, "packages")
+)
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def package_key(source_digest, name, version, language):
+    """
+    Key of a chaincode package, packages with the same key are identical
+
+    :param source_digest: sha256 of uploaded archive
+    :param name: chaincode name
+    :param version: chaincode version
+    :param language: chaincode language
+    :return: hex digest
+    :rtype: str
+    """
+    return hashlib.sha256(
+        "\0".join([source_digest, name, version, language]).encode("utf-8")
+    ).hexdigest()
+
+
+def cache_path(key):
+    """
+    Path of the package with key in cache
+
+    :param key: package key
+    :return: path of tar.gz
+    :rtype: str
+    """
+    return os.path.join(CHAINCODE_PACKAGE_CACHE, "{}.tar.gz".format(key))
+
+
+def cached_package(key):
+    """
+    Cached package of key
+
+    :param key: package key
+    :return: path of tar.gz, None if it was not packaged yet
+    :rtype: str
+    """
+    path = cache_path(key)
+    return path if os.path.exists(path) else None
+
+
+def package_id(label, path):
+    """
+    Package id the peer assigns to a package, label:sha256 of the package
+
+    :param label: package label, <name>_<version>
+    :param path: path of tar.gz
+    :return: package id
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            digest.update(data)
+    return "{}:{}".format(label, digest.hexdigest())
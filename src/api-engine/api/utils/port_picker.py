@@ -1,49 +1,394 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
+import errno
 import logging
+import selectors
 import socket
 import os
-from random import sample
+import threading
+import time
+from datetime import timedelta
 from django.core.exceptions import ObjectDoesNotExist
-from api.models import Port, Node, Agent
+from django.db import connection, transaction
+from django.utils import timezone
+from api.models import Port, Node, Agent, PortReservation
 
 CLUSTER_PORT_START = int(os.getenv("CLUSTER_PORT_START", 7050))
+CLUSTER_PORT_END = 65535
 MAX_RETRY = 100
+PORT_PROBE_TIMEOUT = float(os.getenv("PORT_PROBE_TIMEOUT", 1))
+# seconds a picked port stays reserved before it is mapped to a node
+PORT_RESERVATION_TTL = int(os.getenv("PORT_RESERVATION_TTL", 600))
+# size of the Agent.free_ports cache refill and when to refill it
+FREE_PORTS_BATCH = int(os.getenv("FREE_PORTS_BATCH", 64))
+FREE_PORTS_LOW_WATER = int(os.getenv("FREE_PORTS_LOW_WATER", 16))
+
+# Take the head of Agent.free_ports and reserve it in one statement.
+TAKE_FREE_PORTS_SQL = """
+WITH taken AS (
+    UPDATE {agent} AS agent
+    SET free_ports = agent.free_ports[%(count)s + 1:]
+    FROM (
+        SELECT id, free_ports[1:%(count)s] AS ports
+        FROM {agent} WHERE id = %(agent_id)s FOR UPDATE
+    ) AS old
+    WHERE agent.id = old.id AND cardinality(old.ports) = %(count)s
+    RETURNING old.ports, cardinality(agent.free_ports) AS remain
+), reserved AS (
+    INSERT INTO {reservation} (agent_id, external, created_at, expires_at)
+    SELECT %(agent_id)s, unnest(taken.ports), now(),
+           now() + %(ttl)s * interval '1 second'
+    FROM taken
+    ON CONFLICT (agent_id, external)
+    DO UPDATE SET expires_at = EXCLUDED.expires_at
+)
+SELECT ports, remain FROM taken
+"""
 
 LOG = logging.getLogger(__name__)
 
 
-def port_is_free(ip=None, port=0):
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.settimeout(1)
+class PortBitmap(object):
+    """Bitmap of allocated ports in [start, end), one bit per port."""
+
+    def __init__(self, data=None, cursor=0, start=CLUSTER_PORT_START, end=CLUSTER_PORT_END):
+        """
+        init PortBitmap
+
+        :param data: persisted bitmap bytes, None for an empty bitmap
+        :param cursor: offset where the next free port search starts
+        :param start: first port managed by the bitmap
+        :param end: port after the last one managed by the bitmap
+        :return: none
+        """
+        self.start = start
+        self.end = end
+        self.size = end - start
+        self.bits = bytearray((self.size + 7) // 8)
+        if data:
+            data = bytes(data)[:len(self.bits)]
+            self.bits[:len(data)] = data
+        self.cursor = cursor if 0 <= cursor < self.size else 0
+
+    def _offset(self, port):
+        port = int(port)
+        if self.start <= port < self.end:
+            return port - self.start
+        return None
+
+    def is_used(self, port):
+        offset = self._offset(port)
+        if offset is None:
+            return True
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def mark(self, ports):
+        for port in ports:
+            offset = self._offset(port)
+            if offset is not None:
+                self.bits[offset >> 3] |= 1 << (offset & 7)
+
+    def release(self, ports):
+        for port in ports:
+            offset = self._offset(port)
+            if offset is not None:
+                self.bits[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+
+    def allocate(self, count=1, exclude=None):
+        """
+        Take free ports with a next-fit scan from the cursor,
+        skipping fully used bytes, and mark them as used.
+
+        :param count: the number of ports requested
+        :param exclude: ports that must not be returned
+        :return: allocated ports, empty if not enough free ports
+        :rtype: list
+        """
+        exclude = set(exclude or [])
+        ports = []
+        offset = self.cursor
+        scanned = 0
+        while len(ports) < count and scanned < self.size:
+            if offset & 7 == 0 and self.bits[offset >> 3] == 0xFF:
+                step = min(8, self.size - offset)
+            else:
+                step = 1
+                port = self.start + offset
+                if not self.bits[offset >> 3] & (1 << (offset & 7)) \
+                        and port not in exclude:
+                    ports.append(port)
+            scanned += step
+            offset = (offset + step) % self.size
+        if len(ports) < count:
+            return []
+        self.mark(ports)
+        self.cursor = offset
+        return ports
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+
+def _load_port_bitmap(agent):
+    """
+    Load port bitmap of agent, build it from the port and
+    reservation tables at first use.
+
+    :param agent: agent obj
+    :return: bitmap of agent
+    :rtype: PortBitmap
+    """
+    if agent.port_bitmap is not None:
+        return PortBitmap(agent.port_bitmap, agent.port_cursor)
+
+    bitmap = PortBitmap()
+    bitmap.mark(
+        Port.objects.filter(node__agent__id=agent.id).values_list(
+            "external", flat=True
+        )
+    )
+    bitmap.mark(
+        PortReservation.objects.filter(agent=agent).values_list(
+            "external", flat=True
+        )
+    )
+    bitmap.mark(agent.free_ports or [])
+    return bitmap
+
+
+def _save_port_bitmap(agent, bitmap):
+    agent.port_bitmap = bitmap.to_bytes()
+    agent.port_cursor = bitmap.cursor
+    agent.save(update_fields=["port_bitmap", "port_cursor"])
+
+
+def _expired_reservations(agent, bitmap):
+    """
+    Drop expired reservations of agent and free their ports,
+    unless the port got mapped to a node meanwhile.
+
+    :param agent: agent obj, must be locked by caller
+    :param bitmap: bitmap of agent
+    :return: the number of released ports
+    :rtype: int
+    """
+    expired = PortReservation.objects.filter(
+        agent=agent, expires_at__lte=timezone.now()
+    )
+    expired_ports = set(expired.values_list("external", flat=True))
+    if not expired_ports:
+        return 0
+    mapped_ports = Port.objects.filter(
+        node__agent__id=agent.id, external__in=expired_ports
+    ).values_list("external", flat=True)
+    expired_ports -= set(mapped_ports)
+    bitmap.release(expired_ports)
+    expired.delete()
+
+    return len(expired_ports)
+
+
+def update_port_bitmap(agent_id=None, allocate=0, exclude_ports=None, mark=None, release=None):
+    """
+    Change port bitmap of agent in one locked transaction.
+
+    Allocated ports are reserved until PORT_RESERVATION_TTL expires,
+    marked ports are mapped to a node so their reservation is dropped.
+
+    :param agent_id: agent id
+    :param allocate: the number of ports to allocate
+    :param exclude_ports: ports must not be allocated
+    :param mark: ports to mark as used
+    :param release: ports to mark as free
+    :return: allocated ports
+    :rtype: list
+    """
+    with transaction.atomic():
+        try:
+            agent = Agent.objects.select_for_update().get(id=agent_id)
+        except ObjectDoesNotExist:
+            LOG.error("Agent not found")
+            return []
+        bitmap = _load_port_bitmap(agent)
+        _expired_reservations(agent, bitmap)
+        if release:
+            bitmap.release(release)
+        if mark:
+            bitmap.mark(mark)
+        done = list(release or []) + list(mark or [])
+        if done:
+            PortReservation.objects.filter(
+                agent=agent, external__in=done
+            ).delete()
+        ports = bitmap.allocate(allocate, exclude_ports) if allocate else []
+        if ports:
+            expires_at = timezone.now() + timedelta(
+                seconds=PORT_RESERVATION_TTL
+            )
+            PortReservation.objects.bulk_create(
+                [
+                    PortReservation(
+                        agent=agent, external=port, expires_at=expires_at
+                    )
+                    for port in ports
+                ]
+            )
+        _save_port_bitmap(agent, bitmap)
+
+    return ports
+
+
+def release_ports(agent_id=None, ports=None):
+    if agent_id is None or not ports:
+        return
+    update_port_bitmap(agent_id, release=ports)
+
+
+def sweep_reservations():
+    """
+    Release expired port reservations of all agents.
+
+    :return: the number of released ports
+    :rtype: int
+    """
+    released = 0
+    agent_ids = (
+        PortReservation.objects.filter(expires_at__lte=timezone.now())
+        .values_list("agent_id", flat=True)
+        .distinct()
+    )
+    for agent_id in list(agent_ids):
+        with transaction.atomic():
+            agent = Agent.objects.select_for_update().get(id=agent_id)
+            bitmap = _load_port_bitmap(agent)
+            released += _expired_reservations(agent, bitmap)
+            _save_port_bitmap(agent, bitmap)
+
+    return released
+
+
+class ProbeStats(object):
+    """Counters of port probes, read them with snapshot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("probes", "ports", "busy", "timed_out", "seconds"), 0
+        )
+
+    def observe(self, ports, busy, timed_out, seconds):
+        with self._lock:
+            self._counters["probes"] += 1
+            self._counters["ports"] += ports
+            self._counters["busy"] += busy
+            self._counters["timed_out"] += timed_out
+            self._counters["seconds"] += seconds
+
+    def snapshot(self):
+        """
+        Copy of the counters
+
+        :return: probes, ports, busy, timed_out and seconds since start
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._counters)
+
+
+probe_stats = ProbeStats()
+
+
+def probe_busy_ports(ip=None, ports=None, timeout=PORT_PROBE_TIMEOUT):
+    """
+    Probe ports concurrently with non-blocking connects,
+    all of them share one deadline.
+
+    :param ip: ip of agent host
+    :param ports: ports to probe
+    :param timeout: total deadline in seconds
+    :return: ports which accept connections
+    :rtype: list
+    """
+    ports = list(ports or [])
+    busy_ports = []
+    timed_out = 0
+    start = time.monotonic()
+    selector = selectors.DefaultSelector()
     try:
-        s.connect((ip, int(port)))
-        s.shutdown(socket.SHUT_RDWR)
-        return False
-    except Exception:
-        return True
+        for port in ports:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setblocking(False)
+            try:
+                code = s.connect_ex((ip, int(port)))
+            except Exception:
+                code = errno.ECONNREFUSED
+            if code in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                selector.register(s, selectors.EVENT_WRITE, port)
+                continue
+            if code == 0:
+                busy_ports.append(port)
+            s.close()
+
+        deadline = start + timeout
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                s = key.fileobj
+                if s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    busy_ports.append(key.data)
+                selector.unregister(s)
+                s.close()
     finally:
-        s.close()
+        # filtered ports never answered, treat them as free
+        for key in list(selector.get_map().values()):
+            timed_out += 1
+            key.fileobj.close()
+        selector.close()
+
+    duration = time.monotonic() - start
+    probe_stats.observe(len(ports), len(busy_ports), timed_out, duration)
+    LOG.debug(
+        "Probed %s ports on %s in %.3fs, busy %s, timed out %s",
+        len(ports), ip, duration, len(busy_ports), timed_out,
+    )
+    return busy_ports
 
 
 def port_picker(agent_id=None, request_count=1, exclude_ports=None):
-    if exclude_ports is None:
-        exclude_ports = []
+    """
+    Pick ports from the free port cache of agent.
 
-    used_ports = Port.objects.values_list("external").filter(
-        node__agent__id=agent_id
-    )
-    exclude_ports += [port[0] for port in used_ports]
-
-    return sample(
-        [
-            i
-            for i in range(CLUSTER_PORT_START, 65535)
-            if i not in exclude_ports
-        ],
-        request_count,
-    )
+    Excluded ports taken from the cache are held until enough ports are
+    picked, then released to the bitmap behind the cursor.
+
+    :param agent_id: agent id
+    :param request_count: the number of ports requested
+    :param exclude_ports: ports must not be returned
+    :return: reserved ports, empty if agent is out of ports
+    :rtype: list
+    """
+    exclude_ports = set(exclude_ports or [])
+    ports = []
+    skipped = []
+    while len(ports) < request_count:
+        candidates = get_available_ports(agent_id, request_count - len(ports))
+        if not candidates:
+            break
+        for port in candidates:
+            if port in exclude_ports:
+                skipped.append(port)
+            else:
+                ports.append(port)
+
+    if len(ports) < request_count:
+        skipped += ports
+        ports = []
+    release_ports(agent_id, skipped)
+
+    return ports
 
 
 def find_available_ports(
@@ -56,22 +401,28 @@ def find_available_ports(
 ):
     if node_id is None or agent_id is None or retry == 0:
         return []
-    all_port_is_free = True
 
     if exclude_ports is None:
         exclude_ports = []
-    ports = port_picker(agent_id, request_count, exclude_ports)
-
-    for port in ports:
-        if not port_is_free(ip, port):
-            exclude_ports.append(port)
-            all_port_is_free = False
+    ports = []
 
-    if not all_port_is_free:
+    while retry > 0 and len(ports) < request_count:
         retry -= 1
-        return find_available_ports(
-            ip, node_id, agent_id, request_count, exclude_ports, retry
+        candidates = port_picker(
+            agent_id, request_count - len(ports), exclude_ports
         )
+        if not candidates:
+            break
+        busy_ports = probe_busy_ports(ip, candidates)
+        ports += [port for port in candidates if port not in busy_ports]
+        if busy_ports:
+            # ports used outside of cello, the cursor already moved past them
+            exclude_ports += busy_ports
+            release_ports(agent_id, busy_ports)
+
+    if len(ports) < request_count:
+        release_ports(agent_id, ports)
+        return []
     # Removed these lines of code bc they can produce port objects with 0 internal port number.
     # try:
     #     node = Node.objects.get(id=node_id)
@@ -102,7 +453,13 @@ def set_ports_mapping(node_id=None, mapping=None, new=False):
                 )
                 for port in mapping
             ]
-            Port.objects.bulk_create(port_objects)
+            with transaction.atomic():
+                Port.objects.bulk_create(port_objects)
+                if node.agent_id:
+                    update_port_bitmap(
+                        node.agent_id,
+                        mark=[port.get("external") for port in mapping],
+                    )
     else:
         for port in mapping:
             Port.objects.filter(
@@ -110,25 +467,75 @@ def set_ports_mapping(node_id=None, mapping=None, new=False):
             ).update(internal=port.get("internal"))
 
 
+def refill_free_ports(agent_id=None, count=FREE_PORTS_BATCH):
+    """
+    Move a batch of free ports from the bitmap into Agent.free_ports.
+
+    :param agent_id: agent id
+    :param count: the number of ports to add to the cache
+    :return: the number of cached ports
+    :rtype: int
+    """
+    with transaction.atomic():
+        try:
+            agent = Agent.objects.select_for_update().get(id=agent_id)
+        except ObjectDoesNotExist:
+            LOG.error("Agent not found")
+            return 0
+        bitmap = _load_port_bitmap(agent)
+        _expired_reservations(agent, bitmap)
+        agent.free_ports = (agent.free_ports or []) + bitmap.allocate(count)
+        agent.port_bitmap = bitmap.to_bytes()
+        agent.port_cursor = bitmap.cursor
+        agent.save(update_fields=["port_bitmap", "port_cursor", "free_ports"])
+
+    return len(agent.free_ports)
+
+
+def _take_free_ports(agent_id, count):
+    sql = TAKE_FREE_PORTS_SQL.format(
+        agent=Agent._meta.db_table,
+        reservation=PortReservation._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "agent_id": str(agent_id),
+                "count": count,
+                "ttl": PORT_RESERVATION_TTL,
+            },
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None, 0
+    return row[0], row[1] or 0
+
+
 def get_available_ports(
     agent_id=None,
     request_count=1,
 ):
+    """
+    Get ports from the free port cache of agent, the cache is refilled
+    from the port bitmap when it runs low.
 
-    agent = Agent.objects.get(id=agent_id).free_ports
-
-    used_ports = agent.free_ports
-
-    ports = sample(
-        [
-            i
-            for i in range(CLUSTER_PORT_START, 65535)
-            if i not in used_ports
-        ],
-        request_count,
-    )
+    :param agent_id: agent id
+    :param request_count: the number of ports requested
+    :return: reserved ports, empty if agent is out of ports
+    :rtype: list
+    """
+    if agent_id is None or request_count < 1:
+        return []
 
-    agent.free_ports = used_ports.append(ports)
-    agent.save()
+    ports, remain = _take_free_ports(agent_id, request_count)
+    if ports is None:
+        refill_free_ports(agent_id, max(FREE_PORTS_BATCH, request_count))
+        ports, remain = _take_free_ports(agent_id, request_count)
+        if ports is None:
+            return []
+    if remain < FREE_PORTS_LOW_WATER:
+        refill_free_ports(agent_id)
 
     return ports
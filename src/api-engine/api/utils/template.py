@@ -0,0 +1,65 @@
+#
+# SPDX-License-Identifier: Apache-2.0
+#
+import os
+import pickle
+import threading
+
+import yaml
+
+try:
+    from yaml import CFullLoader as Loader, CDumper as Dumper
+except ImportError:
+    from yaml import FullLoader as Loader, Dumper
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def load_yaml(f):
+    """
+    Parse yaml stream, with LibYAML when it is available
+
+    :param f: stream or string of yaml
+    :return: parsed yaml
+    :rtype: any
+    """
+    return yaml.load(f, Loader=Loader)
+
+
+def dump_yaml(data, f=None, **kwargs):
+    """
+    Dump data as yaml, with LibYAML when it is available
+
+    :param data: data to dump
+    :param f: stream to write, return a string if None
+    :return: yaml string or None
+    :rtype: str
+    """
+    return yaml.dump(data, f, Dumper=Dumper, **kwargs)
+
+
+def load_template(path):
+    """
+    Load yaml template through a process wide cache.
+
+    The template is parsed once and kept pickled, it is parsed again only
+    when the mtime or size of the file changes. Every call returns a new
+    copy which the caller can modify freely.
+
+    :param path: path of yaml template
+    :return: parsed template
+    :rtype: any
+    """
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _templates.get(path)
+    if cached is None or cached[0] != key:
+        with _lock:
+            cached = _templates.get(path)
+            if cached is None or cached[0] != key:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = load_yaml(f)
+                cached = (key, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+                _templates[path] = cached
+    return pickle.loads(cached[1])
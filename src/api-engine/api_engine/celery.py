@@ -15,3 +15,18 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+app.conf.beat_schedule = {
+    "sweep-port-reservations": {
+        "task": "api.tasks.port.sweep_port_reservations",
+        "schedule": 60.0,
+    },
+    "refill-identity-pools": {
+        "task": "api.tasks.pki.refill_identity_pools",
+        "schedule": 300.0,
+    },
+    "collect-artifacts": {
+        "task": "api.tasks.artifact.collect_artifacts",
+        "schedule": 3600.0,
+    },
+}